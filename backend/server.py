@@ -1,33 +1,59 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, IndexModel, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError, DuplicateKeyError, BulkWriteError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ConfigDict, ValidationError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from typing import List, Optional, Dict, Any, AsyncIterator, Iterator, Callable, Tuple, Union, Set
 import uuid
-from datetime import datetime, timezone
-from elevenlabs import ElevenLabs, VoiceSettings
+from datetime import datetime, timezone, timedelta
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 import aiofiles
+import httpx
+import base64
+import numpy as np
+import asyncio
 import json
+import random
+import hashlib
+import shutil
+import unicodedata
+import codecs
+import re
+import struct
+import itertools
+import weakref
+import time
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
 db = client[os.environ['DB_NAME']]
 
-# API Clients  
-elevenlabs_client = ElevenLabs(api_key=os.environ.get('ELEVENLABS_API_KEY'))
-
 # Emergent LLM integration
 emergent_llm_key = os.environ.get('EMERGENT_LLM_KEY')
+LLM_PROVIDER = "openai"
+LLM_MODEL = "gpt-4o-mini"
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '1000'))
+LLM_CACHE_TTL_SECONDS = float(os.environ.get('LLM_CACHE_TTL_SECONDS', '3600'))
+
+# Shownotes (script chunks summarized in parallel, then merged)
+SHOWNOTES_CHUNK_CHARS = int(os.environ.get('SHOWNOTES_CHUNK_CHARS', '8000'))
+SHOWNOTES_CONCURRENCY = int(os.environ.get('SHOWNOTES_CONCURRENCY', '8'))
 
 # Create media storage directories
 AUDIO_DIR = ROOT_DIR / "audio_files"
@@ -39,6 +65,99 @@ VIDEO_DIR.mkdir(exist_ok=True)
 IMAGE_DIR = ROOT_DIR / "image_files"
 IMAGE_DIR.mkdir(exist_ok=True)
 
+# TTS rendering
+TTS_MODEL_ID = "eleven_multilingual_v2"
+TTS_CONCURRENCY = int(os.environ.get('TTS_CONCURRENCY', '4'))  # provider calls in flight, across all requests and jobs
+TTS_MAX_RETRIES = int(os.environ.get('TTS_MAX_RETRIES', '5'))
+TTS_RETRY_BASE_DELAY = float(os.environ.get('TTS_RETRY_BASE_DELAY', '1.0'))
+TTS_RETRY_MAX_DELAY = float(os.environ.get('TTS_RETRY_MAX_DELAY', '30.0'))
+TTS_OUTPUT_FORMAT = "mp3_44100_128"
+
+# Long segments are synthesized as sentence-aligned pieces in parallel, with neighbouring text as context
+TTS_SPLIT_THRESHOLD_CHARS = int(os.environ.get('TTS_SPLIT_THRESHOLD_CHARS', '1000'))
+TTS_PIECE_TARGET_CHARS = int(os.environ.get('TTS_PIECE_TARGET_CHARS', '500'))
+TTS_CONTEXT_CHARS = 300
+
+# Speaking rate used for duration estimates in the script preview
+SCRIPT_WORDS_PER_SECOND = float(os.environ.get('SCRIPT_WORDS_PER_SECOND', '2.5'))
+
+# TTS provider: "elevenlabs", or "fake" for local tests and benchmarks
+TTS_PROVIDER = os.environ.get('TTS_PROVIDER', 'elevenlabs')
+ELEVENLABS_API_URL = os.environ.get('ELEVENLABS_API_URL', 'https://api.elevenlabs.io')
+TTS_HTTP_MAX_CONNECTIONS = int(os.environ.get('TTS_HTTP_MAX_CONNECTIONS', '16'))
+TTS_FAKE_LATENCY_SECONDS = float(os.environ.get('TTS_FAKE_LATENCY_SECONDS', '0.2'))
+TTS_FAKE_FAILURE_RATE = float(os.environ.get('TTS_FAKE_FAILURE_RATE', '0.0'))
+
+# TTS scheduling (previews ahead of episode renders; 0 disables a rate limit)
+TTS_INTERACTIVE_RESERVED_SLOTS = int(os.environ.get('TTS_INTERACTIVE_RESERVED_SLOTS', '1'))
+TTS_REQUESTS_PER_MINUTE = float(os.environ.get('TTS_REQUESTS_PER_MINUTE', '0'))
+TTS_CHARACTERS_PER_MINUTE = float(os.environ.get('TTS_CHARACTERS_PER_MINUTE', '0'))
+TTS_BATCH_QUOTA_RESERVE = int(os.environ.get('TTS_BATCH_QUOTA_RESERVE', '2000'))  # characters kept for previews
+TTS_QUOTA_REFRESH_SECONDS = float(os.environ.get('TTS_QUOTA_REFRESH_SECONDS', '300'))
+
+# Uploads
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(4 * 1024 ** 3)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # boundaries and part headers allowed on top of the file itself
+UPLOAD_SESSION_TTL_HOURS = int(os.environ.get('UPLOAD_SESSION_TTL_HOURS', '48'))
+
+# Preview streaming
+TTS_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Rendered TTS audio cache
+TTS_CACHE_DIR = AUDIO_DIR / "tts_cache"
+TTS_CACHE_MAX_BYTES = int(os.environ.get('TTS_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+
+# Episode assembly (silence inserted whenever the speaker changes)
+EPISODE_SPEAKER_GAP_MS = int(os.environ.get('EPISODE_SPEAKER_GAP_MS', '300'))
+GAP_DIR = AUDIO_DIR / "gaps"
+GAP_DIR.mkdir(exist_ok=True)
+
+# Background episode rendering
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', '2'))
+
+# Bulk episode import (scripts are validated, numbered and inserted in batches)
+BULK_IMPORT_BATCH_SIZE = int(os.environ.get('BULK_IMPORT_BATCH_SIZE', '200'))
+
+# Media processing (ffmpeg/ffprobe worker pool)
+MEDIA_WORKERS = int(os.environ.get('MEDIA_WORKERS', str(os.cpu_count() or 2)))
+MEDIA_QUEUE_LIMIT = int(os.environ.get('MEDIA_QUEUE_LIMIT', '16'))  # waiting interactive commands before 503
+MEDIA_DEFAULT_TIMEOUT = 600
+MEDIA_MIN_TIMEOUT = 60
+MEDIA_TIMEOUT_PER_MEDIA_SECOND = float(os.environ.get('MEDIA_TIMEOUT_PER_MEDIA_SECOND', '4.0'))
+
+# Audio enhancement (NumPy DSP)
+ENHANCE_THREADS = int(os.environ.get('ENHANCE_THREADS', str(os.cpu_count() or 2)))
+ENHANCE_TARGET_LUFS = float(os.environ.get('ENHANCE_TARGET_LUFS', '-16.0'))
+ENHANCE_PEAK_CEILING_DB = -1.0
+
+# Waveform peaks (decoded to mono at a fixed analysis rate)
+PEAKS_DIR = AUDIO_DIR / "peaks"
+PEAKS_DIR.mkdir(exist_ok=True)
+PEAKS_SAMPLE_RATE = 22050
+PEAKS_BASE_SAMPLES_PER_PEAK = 256
+PEAKS_MIN_LEVEL_PEAKS = 512
+PEAKS_MAX_WIDTH = 10000
+
+# Media file serving
+MEDIA_INDEX_MAX_ENTRIES = 10000
+MEDIA_INDEX_REVALIDATE_SECONDS = float(os.environ.get('MEDIA_INDEX_REVALIDATE_SECONDS', '2.0'))
+MEDIA_SEND_CHUNK_SIZE = 256 * 1024
+MEDIA_MAX_RANGES = 16
+
+# Dashboard analytics (cached in memory, dropped on every episode write)
+DASHBOARD_CACHE_TTL_SECONDS = float(os.environ.get('DASHBOARD_CACHE_TTL_SECONDS', '60'))
+DASHBOARD_RECENT_EPISODES = 3
+
+# Download analytics (events buffered in memory, rolled up into daily stats)
+ANALYTICS_FLUSH_BATCH = int(os.environ.get('ANALYTICS_FLUSH_BATCH', '500'))
+ANALYTICS_FLUSH_INTERVAL_SECONDS = float(os.environ.get('ANALYTICS_FLUSH_INTERVAL_SECONDS', '10'))
+ANALYTICS_BUFFER_MAX_EVENTS = int(os.environ.get('ANALYTICS_BUFFER_MAX_EVENTS', '50000'))
+ANALYTICS_ROLLUP_INTERVAL_SECONDS = float(os.environ.get('ANALYTICS_ROLLUP_INTERVAL_SECONDS', '300'))
+ANALYTICS_ROLLUP_BATCH_SIZE = int(os.environ.get('ANALYTICS_ROLLUP_BATCH_SIZE', '500'))  # (episode, day) pairs per rollup query
+ANALYTICS_EVENT_RETENTION_DAYS = int(os.environ.get('ANALYTICS_EVENT_RETENTION_DAYS', '90'))
+ANALYTICS_LISTEN_MIN_FRACTION = 0.05  # share of the file a listener has to fetch
+
 # Create the main app
 app = FastAPI()
 
@@ -52,6 +171,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-flight
+background_tasks: set = set()
+
 
 # ============================================================================
 # MODELS
@@ -68,6 +190,9 @@ class SpeakerSegment(BaseModel):
     text: str
     start_position: int
     end_position: int
+    fingerprint: Optional[str] = None  # TTS cache key of (voice, settings, model, text)
+    audio_file: Optional[str] = None  # Rendered audio for this fingerprint
+    duration: Optional[float] = None  # Seconds of rendered audio
 
 class EpisodeMetadata(BaseModel):
     title: str
@@ -98,6 +223,24 @@ class Episode(BaseModel):
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     published_at: Optional[datetime] = None
 
+class EpisodeSummary(BaseModel):
+    """Episode without the script fields, for list views"""
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    metadata: EpisodeMetadata
+    selected_voice: str = "markus"
+    audio_url: Optional[str] = None
+    audio_duration: Optional[float] = None
+    status: str = "draft"
+    created_at: datetime
+    updated_at: datetime
+    published_at: Optional[datetime] = None
+
+class EpisodePage(BaseModel):
+    items: List[EpisodeSummary]
+    next_cursor: Optional[str] = None
+
 class EpisodeCreate(BaseModel):
     text_content: str
     metadata: EpisodeMetadata
@@ -118,6 +261,16 @@ class TTSRequest(BaseModel):
     voice: str = "markus"
     voice_settings: Optional[VoiceSettingsModel] = None
 
+class ScriptEdit(BaseModel):
+    start: int  # Offset of the change in the new text
+    deleted: int = 0  # Characters removed from the old text at start
+    inserted: int = 0  # Characters inserted into the new text at start
+
+class ScriptParseRequest(BaseModel):
+    text: str
+    previous_segments: Optional[List[SpeakerSegment]] = None  # Segments of the text before the edit
+    edit: Optional[ScriptEdit] = None
+
 class ChatGPTRequest(BaseModel):
     prompt: str
     context: Optional[str] = None
@@ -125,14 +278,41 @@ class ChatGPTRequest(BaseModel):
 class TranscriptionRequest(BaseModel):
     audio_url: str
 
+class RenderJob(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    episode_id: str
+    status: str = "queued"  # queued, running, completed, failed, cancelled
+    phase: Optional[str] = None  # synthesizing, assembling
+    gap_ms: Optional[int] = None
+    segments: List[SpeakerSegment] = []
+    total_segments: int = 0
+    completed_segments: List[int] = []
+    progress: float = 0.0
+    cached_segments: int = 0
+    reused_segments: int = 0
+    audio_url: Optional[str] = None
+    audio_duration: Optional[float] = None
+    error: Optional[str] = None
+    error_code: Optional[int] = None
+    cancel_requested: bool = False
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
 class AnalyticsStats(BaseModel):
+    """Daily rollup of download events for one episode"""
     model_config = ConfigDict(extra="ignore")
     
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     episode_id: str
-    downloads: int = 0
-    listeners: int = 0
-    average_listen_duration: float = 0.0
+    downloads: int = 0  # unique non-crawler clients that day
+    listeners: int = 0  # of those, clients that fetched at least ANALYTICS_LISTEN_MIN_FRACTION
+    average_listen_duration: float = 0.0  # percentage of the file reached
+    crawler_requests: int = 0
+    traffic_sources: Dict[str, int] = Field(default_factory=dict)
     date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class MusicFile(BaseModel):
@@ -143,8 +323,36 @@ class MusicFile(BaseModel):
     file_url: str
     category: str  # intro, outro, transition, background, episode
     duration: Optional[float] = None
+    sha256: Optional[str] = None
+    size_bytes: Optional[int] = None
+    blob_id: Optional[str] = None  # Shared content-addressed blob, e.g. "audio/<sha256>.mp3"
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class MusicFilePage(BaseModel):
+    items: List[MusicFile]
+    next_cursor: Optional[str] = None
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    content_type: Optional[str] = None
+    total_size: int
+    category: str = "background"
+
+class UploadSession(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    filename: str
+    content_type: str = ""
+    category: str = "background"
+    total_size: int
+    received_bytes: int = 0
+    status: str = "uploading"  # uploading, completed
+    file_id: Optional[str] = None
+    file_url: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
 class AudioEnhanceRequest(BaseModel):
     file_id: str
     remove_noise: bool = True
@@ -170,408 +378,3869 @@ VOICE_MAPPING = {
 # HELPER FUNCTIONS
 # ============================================================================
 
-def parse_speaker_segments(text: str) -> List[Dict[str, Any]]:
-    """Parse text with [SPEAKER] tags into segments"""
-    segments = []
-    current_speaker = "markus"  # default
-    lines = text.split('\n')
-    current_text = []
-    start_pos = 0
+# A line whose first non-blank character is "[" and that contains a "]"; the name runs to the first "]"
+SPEAKER_TAG_LINE = re.compile(r'(?P<line>[^\S\n]*\[(?P<name>[^\]\n]*)\](?P<rest>[^\n]*))')
+# Searching from the newline lets the regex engine skip ahead instead of trying every offset
+NEXT_SPEAKER_TAG_LINE = re.compile('\n' + SPEAKER_TAG_LINE.pattern)
+
+
+def scan_script(text: str, pos: int = 0, speaker: str = "markus") -> Iterator[Dict[str, Any]]:
+    """Single pass over [SPEAKER]-tagged text from the line starting at pos.
     
-    for line in lines:
-        # Check for speaker tags
-        if line.strip().startswith('[') and ']' in line:
-            # Save previous segment
-            if current_text:
-                segment_text = '\n'.join(current_text)
-                segments.append({
-                    "speaker": current_speaker.lower(),
-                    "text": segment_text,
-                    "start_position": start_pos,
-                    "end_position": start_pos + len(segment_text)
-                })
-                start_pos += len(segment_text)
-                current_text = []
-            
-            # Extract new speaker
-            tag_end = line.index(']')
-            speaker = line[1:tag_end].strip().lower()
-            if speaker in VOICE_MAPPING:
-                current_speaker = speaker
-            
-            # Add remaining text on this line
-            remaining = line[tag_end+1:].strip()
-            if remaining:
-                current_text.append(remaining)
+    A segment's text is the tag line's remainder (stripped) followed by the verbatim
+    lines up to the next tag line; start_position/end_position are the exact source
+    offsets of that content.
+    """
+    head, head_start, body_start = None, pos, pos
+    
+    def segment(next_line: int) -> Optional[Dict[str, Any]]:
+        # Body lines run from body_start up to the line starting at next_line
+        if body_start < next_line:
+            body = text[body_start:next_line - 1]
+            if head is None:
+                return {"speaker": speaker, "text": body, "start_position": body_start, "end_position": next_line - 1}
+            content = f"{head}\n{body}"
+        elif head is None:
+            return None
         else:
-            current_text.append(line)
-    
-    # Add final segment
-    if current_text:
-        segment_text = '\n'.join(current_text)
-        segments.append({
-            "speaker": current_speaker.lower(),
-            "text": segment_text,
-            "start_position": start_pos,
-            "end_position": start_pos + len(segment_text)
-        })
+            content = head
+        return {"speaker": speaker, "text": content, "start_position": head_start, "end_position": next_line - 1 if body_start < next_line else head_start + len(head)}
     
-    return segments
+    first = SPEAKER_TAG_LINE.match(text, pos)
+    for match in itertools.chain([first] if first else [], NEXT_SPEAKER_TAG_LINE.finditer(text, pos)):
+        current = segment(match.start('line'))
+        if current:
+            yield current
+        name = match.group('name').strip().lower()
+        if name in VOICE_MAPPING:
+            speaker = name
+        remainder = match.group('rest')
+        head = remainder.strip() or None
+        head_start = match.start('rest') + len(remainder) - len(remainder.lstrip())
+        body_start = match.end() + 1
+    
+    current = segment(len(text) + 1)
+    if current:
+        yield current
 
 
-# ============================================================================
-# API ENDPOINTS
-# ============================================================================
+def find_resume_point(text: str, segments: List[Dict[str, Any]], edit_start: int) -> Tuple[int, int]:
+    """(segments to keep, line offset to rescan from) for an edit at edit_start.
+    
+    Rescanning starts at the tag line of a segment that lies wholly before the edit
+    and names a known speaker, so no parser state has to be carried over.
+    """
+    index = 0
+    while index < len(segments) and segments[index]['start_position'] <= edit_start:
+        index += 1
+    for keep in range(index - 1, -1, -1):
+        # The tag line either holds the segment's first text or is the line before it
+        line_start = text.rfind('\n', 0, segments[keep]['start_position']) + 1
+        line_end = text.find('\n', line_start)
+        if line_end == -1:
+            line_end = len(text)
+        line = text[line_start:line_end]
+        if not SPEAKER_TAG_LINE.match(line) and line_start > 0:
+            line_end = line_start - 1
+            line_start = text.rfind('\n', 0, line_end) + 1
+            line = text[line_start:line_end]
+        if line_end >= edit_start:
+            continue
+        match = SPEAKER_TAG_LINE.match(line)
+        if match and match.group('name').strip().lower() in VOICE_MAPPING:
+            return keep, line_start
+    return 0, 0
 
-@api_router.get("/")
-async def root():
-    return {"message": "Podcast App API - Der Bazi mit Baraka"}
 
+def parse_speaker_segments(
+    text: str,
+    previous: Optional[List[Dict[str, Any]]] = None,
+    edit: Optional[Tuple[int, int, int]] = None
+) -> List[Dict[str, Any]]:
+    """Parse text with [SPEAKER] tags into segments.
+    
+    With the segments of the text before an edit and the edit as (start, deleted,
+    inserted), only the region around the edit is rescanned: segments before it are
+    kept, and once the scan is past the edit and lines up with an old segment, the
+    rest of the old segments are reused with shifted offsets.
+    """
+    if not previous or edit is None:
+        return list(scan_script(text))
+    
+    start, deleted, inserted = edit
+    delta = inserted - deleted
+    if start < 0 or start + inserted > len(text):
+        return list(scan_script(text))
+    
+    keep, resume_at = find_resume_point(text, previous, start)
+    old_by_start = {segment['start_position']: i for i, segment in enumerate(previous)}
+    result = previous[:keep]
+    for segment in scan_script(text, resume_at):
+        result.append(segment)
+        if segment['start_position'] < start + inserted:
+            continue
+        match = old_by_start.get(segment['start_position'] - delta)
+        if match is not None and previous[match]['speaker'] == segment['speaker'] and previous[match]['text'] == segment['text']:
+            # Same content with the same parser state: everything after it is unchanged too
+            for old in previous[match + 1:]:
+                result.append({
+                    "speaker": old['speaker'],
+                    "text": old['text'],
+                    "start_position": old['start_position'] + delta,
+                    "end_position": old['end_position'] + delta
+                })
+            break
+    return result
 
-# ============================================================================
-# EPISODES CRUD
-# ============================================================================
 
-@api_router.post("/episodes", response_model=Episode)
-async def create_episode(episode_input: EpisodeCreate):
-    """Create a new episode"""
-    try:
-        # Parse speaker segments if present
-        if not episode_input.speaker_segments:
-            segments = parse_speaker_segments(episode_input.text_content)
-            episode_input.speaker_segments = [SpeakerSegment(**seg) for seg in segments]
-        
-        # Auto-increment episode number
-        latest_episode = await db.episodes.find_one(
-            sort=[("metadata.episode_number", -1)]
-        )
-        if latest_episode and not episode_input.metadata.episode_number:
-            episode_input.metadata.episode_number = latest_episode.get("metadata", {}).get("episode_number", 0) + 1
-        elif not episode_input.metadata.episode_number:
-            episode_input.metadata.episode_number = 1
-        
-        episode = Episode(**episode_input.model_dump())
-        
-        # Save to database
-        doc = episode.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
-        doc['updated_at'] = doc['updated_at'].isoformat()
-        if doc.get('published_at'):
-            doc['published_at'] = doc['published_at'].isoformat()
-        if doc.get('metadata', {}).get('publish_date'):
-            doc['metadata']['publish_date'] = doc['metadata']['publish_date'].isoformat()
-        
-        await db.episodes.insert_one(doc)
-        logger.info(f"Created episode: {episode.id}")
-        
-        return episode
-    except Exception as e:
-        logger.error(f"Error creating episode: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+def script_statistics(segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-speaker segment, character and word counts plus a spoken-duration estimate"""
+    speakers: Dict[str, Dict[str, Any]] = {}
+    for segment in segments:
+        stats = speakers.setdefault(segment['speaker'], {"segments": 0, "characters": 0, "words": 0})
+        stats['segments'] += 1
+        stats['characters'] += len(segment['text'])
+        stats['words'] += len(segment['text'].split())
+    for stats in speakers.values():
+        stats['estimated_seconds'] = round(stats['words'] / SCRIPT_WORDS_PER_SECOND, 1)
+    return {
+        "segments": len(segments),
+        "characters": sum(stats['characters'] for stats in speakers.values()),
+        "words": sum(stats['words'] for stats in speakers.values()),
+        "estimated_seconds": round(sum(stats['words'] for stats in speakers.values()) / SCRIPT_WORDS_PER_SECOND, 1),
+        "speakers": speakers
+    }
 
 
-@api_router.get("/episodes", response_model=List[Episode])
-async def get_episodes(limit: int = 50, skip: int = 0):
-    """Get all episodes"""
-    try:
-        episodes = await db.episodes.find(
-            {}, {"_id": 0}
-        ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-        
-        # Convert ISO strings back to datetime
-        for ep in episodes:
-            if isinstance(ep.get('created_at'), str):
-                ep['created_at'] = datetime.fromisoformat(ep['created_at'])
-            if isinstance(ep.get('updated_at'), str):
-                ep['updated_at'] = datetime.fromisoformat(ep['updated_at'])
-            if ep.get('published_at') and isinstance(ep['published_at'], str):
-                ep['published_at'] = datetime.fromisoformat(ep['published_at'])
-            if ep.get('metadata', {}).get('publish_date') and isinstance(ep['metadata']['publish_date'], str):
-                ep['metadata']['publish_date'] = datetime.fromisoformat(ep['metadata']['publish_date'])
-        
-        return episodes
-    except Exception as e:
-        logger.error(f"Error fetching episodes: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+async def iter_file(path: Path, chunk_size: int = TTS_STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    async with aiofiles.open(path, 'rb') as f:
+        while chunk := await f.read(chunk_size):
+            yield chunk
 
 
-@api_router.get("/episodes/{episode_id}", response_model=Episode)
-async def get_episode(episode_id: str):
-    """Get a single episode"""
-    try:
-        episode = await db.episodes.find_one({"id": episode_id}, {"_id": 0})
-        if not episode:
-            raise HTTPException(status_code=404, detail="Episode not found")
-        
-        # Convert ISO strings back to datetime
-        if isinstance(episode.get('created_at'), str):
-            episode['created_at'] = datetime.fromisoformat(episode['created_at'])
-        if isinstance(episode.get('updated_at'), str):
-            episode['updated_at'] = datetime.fromisoformat(episode['updated_at'])
-        if episode.get('published_at') and isinstance(episode['published_at'], str):
-            episode['published_at'] = datetime.fromisoformat(episode['published_at'])
-        if episode.get('metadata', {}).get('publish_date') and isinstance(episode['metadata']['publish_date'], str):
-            episode['metadata']['publish_date'] = datetime.fromisoformat(episode['metadata']['publish_date'])
-        
-        return episode
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error fetching episode: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+def normalize_tts_text(text: str) -> str:
+    """Normalize text before synthesis so cosmetic whitespace changes hit the cache"""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n")
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in text.split("\n")]
+    return "\n".join(lines).strip()
 
 
-@api_router.put("/episodes/{episode_id}", response_model=Episode)
-async def update_episode(episode_id: str, update_data: EpisodeUpdate):
-    """Update an episode"""
+# Sentence ends: terminal punctuation followed by whitespace and something that starts a sentence
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])\s+(?=["„»(\[0-9A-ZÄÖÜ])')
+
+
+def split_tts_text(text: str, target_chars: int) -> List[str]:
+    """Split text at paragraph and sentence boundaries into pieces of about target_chars.
+    
+    A sentence longer than target_chars is cut at the last comma or space before the limit.
+    """
+    sentences = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        for sentence in SENTENCE_BOUNDARY.split(paragraph.strip()):
+            while len(sentence) > target_chars:
+                window = sentence[:target_chars]
+                cut = max(window.rfind(', '), window.rfind('; '))
+                if cut < target_chars // 2:
+                    cut = window.rfind(' ')
+                cut = cut + 1 if cut > 0 else target_chars
+                sentences.append(sentence[:cut].strip())
+                sentence = sentence[cut:].strip()
+            if sentence:
+                sentences.append(sentence)
+    
+    pieces: List[str] = []
+    for sentence in sentences:
+        if pieces and len(pieces[-1]) + 1 + len(sentence) <= target_chars:
+            pieces[-1] = f"{pieces[-1]} {sentence}"
+        else:
+            pieces.append(sentence)
+    return pieces or [text]
+
+
+def link_or_copy(source: Path, destination: Path) -> None:
+    """Hardlink source to destination (atomically replacing it), copying if linking is not possible"""
+    if destination.exists() and os.path.samefile(source, destination):
+        return
+    part_path = destination.with_name(f"{destination.name}.{uuid.uuid4().hex[:8]}.part")
     try:
-        episode = await db.episodes.find_one({"id": episode_id}, {"_id": 0})
-        if not episode:
-            raise HTTPException(status_code=404, detail="Episode not found")
-        
-        # Prepare update
-        update_dict = {k: v for k, v in update_data.model_dump(exclude_unset=True).items() if v is not None}
-        update_dict['updated_at'] = datetime.now(timezone.utc).isoformat()
-        
-        # Re-parse speaker segments if text changed
-        if 'text_content' in update_dict and not update_data.speaker_segments:
-            segments = parse_speaker_segments(update_dict['text_content'])
-            update_dict['speaker_segments'] = segments
-        
-        await db.episodes.update_one(
-            {"id": episode_id},
-            {"$set": update_dict}
-        )
-        
-        # Fetch updated episode
-        updated_episode = await db.episodes.find_one({"id": episode_id}, {"_id": 0})
-        
-        # Convert ISO strings back to datetime
-        if isinstance(updated_episode.get('created_at'), str):
-            updated_episode['created_at'] = datetime.fromisoformat(updated_episode['created_at'])
-        if isinstance(updated_episode.get('updated_at'), str):
-            updated_episode['updated_at'] = datetime.fromisoformat(updated_episode['updated_at'])
-        if updated_episode.get('published_at') and isinstance(updated_episode['published_at'], str):
-            updated_episode['published_at'] = datetime.fromisoformat(updated_episode['published_at'])
-        if updated_episode.get('metadata', {}).get('publish_date') and isinstance(updated_episode['metadata']['publish_date'], str):
-            updated_episode['metadata']['publish_date'] = datetime.fromisoformat(updated_episode['metadata']['publish_date'])
-        
-        logger.info(f"Updated episode: {episode_id}")
-        return updated_episode
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error updating episode: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        os.link(source, part_path)
+    except OSError:
+        shutil.copyfile(source, part_path)
+    part_path.replace(destination)
 
 
-@api_router.delete("/episodes/{episode_id}")
-async def delete_episode(episode_id: str):
-    """Delete an episode"""
+def safe_filename(filename: Optional[str]) -> str:
+    """Client supplied filename reduced to its last path component"""
+    return Path(filename or "upload").name or "upload"
+
+
+def resolve_media_storage(content_type: str) -> tuple:
+    """Storage directory and URL prefix for a media content type"""
+    if content_type.startswith('audio/'):
+        return AUDIO_DIR, '/api/audio'
+    elif content_type.startswith('video/'):
+        return VIDEO_DIR, '/api/video'
+    elif content_type.startswith('image/'):
+        return IMAGE_DIR, '/api/image'
+    else:
+        # Default to audio
+        return AUDIO_DIR, '/api/audio'
+
+
+def hash_file(path: Path) -> str:
+    """SHA-256 of a file, read in bounded chunks"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def upload_too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Datei zu groß (maximal {max_bytes // (1024 * 1024)} MB)"
+    )
+
+
+async def save_upload_stream(
+    request: Request,
+    destination: Path,
+    field_name: str = "file",
+    max_bytes: int = MAX_UPLOAD_BYTES
+) -> Dict[str, Any]:
+    """Write the file part field_name of a multipart/form-data request to disk as it arrives, hashing it on the fly.
+    
+    The body is parsed straight from the request stream, so the file is written once
+    and never spooled. A Content-Length over the limit is rejected before any of the
+    body is read; otherwise 413 is raised once the bytes written pass max_bytes, and
+    nothing is left on disk then.
+    """
+    content_type, params = parse_options_header(request.headers.get('content-type', ''))
+    if content_type != b'multipart/form-data' or b'boundary' not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise upload_too_large(max_bytes)
+    
+    part: Dict[str, Any] = {}
+    header_field = bytearray()
+    header_value = bytearray()
+    pending: List[bytes] = []
+    upload: Dict[str, Any] = {}
+    
+    def on_part_begin() -> None:
+        part.clear()
+        part['headers'] = {}
+    
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        header_field.extend(data[start:end])
+    
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        header_value.extend(data[start:end])
+    
+    def on_header_end() -> None:
+        part['headers'][bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+    
+    def on_headers_finished() -> None:
+        _, disposition = parse_options_header(part['headers'].get(b'content-disposition', b''))
+        # Only the first part with the expected field name and a filename is the upload
+        if not upload and disposition.get(b'name') == field_name.encode() and b'filename' in disposition:
+            upload['filename'] = disposition[b'filename'].decode('utf-8', errors='replace')
+            upload['content_type'] = part['headers'].get(b'content-type', b'').decode('latin-1')
+            upload['done'] = False
+            part['is_upload'] = True
+    
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        if part.get('is_upload'):
+            pending.append(data[start:end])
+    
+    def on_part_end() -> None:
+        if part.get('is_upload'):
+            upload['done'] = True
+    
+    parser = MultipartParser(params[b'boundary'], {
+        'on_part_begin': on_part_begin,
+        'on_header_field': on_header_field,
+        'on_header_value': on_header_value,
+        'on_header_end': on_header_end,
+        'on_headers_finished': on_headers_finished,
+        'on_part_data': on_part_data,
+        'on_part_end': on_part_end
+    })
+    
+    sha256 = hashlib.sha256()
+    size = 0
+    part_path = destination.with_name(f"{destination.name}.{uuid.uuid4().hex[:8]}.part")
     try:
-        result = await db.episodes.delete_one({"id": episode_id})
-        if result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail="Episode not found")
-        
-        logger.info(f"Deleted episode: {episode_id}")
-        return {"message": "Episode deleted successfully"}
-    except HTTPException:
+        async with aiofiles.open(part_path, 'wb') as out_file:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                for data in pending:
+                    size += len(data)
+                    if size > max_bytes:
+                        raise upload_too_large(max_bytes)
+                    sha256.update(data)
+                    await out_file.write(data)
+                pending.clear()
+        parser.finalize()
+        if not upload.get('done'):
+            raise HTTPException(status_code=400, detail=f"Multipart body has no complete '{field_name}' file")
+        part_path.replace(destination)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
         raise
-    except Exception as e:
-        logger.error(f"Error deleting episode: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "sha256": sha256.hexdigest(),
+        "size_bytes": size,
+        "filename": upload['filename'],
+        "content_type": upload['content_type']
+    }
 
 
 # ============================================================================
-# TEXT-TO-SPEECH (ElevenLabs)
+# TTS PROVIDERS
 # ============================================================================
 
-@api_router.post("/tts/generate")
-async def generate_tts(request: TTSRequest):
-    """Generate audio from text using ElevenLabs"""
+class TTSError(Exception):
+    """A classified TTS provider failure.
+    
+    kind is one of: auth, quota, invalid (permanent) or rate_limited,
+    unavailable, network (transient, worth retrying).
+    """
+    
+    PERMANENT_KINDS = {"auth", "quota", "invalid"}
+    
+    def __init__(self, kind: str, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.kind = kind
+        self.status_code = status_code
+        self.retry_after = retry_after
+    
+    @property
+    def permanent(self) -> bool:
+        return self.kind in self.PERMANENT_KINDS
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds from now; the header is either delta-seconds or an HTTP date"""
+    if not value:
+        return None
     try:
-        voice_id = VOICE_MAPPING.get(request.voice.lower(), VOICE_MAPPING["markus"])
-        
-        # Prepare voice settings
-        voice_settings = VoiceSettings(
-            stability=request.voice_settings.stability if request.voice_settings else 0.75,
-            similarity_boost=request.voice_settings.similarity_boost if request.voice_settings else 0.85,
-            style=request.voice_settings.style if request.voice_settings else 0.0,
-            use_speaker_boost=request.voice_settings.use_speaker_boost if request.voice_settings else True
-        )
-        
-        # Generate audio
-        logger.info(f"Generating TTS with voice: {request.voice}")
-        audio_generator = elevenlabs_client.text_to_speech.convert(
-            voice_id=voice_id,
-            text=request.text,
-            model_id="eleven_multilingual_v2",
-            voice_settings=voice_settings
-        )
-        
-        # Save audio file
-        audio_filename = f"{uuid.uuid4()}.mp3"
-        audio_path = AUDIO_DIR / audio_filename
-        
-        # Write audio chunks to file
-        with open(audio_path, "wb") as audio_file:
-            for chunk in audio_generator:
-                audio_file.write(chunk)
-        
-        audio_url = f"/api/audio/{audio_filename}"
-        logger.info(f"TTS generated successfully: {audio_url}")
-        
-        return {
-            "audio_url": audio_url,
-            "filename": audio_filename,
-            "voice": request.voice
-        }
-    except Exception as e:
-        logger.error(f"Error generating TTS: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"TTS generation failed: {str(e)}")
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
 
 
-@api_router.post("/tts/generate-episode/{episode_id}")
-async def generate_episode_audio(episode_id: str):
-    """Generate audio for an entire episode with multiple speakers"""
+def classify_tts_response(status_code: int, body: bytes, headers: httpx.Headers) -> TTSError:
     try:
-        episode = await db.episodes.find_one({"id": episode_id}, {"_id": 0})
-        if not episode:
-            raise HTTPException(status_code=404, detail="Episode not found")
-        
-        # Update status
-        await db.episodes.update_one(
-            {"id": episode_id},
-            {"$set": {"status": "processing"}}
+        detail = json.loads(body).get('detail')
+    except (ValueError, AttributeError):
+        detail = None
+    if isinstance(detail, dict):
+        code = str(detail.get('status') or '')
+        message = str(detail.get('message') or code)
+    else:
+        code = ''
+        message = str(detail or body[:200].decode('utf-8', 'replace') or f"HTTP {status_code}")
+    
+    retry_after = parse_retry_after(headers.get('retry-after'))
+    if status_code == 402 or code in ("quota_exceeded", "detected_unusual_activity") or "free tier" in message.lower():
+        return TTSError("quota", message, status_code)
+    if status_code in (401, 403):
+        return TTSError("auth", message, status_code)
+    if status_code == 429:
+        return TTSError("rate_limited", message, status_code, retry_after)
+    if status_code == 408 or status_code >= 500:
+        return TTSError("unavailable", message, status_code, retry_after)
+    return TTSError("invalid", message, status_code)
+
+
+def is_permanent_tts_error(error: Exception) -> bool:
+    """Errors that will not go away by retrying (auth, quota/free tier limit, bad request)"""
+    return isinstance(error, TTSError) and error.permanent
+
+
+def tts_error_status(error: TTSError) -> int:
+    """HTTP status to answer our own clients with for a provider failure"""
+    return {"auth": 401, "quota": 402, "invalid": 400, "rate_limited": 429}.get(error.kind, 502)
+
+
+class TTSProvider:
+    """Streams synthesized MP3 audio for (voice_id, text, voice settings)"""
+    
+    name = "base"
+    
+    def stream(
+        self,
+        voice_id: str,
+        text: str,
+        settings: Dict[str, Any],
+        context: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[bytes]:
+        """context may carry previous_text/next_text for prosody continuity across pieces"""
+        raise NotImplementedError
+    
+    async def subscription(self) -> Optional[Dict[str, Any]]:
+        """Character quota: character_limit, character_count, resets_at; None if not reported"""
+        return None
+    
+    async def aclose(self) -> None:
+        pass
+
+
+class ElevenLabsProvider(TTSProvider):
+    """ElevenLabs REST API over one shared keep-alive connection pool"""
+    
+    name = "elevenlabs"
+    
+    def __init__(self, api_key: Optional[str], base_url: str, max_connections: int):
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"xi-api-key": api_key or "", "accept": "audio/mpeg"},
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=120
+            ),
+            timeout=httpx.Timeout(60.0, connect=10.0)
         )
-        
-        # Get speaker segments
-        segments = episode.get('speaker_segments', [])
-        if not segments:
-            # Parse from text
-            segments = parse_speaker_segments(episode['text_content'])
-        
-        # Try to generate audio with ElevenLabs
+    
+    async def stream(
+        self,
+        voice_id: str,
+        text: str,
+        settings: Dict[str, Any],
+        context: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[bytes]:
+        payload = {"text": text, "model_id": TTS_MODEL_ID, "voice_settings": settings}
+        payload.update({key: value for key, value in (context or {}).items() if value})
         try:
-            audio_files = []
-            for i, segment in enumerate(segments):
-                voice_id = VOICE_MAPPING.get(segment['speaker'].lower(), VOICE_MAPPING["markus"])
-                
-                voice_settings = VoiceSettings(
-                    stability=episode.get('voice_settings', {}).get('stability', 0.75),
-                    similarity_boost=episode.get('voice_settings', {}).get('similarity_boost', 0.85),
-                    style=episode.get('voice_settings', {}).get('style', 0.0),
-                    use_speaker_boost=episode.get('voice_settings', {}).get('use_speaker_boost', True)
-                )
-                
-                logger.info(f"Generating segment {i+1}/{len(segments)} with voice: {segment['speaker']}")
-                audio_generator = elevenlabs_client.text_to_speech.convert(
-                    voice_id=voice_id,
-                    text=segment['text'],
-                    model_id="eleven_multilingual_v2",
-                    voice_settings=voice_settings
-                )
-                
-                segment_filename = f"{episode_id}_segment_{i}.mp3"
-                segment_path = AUDIO_DIR / segment_filename
-                
-                with open(segment_path, "wb") as audio_file:
-                    for chunk in audio_generator:
-                        audio_file.write(chunk)
-                
-                audio_files.append(segment_filename)
-            
-            # For MVP, we'll return the first segment
-            final_audio_url = f"/api/audio/{audio_files[0]}" if audio_files else None
-            
-        except Exception as elevenlabs_error:
-            # ElevenLabs failed - likely free tier limit
-            logger.warning(f"ElevenLabs TTS failed: {str(elevenlabs_error)}")
-            
-            # Return detailed error message to user
-            error_detail = str(elevenlabs_error)
-            if "unusual_activity" in error_detail.lower() or "free tier" in error_detail.lower() or "401" in error_detail:
-                raise HTTPException(
-                    status_code=402,
-                    detail="ElevenLabs Free-Tier-Limit erreicht. Bitte verwenden Sie einen Paid Plan API-Key für die Audio-Generierung. Die Episode wurde gespeichert und kann später mit einem gültigen API-Key bearbeitet werden."
-                )
-            else:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Audio-Generierung fehlgeschlagen: {error_detail}. Bitte überprüfen Sie Ihren ElevenLabs API-Key."
-                )
-        
-        # Update episode with audio URL
-        await db.episodes.update_one(
-            {"id": episode_id},
-            {"$set": {
-                "audio_url": final_audio_url,
-                "status": "completed",
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }}
+            async with self.client.stream(
+                "POST",
+                f"/v1/text-to-speech/{voice_id}/stream",
+                params={"output_format": TTS_OUTPUT_FORMAT},
+                json=payload
+            ) as response:
+                if response.status_code != 200:
+                    raise classify_tts_response(response.status_code, await response.aread(), response.headers)
+                async for chunk in response.aiter_bytes():
+                    yield chunk
+        except httpx.TransportError as e:
+            raise TTSError("network", f"{type(e).__name__}: {e}") from e
+    
+    async def subscription(self) -> Optional[Dict[str, Any]]:
+        response = await self.client.get("/v1/user/subscription", headers={"accept": "application/json"})
+        if response.status_code != 200:
+            raise classify_tts_response(response.status_code, response.content, response.headers)
+        data = response.json()
+        reset = data.get('next_character_count_reset_unix')
+        return {
+            "character_limit": data['character_limit'],
+            "character_count": data['character_count'],
+            "resets_at": datetime.fromtimestamp(reset, timezone.utc) if reset else None
+        }
+    
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+# One silent MPEG-1 Layer III frame: 128 kbit/s, 44.1 kHz, stereo, no padding (417 bytes, 1152 samples)
+SILENT_MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0x00]) + bytes(413)
+
+
+class FakeTTSProvider(TTSProvider):
+    """Local stand-in for tests and benchmarks: silent MP3 sized to the text, after a fixed latency.
+    
+    failure_rate injects transient 503s to exercise the retry path; errors put in
+    failures are raised by the next calls, one per call, before any audio is sent.
+    """
+    
+    name = "fake"
+    
+    def __init__(self, latency: float, failure_rate: float = 0.0, chars_per_second: float = 15.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.chars_per_second = chars_per_second
+        self.failures: deque = deque()
+        self.calls = 0
+    
+    async def stream(
+        self,
+        voice_id: str,
+        text: str,
+        settings: Dict[str, Any],
+        context: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[bytes]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.failures:
+            raise self.failures.popleft()
+        if random.random() < self.failure_rate:
+            raise TTSError("unavailable", "Injected failure", 503)
+        frames = max(1, int(len(text) / self.chars_per_second * 44100 / 1152))
+        for start in range(0, frames, 64):
+            yield SILENT_MP3_FRAME * min(64, frames - start)
+
+
+def create_tts_provider() -> TTSProvider:
+    if TTS_PROVIDER == "fake":
+        return FakeTTSProvider(TTS_FAKE_LATENCY_SECONDS, TTS_FAKE_FAILURE_RATE)
+    return ElevenLabsProvider(os.environ.get('ELEVENLABS_API_KEY'), ELEVENLABS_API_URL, TTS_HTTP_MAX_CONNECTIONS)
+
+
+tts_provider = create_tts_provider()
+
+
+class TokenBucket:
+    """Refills at rate tokens per second up to capacity; a rate of 0 means unlimited"""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount can be taken (requests larger than the bucket only need a full one)"""
+        if not self.rate:
+            return 0.0
+        self._refill()
+        needed = min(amount, self.capacity)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+    
+    def take(self, amount: float) -> None:
+        if self.rate:
+            self.tokens -= amount
+
+
+class TTSScheduler:
+    """Single admission point for every provider call.
+    
+    Interactive requests are always served first and have reserved slots; batch
+    requests share what is left, round-robin across groups (episodes). Request and
+    character token buckets pace calls to the provider's rate limits, and batch work
+    stops short of the last batch_quota_reserve characters of the plan's quota.
+    """
+    
+    PRIORITIES = ("interactive", "batch")
+    
+    def __init__(
+        self,
+        concurrency: int,
+        interactive_reserved: int,
+        requests_per_minute: float,
+        characters_per_minute: float,
+        batch_quota_reserve: int
+    ):
+        self.concurrency = concurrency
+        self.interactive_reserved = min(interactive_reserved, concurrency - 1)
+        self.request_bucket = TokenBucket(requests_per_minute / 60, requests_per_minute)
+        self.character_bucket = TokenBucket(characters_per_minute / 60, characters_per_minute)
+        self.batch_quota_reserve = batch_quota_reserve
+        self.active = {priority: 0 for priority in self.PRIORITIES}
+        self._interactive: "deque[Tuple[asyncio.Future, int]]" = deque()
+        self._batch: "OrderedDict[str, deque]" = OrderedDict()  # group -> waiters, in round-robin order
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        # Quota as last reported by the provider, plus what was sent since
+        self.character_limit: Optional[int] = None
+        self.character_count: Optional[int] = None
+        self.quota_resets_at: Optional[datetime] = None
+        self.requests_sent = {priority: 0 for priority in self.PRIORITIES}
+        self.characters_sent = {priority: 0 for priority in self.PRIORITIES}
+        self.quota_rejections = 0
+    
+    @property
+    def remaining_characters(self) -> Optional[int]:
+        if self.character_limit is None or self.character_count is None:
+            return None
+        return max(self.character_limit - self.character_count, 0)
+    
+    @asynccontextmanager
+    async def slot(self, characters: int, priority: str = "batch", group: str = "") -> AsyncIterator[None]:
+        """Hold one provider call slot; characters are charged against the quota unless the call fails"""
+        future = asyncio.get_running_loop().create_future()
+        waiter = (future, characters)
+        if priority == "interactive":
+            self._interactive.append(waiter)
+        else:
+            self._batch.setdefault(group, deque()).append(waiter)
+        self._dispatch()
+        
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted in the same tick the waiter was cancelled
+                self._release(priority, characters, succeeded=False)
+            raise
+        
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            self._release(priority, characters, succeeded)
+    
+    def _release(self, priority: str, characters: int, succeeded: bool) -> None:
+        self.active[priority] -= 1
+        if not succeeded and self.character_count is not None:
+            # The provider only bills characters of successful requests
+            self.character_count -= characters
+        self._dispatch()
+    
+    def _quota_allows(self, priority: str, characters: int) -> bool:
+        remaining = self.remaining_characters
+        if remaining is None:
+            return True
+        reserve = 0 if priority == "interactive" else self.batch_quota_reserve
+        return remaining - characters >= reserve
+    
+    def _next_waiter(self) -> Optional[Tuple[str, deque]]:
+        """(priority, queue) of the next waiter allowed to run, honouring the interactive reservation"""
+        running = sum(self.active.values())
+        if running >= self.concurrency:
+            return None
+        while self._interactive and self._interactive[0][0].done():
+            self._interactive.popleft()
+        if self._interactive:
+            return "interactive", self._interactive
+        if running >= self.concurrency - self.interactive_reserved:
+            return None
+        while self._batch:
+            group, waiters = next(iter(self._batch.items()))
+            while waiters and waiters[0][0].done():
+                waiters.popleft()
+            if waiters:
+                return "batch", waiters
+            del self._batch[group]
+        return None
+    
+    def _dispatch(self) -> None:
+        while (candidate := self._next_waiter()) is not None:
+            priority, waiters = candidate
+            future, characters = waiters[0]
+            
+            if not self._quota_allows(priority, characters):
+                waiters.popleft()
+                self.quota_rejections += 1
+                future.set_exception(TTSError(
+                    "quota", f"Character quota exhausted ({self.remaining_characters} characters left)"
+                ))
+                continue
+            
+            wait = max(self.request_bucket.wait_time(1), self.character_bucket.wait_time(characters))
+            if wait > 0:
+                # Strict order: nobody overtakes the waiter at the head while the buckets refill
+                if self._wakeup is None:
+                    self._wakeup = asyncio.get_running_loop().call_later(wait, self._wake)
+                return
+            
+            waiters.popleft()
+            if priority == "batch":
+                # Round-robin: this episode goes to the back of the line
+                self._batch.move_to_end(next(iter(self._batch)))
+            self.request_bucket.take(1)
+            self.character_bucket.take(characters)
+            self.active[priority] += 1
+            self.requests_sent[priority] += 1
+            self.characters_sent[priority] += characters
+            if self.character_count is not None:
+                self.character_count += characters
+            future.set_result(None)
+    
+    def _wake(self) -> None:
+        self._wakeup = None
+        self._dispatch()
+    
+    async def refresh_quota(self) -> None:
+        subscription = await tts_provider.subscription()
+        if subscription:
+            self.character_limit = subscription['character_limit']
+            self.character_count = subscription['character_count']
+            self.quota_resets_at = subscription.get('resets_at')
+            self._dispatch()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": tts_provider.name,
+            "concurrency": self.concurrency,
+            "interactive_reserved": self.interactive_reserved,
+            "active": dict(self.active),
+            "waiting": {
+                "interactive": sum(1 for future, _ in self._interactive if not future.done()),
+                "batch": {
+                    group: count for group, waiters in self._batch.items()
+                    if (count := sum(1 for future, _ in waiters if not future.done()))
+                }
+            },
+            "requests_sent": dict(self.requests_sent),
+            "characters_sent": dict(self.characters_sent),
+            "quota": {
+                "character_limit": self.character_limit,
+                "character_count": self.character_count,
+                "remaining_characters": self.remaining_characters,
+                "batch_reserve": self.batch_quota_reserve,
+                "resets_at": self.quota_resets_at,
+                "rejections": self.quota_rejections
+            }
+        }
+
+
+tts_scheduler = TTSScheduler(
+    TTS_CONCURRENCY,
+    TTS_INTERACTIVE_RESERVED_SLOTS,
+    TTS_REQUESTS_PER_MINUTE,
+    TTS_CHARACTERS_PER_MINUTE,
+    TTS_BATCH_QUOTA_RESERVE
+)
+
+
+async def refresh_tts_quota_forever(interval: float) -> None:
+    while True:
+        try:
+            await tts_scheduler.refresh_quota()
+        except Exception as e:
+            logger.warning(f"Could not refresh TTS quota: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+def tts_retry_delay(attempt: int, error: TTSError) -> float:
+    """Full-jitter exponential backoff, never shorter than the provider's Retry-After"""
+    delay = random.uniform(0, min(TTS_RETRY_MAX_DELAY, TTS_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+    if error.retry_after is not None:
+        delay = max(delay, min(error.retry_after, TTS_RETRY_MAX_DELAY))
+    return delay
+
+
+async def stream_tts_with_retries(
+    voice_id: str,
+    text: str,
+    settings: Dict[str, Any],
+    label: str,
+    priority: str = "interactive",
+    group: str = ""
+) -> AsyncIterator[bytes]:
+    """Scheduled provider stream that retries transient failures until the first audio byte arrives.
+    
+    Once audio has been handed out a failure is final, since a retry would repeat it.
+    """
+    for attempt in range(1, TTS_MAX_RETRIES + 1):
+        started = False
+        try:
+            async with tts_scheduler.slot(len(text), priority, group):
+                async for chunk in tts_provider.stream(voice_id, text, settings):
+                    started = True
+                    yield chunk
+            return
+        except TTSError as e:
+            if started or e.permanent or attempt >= TTS_MAX_RETRIES:
+                raise
+            delay = tts_retry_delay(attempt, e)
+            logger.warning(f"TTS {label} failed (attempt {attempt}/{TTS_MAX_RETRIES}, {e.kind}), retrying in {delay:.1f}s: {str(e)}")
+            await asyncio.sleep(delay)
+
+
+async def synthesize_to_file(
+    voice_id: str,
+    text: str,
+    settings: Dict[str, Any],
+    output_path: Path,
+    label: str = "",
+    priority: str = "interactive",
+    group: str = "",
+    context: Optional[Dict[str, str]] = None
+) -> None:
+    """Synthesize into output_path through the scheduler, retrying transient provider failures"""
+    for attempt in range(1, TTS_MAX_RETRIES + 1):
+        # Write to a private temp file first so a failed or abandoned attempt never leaves
+        # a truncated segment behind or races with a newer attempt for the same output
+        part_path = output_path.with_name(f"{output_path.name}.{uuid.uuid4().hex[:8]}.part")
+        try:
+            async with tts_scheduler.slot(len(text), priority, group):
+                async with aiofiles.open(part_path, "wb") as audio_file:
+                    async for chunk in tts_provider.stream(voice_id, text, settings, context):
+                        await audio_file.write(chunk)
+            part_path.replace(output_path)
+            return
+        except TTSError as e:
+            if e.permanent or attempt >= TTS_MAX_RETRIES:
+                raise
+            delay = tts_retry_delay(attempt, e)
+            logger.warning(f"TTS {label} failed (attempt {attempt}/{TTS_MAX_RETRIES}, {e.kind}), retrying in {delay:.1f}s: {str(e)}")
+            await asyncio.sleep(delay)
+        finally:
+            part_path.unlink(missing_ok=True)
+
+
+class SharedTTSStream:
+    """One provider stream, teed to output_path and fanned out to every listener.
+    
+    The provider stream is drained by a background task. It keeps running if the
+    clients go away, so the rendering still lands on disk and on_complete still fires.
+    Listeners that join late first get the chunks that already arrived.
+    """
+    
+    def __init__(
+        self,
+        voice_id: str,
+        text: str,
+        settings: Dict[str, Any],
+        output_path: Path,
+        on_complete: Optional[Callable[[], None]] = None
+    ):
+        self.output_path = output_path
+        self.chunks: List[bytes] = []
+        self.error: Optional[Exception] = None
+        self.done = False
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._run(voice_id, text, settings, on_complete))
+        background_tasks.add(self.task)
+        self.task.add_done_callback(background_tasks.discard)
+    
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+    
+    async def _run(
+        self,
+        voice_id: str,
+        text: str,
+        settings: Dict[str, Any],
+        on_complete: Optional[Callable[[], None]]
+    ) -> None:
+        part_path = self.output_path.with_name(f"{self.output_path.name}.{uuid.uuid4().hex[:8]}.part")
+        try:
+            async with aiofiles.open(part_path, "wb") as audio_file:
+                async for chunk in stream_tts_with_retries(voice_id, text, settings, "stream"):
+                    await audio_file.write(chunk)
+                    self.chunks.append(chunk)
+                    self._notify()
+            part_path.replace(self.output_path)
+            if on_complete:
+                on_complete()
+        except Exception as e:
+            part_path.unlink(missing_ok=True)
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+    
+    async def listen(self) -> AsyncIterator[bytes]:
+        index = 0
+        while True:
+            if index < len(self.chunks):
+                index += 1
+                yield self.chunks[index - 1]
+                continue
+            if self.done:
+                if self.error:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+# Previews being synthesized, by TTS cache key; identical requests join the running stream
+tts_streams: Dict[str, SharedTTSStream] = {}
+
+
+def start_tts_stream(
+    cache_key: str,
+    voice_id: str,
+    text: str,
+    settings: Dict[str, Any],
+    output_path: Path
+) -> SharedTTSStream:
+    """Start a preview stream that later identical requests can join; it fills the TTS cache when it completes"""
+    shared = SharedTTSStream(
+        voice_id,
+        text,
+        settings,
+        output_path,
+        on_complete=lambda: tts_cache.add(cache_key, output_path)
+    )
+    tts_streams[cache_key] = shared
+    
+    def forget(_: asyncio.Task) -> None:
+        if tts_streams.get(cache_key) is shared:
+            del tts_streams[cache_key]
+    
+    shared.task.add_done_callback(forget)
+    return shared
+
+
+# ============================================================================
+# MEDIA FILE SERVING
+# ============================================================================
+
+# "<sha256><ext>" names are content-addressed: the bytes behind them never change
+CONTENT_ADDRESSED_NAME = re.compile(r"[0-9a-f]{64}(\.[a-z0-9]{1,8})?")
+
+FileRegion = Tuple[int, int]  # (offset, length)
+
+
+class MediaFileIndex:
+    """In-memory metadata for served media files, so hot requests skip the filesystem lookup.
+    
+    Content-addressed names stay cached until invalidated; other files are
+    re-checked once their entry is older than revalidate_seconds.
+    """
+    
+    def __init__(self, max_entries: int, revalidate_seconds: float):
+        self.max_entries = max_entries
+        self.revalidate_seconds = revalidate_seconds
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    
+    def lookup(self, directory: Path, filename: str) -> Optional[Dict[str, Any]]:
+        """Metadata for a servable file, or None if there is none"""
+        if filename.startswith('.'):
+            # In-progress writes (.part, .incoming, .upload) are never served
+            return None
+        
+        path = directory / filename
+        key = str(path)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry and (entry['immutable'] or now - entry['checked_at'] < self.revalidate_seconds):
+            self._entries.move_to_end(key)
+            return entry
+        
+        try:
+            stat = path.stat()
+        except OSError:
+            self._entries.pop(key, None)
+            return None
+        if not path.is_file():
+            return None
+        
+        immutable = CONTENT_ADDRESSED_NAME.fullmatch(filename) is not None
+        if immutable:
+            etag = f'"{filename.split(".")[0]}"'
+        else:
+            etag = f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        
+        entry = {
+            "path": path,
+            "size": stat.st_size,
+            "etag": etag,
+            "last_modified": formatdate(stat.st_mtime, usegmt=True),
+            "mtime": int(stat.st_mtime),
+            "immutable": immutable,
+            "checked_at": now
+        }
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+    
+    def invalidate(self, path: Path) -> None:
+        self._entries.pop(str(path), None)
+
+
+media_index = MediaFileIndex(MEDIA_INDEX_MAX_ENTRIES, MEDIA_INDEX_REVALIDATE_SECONDS)
+
+
+class MediaFileResponse(Response):
+    """Sends a sequence of file regions and literal byte strings (multipart boundaries).
+    
+    Uses the ASGI zero-copy send extension when the server offers it, otherwise
+    reads the regions in chunks off the event loop.
+    """
+    
+    def __init__(
+        self,
+        path: Path,
+        parts: List[Union[bytes, FileRegion]],
+        status_code: int,
+        headers: Dict[str, str],
+        media_type: str
+    ):
+        self.path = path
+        self.parts = parts
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers["content-length"] = str(sum(
+            len(part) if isinstance(part, bytes) else part[1] for part in parts
+        ))
+    
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            fd = await asyncio.to_thread(os.open, self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            # Removed since it was indexed
+            media_index.invalidate(self.path)
+            await Response("Not Found", status_code=404)(scope, receive, send)
+            return
+        
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if scope["method"] != "HEAD":
+                zero_copy = "http.response.zerocopysend" in scope.get("extensions", {})
+                for part in self.parts:
+                    if isinstance(part, bytes):
+                        await send({"type": "http.response.body", "body": part, "more_body": True})
+                    elif zero_copy:
+                        offset, count = part
+                        await send({
+                            "type": "http.response.zerocopysend",
+                            "file": fd,
+                            "offset": offset,
+                            "count": count,
+                            "more_body": True
+                        })
+                    else:
+                        offset, remaining = part
+                        while remaining > 0:
+                            chunk = await asyncio.to_thread(os.pread, fd, min(MEDIA_SEND_CHUNK_SIZE, remaining), offset)
+                            if not chunk:
+                                break
+                            offset += len(chunk)
+                            remaining -= len(chunk)
+                            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            os.close(fd)
+
+
+def parse_range_header(range_header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """Byte ranges as sorted, coalesced (start, end) pairs with inclusive ends.
+    
+    Returns None when the header should be ignored (malformed, other unit, too many
+    ranges) and an empty list when no range is satisfiable.
+    """
+    unit, _, spec = range_header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    
+    specs = [part.strip() for part in spec.split(',') if part.strip()]
+    if len(specs) > MEDIA_MAX_RANGES:
+        return None
+    
+    ranges = []
+    for part in specs:
+        first, dash, last = part.partition('-')
+        if not dash:
+            return None
+        first, last = first.strip(), last.strip()
+        if not (first.isdigit() or not first) or not (last.isdigit() or not last) or not (first or last):
+            return None
+        
+        if not first:
+            # Suffix range: the final N bytes
+            suffix = int(last)
+            if suffix == 0 or size == 0:
+                continue
+            ranges.append((max(size - suffix, 0), size - 1))
+        else:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                continue
+            ranges.append((start, min(int(last), size - 1) if last else size - 1))
+    
+    coalesced: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if coalesced and start <= coalesced[-1][1] + 1:
+            coalesced[-1] = (coalesced[-1][0], max(coalesced[-1][1], end))
+        else:
+            coalesced.append((start, end))
+    return coalesced
+
+
+def not_modified(request: Request, entry: Dict[str, Any]) -> bool:
+    """If-None-Match (weak comparison) takes precedence over If-Modified-Since"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        candidates = [candidate.strip().removeprefix('W/') for candidate in if_none_match.split(',')]
+        return '*' in candidates or entry['etag'] in candidates
+    
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return entry['mtime'] <= int(parsedate_to_datetime(if_modified_since).timestamp())
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def serve_media_file(request: Request, directory: Path, filename: str, default_media_type: str, not_found_detail: str) -> Response:
+    """Serve a media file with validators, conditional GETs and single/multi-range 206 responses"""
+    entry = media_index.lookup(directory, filename)
+    if not entry:
+        raise HTTPException(status_code=404, detail=not_found_detail)
+    
+    size = entry['size']
+    media_type = mimetypes.guess_type(filename)[0] or default_media_type
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": entry['etag'],
+        "last-modified": entry['last_modified'],
+        "cache-control": "public, max-age=31536000, immutable" if entry['immutable'] else "public, no-cache"
+    }
+    
+    if not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+    
+    range_header = request.headers.get('range')
+    if_range = request.headers.get('if-range')
+    if range_header and if_range:
+        # A stale validator means the client's partial copy is outdated: send the whole file
+        if_range = if_range.strip()
+        if if_range not in (entry['etag'], entry['last_modified']):
+            range_header = None
+    
+    ranges = parse_range_header(range_header, size) if range_header else None
+    if ranges is None:
+        return MediaFileResponse(entry['path'], [(0, size)], 200, headers, media_type)
+    
+    if not ranges:
+        headers["content-range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+    
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["content-range"] = f"bytes {start}-{end}/{size}"
+        return MediaFileResponse(entry['path'], [(start, end - start + 1)], 206, headers, media_type)
+    
+    boundary = uuid.uuid4().hex
+    parts: List[Union[bytes, FileRegion]] = []
+    for start, end in ranges:
+        parts.append(
+            f"--{boundary}\r\nContent-Type: {media_type}\r\nContent-Range: bytes {start}-{end}/{size}\r\n\r\n".encode()
+        )
+        parts.append((start, end - start + 1))
+        parts.append(b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return MediaFileResponse(entry['path'], parts, 206, headers, f"multipart/byteranges; boundary={boundary}")
+
+
+# ============================================================================
+# TTS AUDIO CACHE
+# ============================================================================
+
+class TTSAudioCache:
+    """Content-addressed store of rendered TTS audio with LRU eviction under a disk budget.
+    
+    Entries are keyed on (voice_id, voice settings, model_id, normalized text). The
+    file mtime doubles as the LRU timestamp, so recency survives restarts.
+    """
+    
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size, least recently used first
+        
+        self.cache_dir.mkdir(exist_ok=True)
+        cached_files = sorted(self.cache_dir.glob("*.mp3"), key=lambda p: p.stat().st_mtime)
+        for path in cached_files:
+            size = path.stat().st_size
+            self._entries[path.stem] = size
+            self.total_bytes += size
+    
+    @staticmethod
+    def make_key(
+        voice_id: str,
+        voice_settings: Dict[str, Any],
+        model_id: str,
+        text: str,
+        context: Optional[Dict[str, str]] = None
+    ) -> str:
+        key_parts = [voice_id, voice_settings, model_id, normalize_tts_text(text)]
+        if context:
+            # Neighbouring text changes the prosody, so pieces rendered with context are keyed on it
+            key_parts.append(context)
+        payload = json.dumps(
+            key_parts,
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def path_for(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.mp3"
+    
+    def fetch(self, key: str, destination: Path) -> bool:
+        """Materialize a cached rendering at destination; returns False on a miss"""
+        cached_path = self.path_for(key)
+        if key not in self._entries or not cached_path.exists():
+            self._forget(key)
+            self.misses += 1
+            return False
+        
+        link_or_copy(cached_path, destination)
+        os.utime(cached_path)
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True
+    
+    def add(self, key: str, source: Path) -> None:
+        """Register a freshly rendered file and evict least recently used entries over budget"""
+        self._forget(key)
+        link_or_copy(source, self.path_for(key))
+        size = source.stat().st_size
+        self._entries[key] = size
+        self.total_bytes += size
+        
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest_key = next(iter(self._entries))
+            self._forget(oldest_key)
+            self.path_for(oldest_key).unlink(missing_ok=True)
+            self.evictions += 1
+    
+    def _forget(self, key: str) -> None:
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self.total_bytes -= size
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "total_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+
+tts_cache = TTSAudioCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
+
+
+def voice_settings_dict(settings: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Episode/request voice settings with defaults filled in"""
+    return VoiceSettingsModel(**(settings or {})).model_dump()
+
+
+def segment_fingerprint(segment: Dict[str, Any], settings: Dict[str, Any]) -> str:
+    """Content fingerprint of a segment; identical fingerprints render identical audio"""
+    voice_id = VOICE_MAPPING.get(segment['speaker'].lower(), VOICE_MAPPING["markus"])
+    return tts_cache.make_key(voice_id, voice_settings_dict(settings), TTS_MODEL_ID, segment['text'])
+
+
+def segment_audio_filename(episode_id: str, fingerprint: str) -> str:
+    return f"{episode_id}_seg_{fingerprint[:16]}.mp3"
+
+
+def fingerprint_segments(
+    segments: List[Dict[str, Any]],
+    settings: Dict[str, Any],
+    previous: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
+    """Fingerprint segments and carry over rendered audio from unchanged previous segments.
+    
+    Segments are matched on fingerprint rather than position, so inserting or removing a
+    line only invalidates the segments that actually changed.
+    """
+    rendered = {
+        seg['fingerprint']: seg
+        for seg in (previous or [])
+        if seg.get('fingerprint') and seg.get('audio_file')
+    }
+    result = []
+    for segment in segments:
+        segment = dict(segment)
+        segment['fingerprint'] = segment_fingerprint(segment, settings)
+        match = rendered.get(segment['fingerprint'], {})
+        segment['audio_file'] = match.get('audio_file')
+        segment['duration'] = match.get('duration')
+        result.append(segment)
+    return result
+
+
+async def synthesize_segment(
+    segment: Dict[str, Any],
+    settings: Dict[str, Any],
+    output_path: Path,
+    episode_id: str,
+    label: str
+) -> bool:
+    """Synthesize one speaker segment as batch work; transient provider failures are retried.
+    
+    Returns True if the audio came from the TTS cache.
+    """
+    voice_id = VOICE_MAPPING.get(segment['speaker'].lower(), VOICE_MAPPING["markus"])
+    text = normalize_tts_text(segment['text'])
+    cache_key = segment_fingerprint(segment, settings)
+    if tts_cache.fetch(cache_key, output_path):
+        logger.info(f"Segment {label} served from TTS cache")
+        return True
+    
+    settings = voice_settings_dict(settings)
+    pieces = split_tts_text(text, TTS_PIECE_TARGET_CHARS) if len(text) > TTS_SPLIT_THRESHOLD_CHARS else [text]
+    if len(pieces) == 1:
+        logger.info(f"Generating segment {label} with voice: {segment['speaker']}")
+        await synthesize_to_file(
+            voice_id,
+            text,
+            settings,
+            output_path,
+            label=f"segment {label}",
+            priority="batch",
+            group=episode_id
+        )
+        tts_cache.add(cache_key, output_path)
+        return False
+    
+    logger.info(f"Generating segment {label} with voice: {segment['speaker']} in {len(pieces)} pieces")
+    work_dir = AUDIO_DIR / f".pieces_{output_path.stem}_{uuid.uuid4().hex[:8]}"
+    work_dir.mkdir()
+    try:
+        async def render_piece(i: int) -> Path:
+            context = {
+                "previous_text": pieces[i - 1][-TTS_CONTEXT_CHARS:] if i > 0 else "",
+                "next_text": pieces[i + 1][:TTS_CONTEXT_CHARS] if i + 1 < len(pieces) else ""
+            }
+            piece_key = tts_cache.make_key(voice_id, settings, TTS_MODEL_ID, pieces[i], context)
+            piece_path = work_dir / f"piece_{i}.mp3"
+            if not tts_cache.fetch(piece_key, piece_path):
+                await synthesize_to_file(
+                    voice_id,
+                    pieces[i],
+                    settings,
+                    piece_path,
+                    label=f"segment {label} piece {i + 1}/{len(pieces)}",
+                    priority="batch",
+                    group=episode_id,
+                    context=context
+                )
+                tts_cache.add(piece_key, piece_path)
+            return piece_path
+        
+        # Let every piece finish before failing: the ones that made it are cached,
+        # so a retry of this segment only pays for the pieces that did not
+        results = await asyncio.gather(*(render_piece(i) for i in range(len(pieces))), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        await join_audio_pieces(results, output_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    tts_cache.add(cache_key, output_path)
+    return False
+
+
+# ============================================================================
+# LLM RESPONSE CACHE
+# ============================================================================
+
+class LLMResponseCache:
+    """In-memory LRU of LLM completions with a TTL; identical in-flight requests share one upstream call.
+    
+    Failures are never cached: every waiter of a failed call gets the exception
+    and the next request tries again.
+    """
+    
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # key -> (expires_at, response)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+    
+    @staticmethod
+    def make_key(provider: str, model: str, system_message: str, prompt: str) -> str:
+        payload = json.dumps([provider, model, system_message, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    async def get_or_create(self, key: str, create: Callable[[], Any]) -> str:
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        
+        task = self._in_flight.get(key)
+        if task:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._load(key, create))
+            self._in_flight[key] = task
+        # A waiter that goes away must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+    
+    async def _load(self, key: str, create: Callable[[], Any]) -> str:
+        try:
+            response = await create()
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return response
+        finally:
+            self._in_flight.pop(key, None)
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "max_entries": self.max_entries
+        }
+
+
+llm_cache = LLMResponseCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS)
+
+
+async def complete_chat(system_message: str, prompt: str) -> str:
+    """One-shot LLM completion through the response cache"""
+    key = llm_cache.make_key(LLM_PROVIDER, LLM_MODEL, system_message, prompt)
+    
+    async def create() -> str:
+        chat = LlmChat(
+            api_key=emergent_llm_key,
+            session_id=str(uuid.uuid4()),
+            system_message=system_message
+        ).with_model(LLM_PROVIDER, LLM_MODEL)
+        return await chat.send_message(UserMessage(text=prompt))
+    
+    return await llm_cache.get_or_create(key, create)
+
+
+# ============================================================================
+# SHOWNOTES (map-reduce over the full script)
+# ============================================================================
+
+SHOWNOTES_SYSTEM_MESSAGE = "Du bist ein Experte für Podcast-Shownotes."
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60:02d}:{rest % 60:02d}"
+
+
+def split_long_text(text: str, max_chars: int) -> List[Tuple[int, str]]:
+    """(offset, piece) pairs of at most max_chars, cut at paragraph or sentence ends where possible"""
+    pieces = []
+    offset = 0
+    while len(text) - offset > max_chars:
+        window = text[offset:offset + max_chars]
+        cut = max(window.rfind('\n\n'), window.rfind('. '), window.rfind('! '), window.rfind('? '))
+        cut = cut + 1 if cut > max_chars // 2 else max_chars
+        pieces.append((offset, text[offset:offset + cut]))
+        offset += cut
+    pieces.append((offset, text[offset:]))
+    return pieces
+
+
+async def segment_start_times(episode: Dict[str, Any], segments: List[Dict[str, Any]]) -> Optional[List[float]]:
+    """Start of every segment in the episode master, from rendered durations; None unless all are known"""
+    if not episode.get('audio_url') or not segments:
+        return None
+    
+    durations = [segment.get('duration') for segment in segments]
+    missing = [i for i, duration in enumerate(durations) if duration is None]
+    if any(not segments[i].get('audio_file') or not (AUDIO_DIR / segments[i]['audio_file']).exists() for i in missing):
+        return None
+    # Renderings from before durations were stored
+    probed = await asyncio.gather(*(probe_duration(AUDIO_DIR / segments[i]['audio_file']) for i in missing))
+    for i, duration in zip(missing, probed):
+        durations[i] = duration
+    
+    last_job = await db.render_jobs.find_one(
+        {"episode_id": episode['id'], "status": "completed"},
+        {"_id": 0, "gap_ms": 1},
+        sort=[("created_at", DESCENDING)]
+    )
+    gap_ms = last_job.get('gap_ms') if last_job else None
+    gap = (EPISODE_SPEAKER_GAP_MS if gap_ms is None else gap_ms) / 1000
+    
+    starts = []
+    position = 0.0
+    for i, segment in enumerate(segments):
+        if i > 0 and segment['speaker'].lower() != segments[i - 1]['speaker'].lower():
+            position += gap
+        starts.append(position)
+        position += durations[i]
+    
+    if abs(position - (episode.get('audio_duration') or position)) > 5.0:
+        # The master no longer matches these segments (edited since the last render)
+        return None
+    return starts
+
+
+def build_script_chunks(
+    segments: List[Dict[str, Any]],
+    starts: Optional[List[float]],
+    max_chars: int
+) -> List[str]:
+    """Group consecutive script lines into chunks of about max_chars, each line marked with its start time if known"""
+    lines = []
+    for i, segment in enumerate(segments):
+        text = segment['text'].strip()
+        if not text:
+            continue
+        for offset, piece in split_long_text(text, max_chars):
+            line = f"{segment['speaker'].upper()}: {piece.strip()}"
+            if starts is not None:
+                # Within a segment, time is interpolated by character position
+                start = starts[i] + (segment.get('duration') or 0.0) * offset / len(text)
+                line = f"[{format_timestamp(start)}] {line}"
+            lines.append(line)
+    
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        if current and size + len(line) > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+async def summarize_script_chunk(title: str, chunk: str, index: int, total: int, timed: bool, semaphore: asyncio.Semaphore) -> str:
+    timing = (
+        "Gib für jedes Thema den Zeitstempel der Zeile an, in der es beginnt (exakt aus den [Zeitmarken] übernehmen)."
+        if timed else "Es gibt keine Zeitangaben; erfinde keine."
+    )
+    prompt = f"""Dies ist Abschnitt {index + 1} von {total} der Podcast-Episode "{title}".
+
+Fasse den Abschnitt für spätere Shownotes zusammen:
+1. Die behandelten Themen in Stichpunkten. {timing}
+2. Erwähnte Personen, Produkte, Quellen oder Links
+3. Bis zu 5 Keywords
+
+Abschnitt:
+{chunk}"""
+    async with semaphore:
+        return await complete_chat(SHOWNOTES_SYSTEM_MESSAGE, prompt)
+
+
+async def generate_episode_shownotes(episode: Dict[str, Any]) -> str:
+    """Map: summarize script chunks concurrently. Reduce: merge the summaries into Markdown shownotes."""
+    title = episode['metadata']['title']
+    segments = episode.get('speaker_segments') or parse_speaker_segments(episode['text_content'])
+    starts = await segment_start_times(episode, episode.get('speaker_segments') or [])
+    chunks = build_script_chunks(segments, starts, SHOWNOTES_CHUNK_CHARS)
+    timed = starts is not None
+    
+    chapters = (
+        "2. Kapitel mit Zeitmarkern: nutze ausschließlich die Zeitstempel aus dem Material, im Format `mm:ss Titel`"
+        if timed else "2. Hauptthemen in der Reihenfolge der Episode (ohne Zeitangaben)"
+    )
+    sections = f"""1. Eine kurze Zusammenfassung (2-3 Sätze)
+{chapters}
+3. Wichtige Erwähnungen oder Links
+4. Keywords für SEO
+
+Format: Markdown"""
+    
+    if len(chunks) <= 1:
+        # Short scripts fit into a single call
+        prompt = f"""Erstelle professionelle Shownotes für diese Podcast-Episode:
+
+Titel: {title}
+Skript:
+{chunks[0] if chunks else ''}
+
+Die Shownotes sollten enthalten:
+{sections}"""
+        return await complete_chat(SHOWNOTES_SYSTEM_MESSAGE, prompt)
+    
+    semaphore = asyncio.Semaphore(SHOWNOTES_CONCURRENCY)
+    summaries = await asyncio.gather(*(
+        summarize_script_chunk(title, chunk, i, len(chunks), timed, semaphore)
+        for i, chunk in enumerate(chunks)
+    ))
+    
+    material = "\n\n".join(f"## Abschnitt {i + 1}\n{summary}" for i, summary in enumerate(summaries))
+    prompt = f"""Erstelle professionelle Shownotes für die Podcast-Episode "{title}".
+Grundlage sind Zusammenfassungen aller {len(chunks)} Abschnitte der Episode, in Reihenfolge:
+
+{material}
+
+Die Shownotes sollten die ganze Episode abdecken und enthalten:
+{sections}"""
+    return await complete_chat(SHOWNOTES_SYSTEM_MESSAGE, prompt)
+
+
+# ============================================================================
+# MEDIA PROCESSING (ffmpeg worker pool)
+# ============================================================================
+
+def media_timeout(duration: Optional[float]) -> float:
+    """Timeout proportional to the amount of media a command has to process"""
+    if not duration:
+        return MEDIA_DEFAULT_TIMEOUT
+    return max(MEDIA_MIN_TIMEOUT, duration * MEDIA_TIMEOUT_PER_MEDIA_SECOND)
+
+
+class MediaProcessPool:
+    """Runs ffmpeg/ffprobe as asyncio subprocesses on a bounded number of workers.
+    
+    Interactive callers are refused with 503 once queue_limit commands are already
+    waiting; background work (episode renders) always queues. ffmpeg progress is
+    read from its -progress output, and tasks can be cancelled by id.
+    """
+    
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._slots = asyncio.Semaphore(workers)
+        self.tasks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    
+    def queued_count(self) -> int:
+        return sum(1 for task in self.tasks.values() if task['status'] == 'queued')
+    
+    async def run(
+        self,
+        cmd: List[str],
+        timeout: Optional[float] = None,
+        duration: Optional[float] = None,
+        label: Optional[str] = None,
+        task_id: Optional[str] = None,
+        reject_when_busy: bool = False
+    ) -> str:
+        """Run a command once a worker is free and return its stdout"""
+        if reject_when_busy and self.queued_count() >= self.queue_limit:
+            raise HTTPException(
+                status_code=503,
+                detail="Media processing is busy, please retry shortly",
+                headers={"Retry-After": "10"}
+            )
+        
+        task_id = task_id or str(uuid.uuid4())
+        if task_id in self.tasks:
+            raise HTTPException(status_code=409, detail="A media task with this id is already running")
+        task = {
+            "id": task_id,
+            "label": label or cmd[0],
+            "status": "queued",
+            "progress": 0.0,
+            "duration": duration,
+            "created_at": datetime.now(timezone.utc),
+            "cancel_requested": False,
+            "process": None
+        }
+        self.tasks[task_id] = task
+        try:
+            async with self._slots:
+                if task['cancel_requested']:
+                    raise HTTPException(status_code=409, detail="Media task was cancelled")
+                task['status'] = 'running'
+                return await self._execute(cmd, task, timeout if timeout is not None else media_timeout(duration))
+        finally:
+            self.tasks.pop(task_id, None)
+    
+    async def _execute(self, cmd: List[str], task: Dict[str, Any], timeout: float) -> str:
+        track_progress = cmd[0] == 'ffmpeg' and bool(task['duration'])
+        if track_progress:
+            cmd = [cmd[0], '-progress', 'pipe:1', '-nostats', *cmd[1:]]
+        
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        task['process'] = process
+        
+        async def read_stdout() -> bytes:
+            if not track_progress:
+                return await process.stdout.read()
+            async for line in process.stdout:
+                key, _, value = line.decode(errors='replace').strip().partition('=')
+                # out_time_ms is in microseconds as well (a long-standing ffmpeg quirk)
+                if key in ('out_time_us', 'out_time_ms') and value.isdigit():
+                    task['progress'] = min(int(value) / 1_000_000 / task['duration'], 1.0)
+                elif key == 'progress' and value == 'end':
+                    task['progress'] = 1.0
+            return b""
+        
+        async def communicate():
+            stdout, stderr = await asyncio.gather(read_stdout(), process.stderr.read())
+            await process.wait()
+            return stdout, stderr
+        
+        try:
+            stdout, stderr = await asyncio.wait_for(communicate(), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            process.kill()
+            await process.wait()
+            raise
+        
+        if task['cancel_requested']:
+            raise HTTPException(status_code=409, detail="Media task was cancelled")
+        if process.returncode != 0:
+            raise RuntimeError(f"{cmd[0]} failed: {stderr.decode(errors='replace')[-500:]}")
+        return stdout.decode(errors='replace')
+    
+    def cancel(self, task_id: str) -> bool:
+        """Kill a running task or drop a queued one; returns False for unknown ids"""
+        task = self.tasks.get(task_id)
+        if not task:
+            return False
+        task['cancel_requested'] = True
+        process = task['process']
+        if process and process.returncode is None:
+            process.kill()
+        return True
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "running": sum(1 for task in self.tasks.values() if task['status'] == 'running'),
+            "queued": self.queued_count(),
+            "tasks": [
+                {key: value for key, value in task.items() if key != 'process'}
+                for task in self.tasks.values()
+            ]
+        }
+
+
+media_pool = MediaProcessPool(MEDIA_WORKERS, MEDIA_QUEUE_LIMIT)
+
+
+async def run_media_command(cmd: List[str], timeout: Optional[float] = None, **options) -> str:
+    """Run ffmpeg/ffprobe through the shared worker pool and return its stdout"""
+    return await media_pool.run(cmd, timeout=timeout, **options)
+
+
+async def probe_duration(path: Path) -> float:
+    """Container duration in seconds (0.0 when unknown)"""
+    output = await run_media_command([
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'json',
+        str(path)
+    ], timeout=60)
+    return float(json.loads(output).get('format', {}).get('duration') or 0.0)
+
+
+# ============================================================================
+# EPISODE AUDIO ASSEMBLY (ffmpeg)
+# ============================================================================
+
+async def probe_audio(path: Path) -> Dict[str, Any]:
+    """Read codec parameters and duration of the first audio stream"""
+    output = await run_media_command([
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=codec_name,sample_rate,channels,bit_rate:format=duration',
+        '-of', 'json',
+        str(path)
+    ], timeout=60)
+    info = json.loads(output)
+    stream = (info.get('streams') or [{}])[0]
+    return {
+        "codec_name": stream.get('codec_name'),
+        "sample_rate": int(stream.get('sample_rate') or 0),
+        "channels": int(stream.get('channels') or 0),
+        "bit_rate": int(stream.get('bit_rate') or 0),
+        "duration": float(info.get('format', {}).get('duration') or 0.0)
+    }
+
+
+def codec_signature(probe: Dict[str, Any]) -> tuple:
+    """Parameters that must be identical for MP3 frames to be stream-copied back to back"""
+    return (probe['codec_name'], probe['sample_rate'], probe['channels'])
+
+
+def concat_list_entry(path: Path) -> str:
+    """Line for ffmpeg's concat demuxer, with single quotes escaped"""
+    escaped = str(path.resolve()).replace("'", "'\\''")
+    return f"file '{escaped}'\n"
+
+
+async def join_audio_pieces(paths: List[Path], output_path: Path) -> None:
+    """Stream-copy same-format MP3 pieces, in order, into one file"""
+    concat_list = paths[0].parent / f"concat_{uuid.uuid4().hex[:8]}.txt"
+    concat_list.write_text("".join(concat_list_entry(path) for path in paths))
+    part_path = output_path.with_name(f"{output_path.name}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        await run_media_command([
+            'ffmpeg', '-v', 'error', '-y',
+            '-f', 'concat', '-safe', '0',
+            '-i', str(concat_list),
+            '-map', '0:a',
+            '-c', 'copy',
+            '-f', 'mp3',
+            str(part_path)
+        ])
+        part_path.replace(output_path)
+    finally:
+        part_path.unlink(missing_ok=True)
+        concat_list.unlink(missing_ok=True)
+
+
+async def conform_audio(source: Path, destination: Path, signature: tuple, bit_rate: int) -> None:
+    """Re-encode a segment to the episode's codec parameters"""
+    _, sample_rate, channels = signature
+    await run_media_command([
+        'ffmpeg', '-v', 'error', '-y',
+        '-i', str(source),
+        '-vn', '-map_metadata', '-1',
+        '-ar', str(sample_rate),
+        '-ac', str(channels),
+        '-c:a', 'libmp3lame',
+        '-b:a', str(bit_rate or 128000),
+        '-f', 'mp3',
+        str(destination)
+    ])
+
+
+async def get_gap_file(signature: tuple, bit_rate: int, gap_ms: int) -> Path:
+    """Silence clip encoded with the same parameters as the segments, generated once and reused"""
+    _, sample_rate, channels = signature
+    gap_path = GAP_DIR / f"gap_{gap_ms}ms_{sample_rate}hz_{channels}ch_{bit_rate}.mp3"
+    if not gap_path.exists():
+        part_path = gap_path.with_name(gap_path.name + ".part")
+        await run_media_command([
+            'ffmpeg', '-v', 'error', '-y',
+            '-f', 'lavfi',
+            '-i', f"anullsrc=r={sample_rate}:cl={'mono' if channels == 1 else 'stereo'}",
+            '-t', f"{gap_ms / 1000:.3f}",
+            '-c:a', 'libmp3lame',
+            '-b:a', str(bit_rate or 128000),
+            '-f', 'mp3',
+            str(part_path)
+        ])
+        part_path.replace(gap_path)
+    return gap_path
+
+
+async def assemble_episode_audio(
+    episode_id: str,
+    segment_paths: List[Path],
+    speakers: List[str],
+    gap_ms: int = EPISODE_SPEAKER_GAP_MS
+) -> Dict[str, Any]:
+    """Join rendered segments, in order, into one episode master.
+    
+    Segments whose codec parameters match the majority are stream-copied by the
+    concat demuxer; only outliers are re-encoded to match before joining.
+    """
+    probes = await asyncio.gather(*(probe_audio(path) for path in segment_paths))
+    
+    signatures = [codec_signature(probe) for probe in probes]
+    target = max(set(signatures), key=signatures.count)
+    target_bit_rate = max(probe['bit_rate'] for probe, sig in zip(probes, signatures) if sig == target)
+    if target[0] != 'mp3':
+        # Episode masters are MP3; a non-MP3 majority means everything has to be conformed
+        target = ('mp3', target[1], target[2])
+    
+    work_dir = AUDIO_DIR / f".assemble_{episode_id}_{uuid.uuid4().hex[:8]}"
+    work_dir.mkdir()
+    try:
+        inputs = []
+        conformed = 0
+        for i, (path, signature) in enumerate(zip(segment_paths, signatures)):
+            if signature != target:
+                conformed_path = work_dir / f"segment_{i}.mp3"
+                await conform_audio(path, conformed_path, target, target_bit_rate)
+                path = conformed_path
+                conformed += 1
+            
+            if i > 0 and gap_ms > 0 and speakers[i] != speakers[i - 1]:
+                inputs.append(await get_gap_file(target, target_bit_rate, gap_ms))
+            inputs.append(path)
+        
+        concat_list = work_dir / "concat.txt"
+        concat_list.write_text("".join(concat_list_entry(path) for path in inputs))
+        
+        master_filename = f"{episode_id}.mp3"
+        master_path = AUDIO_DIR / master_filename
+        part_path = work_dir / master_filename
+        await run_media_command([
+            'ffmpeg', '-v', 'error', '-y',
+            '-f', 'concat', '-safe', '0',
+            '-i', str(concat_list),
+            '-map', '0:a',
+            '-c', 'copy',
+            str(part_path)
+        ])
+        part_path.replace(master_path)
+        media_index.invalidate(master_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    master_probe = await probe_audio(master_path)
+    logger.info(f"Assembled episode {episode_id}: {len(segment_paths)} segments, {conformed} re-encoded, {master_probe['duration']:.1f}s")
+    
+    return {
+        "filename": master_filename,
+        "duration": master_probe['duration'],
+        "segment_durations": [probe['duration'] for probe in probes],
+        "reencoded_segments": conformed
+    }
+
+
+# ============================================================================
+# VIDEO SMART CUT (ffmpeg)
+# ============================================================================
+
+# ffprobe H.264 profile names that libx264 can reproduce for the re-encoded edges
+X264_PROFILES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high"
+}
+
+
+async def probe_video_stream(path: Path) -> Optional[Dict[str, Any]]:
+    """Codec parameters of the first video stream, or None for audio-only files"""
+    output = await run_media_command([
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=codec_name,profile,pix_fmt,width,height',
+        '-of', 'json',
+        str(path)
+    ], timeout=60)
+    streams = json.loads(output).get('streams') or []
+    return streams[0] if streams else None
+
+
+async def probe_video_packets(path: Path) -> Tuple[List[float], List[float]]:
+    """Presentation times of all video packets and of the keyframes, read without decoding"""
+    output = await run_media_command([
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        str(path)
+    ], timeout=MEDIA_DEFAULT_TIMEOUT)
+    packets = []
+    keyframes = []
+    for line in output.splitlines():
+        pts_time, _, flags = line.strip().partition(',')
+        if pts_time in ('', 'N/A'):
+            continue
+        packets.append(float(pts_time))
+        if 'K' in flags:
+            keyframes.append(float(pts_time))
+    return sorted(packets), sorted(keyframes)
+
+
+async def smart_cut_video(
+    input_path: Path,
+    output_path: Path,
+    start: float,
+    end: float,
+    voice_volume: float,
+    task_id: Optional[str] = None
+) -> bool:
+    """Cut [start, end) re-encoding only the partial GOPs at the cut edges.
+    
+    The video between the first and last keyframe inside the range is stream-copied;
+    the pieces are joined through MPEG-TS (in-band parameter sets) and the audio is
+    trimmed and re-encoded in one pass. Returns False when the source cannot be
+    smart-cut, so the caller re-encodes the whole clip instead.
+    """
+    stream = await probe_video_stream(input_path)
+    if not stream or stream.get('codec_name') != 'h264' or stream.get('profile') not in X264_PROFILES:
+        return False
+    
+    packets, keyframes = await probe_video_packets(input_path)
+    keyframes = [t for t in keyframes if start <= t <= end]
+    if len(keyframes) < 2:
+        # No complete GOP inside the range; nothing to stream-copy
+        return False
+    copy_start, copy_end = keyframes[0], keyframes[-1]
+    
+    # A stream copy cut by time ends on decode timestamps and would pull in the first
+    # frames of the next GOP; limiting by frame count stops exactly at copy_end
+    copy_frames = sum(1 for t in packets if copy_start <= t < copy_end)
+    
+    encode_args = [
+        '-c:v', 'libx264',
+        '-preset', 'veryfast',
+        '-crf', '18',
+        '-profile:v', X264_PROFILES[stream['profile']],
+        '-pix_fmt', stream.get('pix_fmt') or 'yuv420p'
+    ]
+    copy_args = ['-c:v', 'copy', '-bsf:v', 'h264_mp4toannexb', '-frames:v', str(copy_frames)]
+    
+    work_dir = VIDEO_DIR / f".smartcut_{uuid.uuid4().hex[:8]}"
+    work_dir.mkdir()
+    try:
+        pieces = []
+        for name, piece_start, piece_end, codec_args in (
+            ("head.ts", start, copy_start, encode_args),
+            ("middle.ts", copy_start, copy_end, copy_args),
+            ("tail.ts", copy_end, end, encode_args)
+        ):
+            if piece_end - piece_start < 0.001:
+                continue
+            piece_path = work_dir / name
+            await run_media_command([
+                'ffmpeg', '-v', 'error', '-y',
+                '-ss', f"{piece_start:.6f}",
+                '-i', str(input_path),
+                '-t', f"{piece_end - piece_start:.6f}",
+                '-map', '0:v:0',
+                *codec_args,
+                '-avoid_negative_ts', 'make_zero',
+                '-f', 'mpegts',
+                str(piece_path)
+            ], duration=piece_end - piece_start, label=f"smart cut {name}", task_id=task_id, reject_when_busy=True)
+            pieces.append(piece_path)
+        
+        concat_list = work_dir / "concat.txt"
+        concat_list.write_text("".join(concat_list_entry(path) for path in pieces))
+        await run_media_command([
+            'ffmpeg', '-v', 'error', '-y',
+            '-f', 'concat', '-safe', '0',
+            '-i', str(concat_list),
+            '-ss', f"{start:.6f}",
+            '-t', f"{end - start:.6f}",
+            '-i', str(input_path),
+            '-map', '0:v:0',
+            '-map', '1:a:0?',
+            '-c:v', 'copy',
+            '-c:a', 'aac',
+            '-af', f'volume={voice_volume}',
+            '-movflags', '+faststart',
+            str(output_path)
+        ], duration=end - start, label="smart cut join", task_id=task_id, reject_when_busy=True)
+    except RuntimeError as e:
+        logger.warning(f"Smart cut of {input_path.name} failed, re-encoding instead: {str(e)}")
+        output_path.unlink(missing_ok=True)
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    logger.info(f"Smart cut {input_path.name}: copied {copy_end - copy_start:.1f}s of {end - start:.1f}s")
+    return True
+
+
+# ============================================================================
+# AUDIO ENHANCEMENT (NumPy DSP)
+# ============================================================================
+
+# STFT for noise gating and EQ: sqrt-Hann analysis/synthesis at 75% overlap
+ENHANCE_FFT_SIZE = 2048
+ENHANCE_HOP = ENHANCE_FFT_SIZE // 4
+ENHANCE_BLOCK = ENHANCE_HOP * 2048  # samples per block task (~22 s at 48 kHz)
+
+NOISE_PROFILE_FRAMES = 2000  # frames sampled across the file to estimate the noise floor
+NOISE_GATE_THRESHOLD = 2.0  # gate opens this far above the per-bin noise floor (magnitude)
+NOISE_GATE_FLOOR = 10 ** (-18 / 20)  # maximum attenuation of gated bins
+
+BASS_SHELF_HZ = 120.0
+TREBLE_SHELF_HZ = 6000.0
+
+COMPRESSOR_ATTACK_SECONDS = 0.01
+COMPRESSOR_RELEASE_SECONDS = 0.15
+
+R128_SUBBLOCK_SECONDS = 0.1  # 400 ms gating blocks with 75% overlap = 4 sub-blocks
+
+
+def stft_window() -> np.ndarray:
+    return np.sqrt(np.hanning(ENHANCE_FFT_SIZE + 1)[:-1]).astype(np.float32)
+
+
+def read_padded(signal: np.ndarray, begin: int, end: int) -> np.ndarray:
+    """signal[begin:end] as a float32 copy, zero-padded outside the signal"""
+    segment = np.zeros(end - begin, dtype=np.float32)
+    lo, hi = max(begin, 0), min(end, len(signal))
+    if hi > lo:
+        segment[lo - begin:hi - begin] = signal[lo:hi]
+    return segment
+
+
+def stft_frames(segment: np.ndarray, window: np.ndarray) -> np.ndarray:
+    frames = np.lib.stride_tricks.sliding_window_view(segment, ENHANCE_FFT_SIZE)[::ENHANCE_HOP]
+    return np.fft.rfft(frames * window, axis=1)
+
+
+def estimate_noise_profile(signal: np.ndarray, window: np.ndarray) -> np.ndarray:
+    """Per-bin noise floor: median magnitude of the quietest frames sampled across the file"""
+    n_frames = max((len(signal) - ENHANCE_FFT_SIZE) // ENHANCE_HOP + 1, 1)
+    picks = np.linspace(0, n_frames - 1, num=min(n_frames, NOISE_PROFILE_FRAMES)).astype(np.int64)
+    frames = np.stack([
+        read_padded(signal, k * ENHANCE_HOP, k * ENHANCE_HOP + ENHANCE_FFT_SIZE) for k in picks
+    ])
+    magnitudes = np.abs(np.fft.rfft(frames * window, axis=1))
+    energy = magnitudes.sum(axis=1)
+    return np.median(magnitudes[energy <= np.percentile(energy, 20)], axis=0)
+
+
+def shelf_eq_curve(sample_rate: int, bass_db: float, treble_db: float) -> np.ndarray:
+    """Zero-phase first-order low/high shelf magnitude response at the STFT bins"""
+    freqs = np.fft.rfftfreq(ENHANCE_FFT_SIZE, 1 / sample_rate)
+    bass_gain = 10 ** (bass_db / 20)
+    treble_gain = 10 ** (treble_db / 20)
+    low = 1 / (1 + (freqs / BASS_SHELF_HZ) ** 2)
+    high = (freqs / TREBLE_SHELF_HZ) ** 2 / (1 + (freqs / TREBLE_SHELF_HZ) ** 2)
+    return ((1 + (bass_gain - 1) * low) * (1 + (treble_gain - 1) * high)).astype(np.float32)
+
+
+def process_spectral_block(
+    signal: np.ndarray,
+    start: int,
+    stop: int,
+    window: np.ndarray,
+    noise_profile: Optional[np.ndarray],
+    eq_curve: Optional[np.ndarray]
+) -> np.ndarray:
+    """Spectral gate and shelf EQ for signal[start:stop].
+    
+    Frames sit on a global hop grid and the block reads one extra frame on each side,
+    so independently processed blocks overlap-add to exactly the same result as a
+    single pass over the whole file.
+    """
+    hop = ENHANCE_HOP
+    k_first = -(-(start - ENHANCE_FFT_SIZE + 1) // hop) - 1
+    k_last = (stop - 1) // hop + 1
+    segment_begin = k_first * hop
+    segment = read_padded(signal, segment_begin, k_last * hop + ENHANCE_FFT_SIZE)
+    spectrum = stft_frames(segment, window)
+    
+    gains = np.ones(spectrum.shape, dtype=np.float32)
+    if noise_profile is not None:
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        noise_power = (NOISE_GATE_THRESHOLD * noise_profile) ** 2
+        gate = np.clip(1 - noise_power / np.maximum(power, 1e-12), 0, 1)
+        # Smoothing across neighbouring frames keeps isolated bins from "chirping"
+        gate[1:-1] = 0.25 * gate[:-2] + 0.5 * gate[1:-1] + 0.25 * gate[2:]
+        gains = np.maximum(gate, NOISE_GATE_FLOOR).astype(np.float32)
+    if eq_curve is not None:
+        gains *= eq_curve
+    
+    frames = np.fft.irfft(spectrum[1:-1] * gains[1:-1], n=ENHANCE_FFT_SIZE, axis=1).astype(np.float32) * window
+    output = np.zeros(len(segment), dtype=np.float32)
+    for phase in range(4):
+        # Every 4th frame tiles the signal without overlap
+        part = frames[phase::4]
+        begin = (phase + 1) * hop
+        output[begin:begin + part.size] += part.reshape(-1)
+    output *= 0.5  # squared sqrt-Hann windows sum to 2 at 75% overlap
+    return output[start - segment_begin:stop - segment_begin]
+
+
+def hop_mean_squares(samples: np.ndarray) -> np.ndarray:
+    """Mean square per ENHANCE_HOP frame (the compressor's detector resolution)"""
+    n_hops = -(-len(samples) // ENHANCE_HOP)
+    padded = np.zeros(n_hops * ENHANCE_HOP, dtype=np.float32)
+    padded[:len(samples)] = samples
+    return (padded.reshape(n_hops, ENHANCE_HOP) ** 2).mean(axis=1)
+
+
+def compressor_gain_curve(levels_db: np.ndarray, threshold_db: float, ratio: float, frame_seconds: float) -> np.ndarray:
+    """Gain (dB) per detector frame with attack/release smoothing"""
+    target = -np.maximum(levels_db - threshold_db, 0) * (1 - 1 / ratio)
+    attack = np.exp(-frame_seconds / COMPRESSOR_ATTACK_SECONDS)
+    release = np.exp(-frame_seconds / COMPRESSOR_RELEASE_SECONDS)
+    smoothed = np.empty(len(target), dtype=np.float64)
+    gain = 0.0
+    for i, value in enumerate(target.tolist()):
+        coeff = attack if value < gain else release
+        gain = coeff * gain + (1 - coeff) * value
+        smoothed[i] = gain
+    return smoothed
+
+
+def k_weighting_power(sample_rate: int, length: int) -> np.ndarray:
+    """|H|^2 of the BS.1770 K-weighting filter (shelf + high-pass) at rfft bins of the given length"""
+    def biquad_power(b, a, w):
+        z = np.exp(-1j * w)
+        return np.abs(np.polyval(b[::-1], z) / np.polyval(a[::-1], z)) ** 2
+    
+    w = 2 * np.pi * np.fft.rfftfreq(length, 1 / sample_rate) / sample_rate
+    
+    gain = 10 ** (4.0 / 40)
+    w0 = 2 * np.pi * 1500.0 / sample_rate
+    alpha = np.sin(w0) / (2 / np.sqrt(2))
+    cos_w0 = np.cos(w0)
+    shelf = biquad_power(
+        [gain * ((gain + 1) + (gain - 1) * cos_w0 + 2 * np.sqrt(gain) * alpha),
+         -2 * gain * ((gain - 1) + (gain + 1) * cos_w0),
+         gain * ((gain + 1) + (gain - 1) * cos_w0 - 2 * np.sqrt(gain) * alpha)],
+        [(gain + 1) - (gain - 1) * cos_w0 + 2 * np.sqrt(gain) * alpha,
+         2 * ((gain - 1) - (gain + 1) * cos_w0),
+         (gain + 1) - (gain - 1) * cos_w0 - 2 * np.sqrt(gain) * alpha],
+        w
+    )
+    
+    w0 = 2 * np.pi * 38.0 / sample_rate
+    alpha = np.sin(w0) / (2 * 0.5)
+    cos_w0 = np.cos(w0)
+    high_pass = biquad_power(
+        [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2],
+        [1 + alpha, -2 * cos_w0, 1 - alpha],
+        w
+    )
+    return shelf * high_pass
+
+
+def subblock_loudness_powers(samples: np.ndarray, subblock: int, weights: np.ndarray) -> np.ndarray:
+    """K-weighted mean square per (sub-block, channel), via Parseval on each sub-block's spectrum"""
+    n_sub = len(samples) // subblock
+    blocks = samples[:n_sub * subblock].reshape(n_sub, subblock, samples.shape[1])
+    spectrum = np.fft.rfft(blocks, axis=1)
+    power = (spectrum.real ** 2 + spectrum.imag ** 2) * weights[None, :, None]
+    # One-sided spectrum: every bin but DC (and Nyquist for even lengths) counts twice
+    total = 2 * power.sum(axis=1) - power[:, 0]
+    if subblock % 2 == 0:
+        total -= power[:, -1]
+    return total / subblock ** 2
+
+
+def integrated_loudness(subblock_powers: np.ndarray) -> Optional[float]:
+    """EBU R128 / BS.1770 gated integrated loudness (LUFS); None for silence"""
+    if len(subblock_powers) == 0:
+        return None
+    if len(subblock_powers) < 4:
+        block_powers = subblock_powers.mean(axis=0, keepdims=True).sum(axis=1)
+    else:
+        block_powers = np.lib.stride_tricks.sliding_window_view(subblock_powers, 4, axis=0).mean(axis=-1).sum(axis=1)
+    
+    loudness = -0.691 + 10 * np.log10(np.maximum(block_powers, 1e-20))
+    gated = loudness > -70
+    if not gated.any():
+        return None
+    relative_gate = -0.691 + 10 * np.log10(block_powers[gated].mean()) - 10
+    gated &= loudness > relative_gate
+    return float(-0.691 + 10 * np.log10(block_powers[gated].mean()))
+
+
+def enhance_pcm(
+    work_dir: Path,
+    pcm_path: Path,
+    frames: int,
+    channels: int,
+    sample_rate: int,
+    settings: AudioEnhanceRequest
+) -> Dict[str, Any]:
+    """Run the enhancement chain over decoded float32 PCM.
+    
+    Spectral gate + shelf EQ (STFT) -> compressor -> loudness measurement. Everything
+    streams over memory-mapped PCM in fixed-size blocks fanned out over a thread pool
+    (NumPy's FFTs release the GIL). The R128 gain is returned for the encoder to apply.
+    """
+    source = np.memmap(pcm_path, dtype=np.float32, mode='r+', shape=(frames, channels))
+    window = stft_window()
+    eq_curve = None
+    if settings.bass_boost or settings.treble_boost:
+        eq_curve = shelf_eq_curve(sample_rate, settings.bass_boost, settings.treble_boost)
+    compression = min(max(settings.compression, 0.0), 1.0)
+    
+    blocks = [(start, min(start + ENHANCE_BLOCK, frames)) for start in range(0, frames, ENHANCE_BLOCK)]
+    hop_levels = np.zeros((-(-frames // ENHANCE_HOP), channels), dtype=np.float64)
+    
+    with ThreadPoolExecutor(max_workers=ENHANCE_THREADS) as executor:
+        if settings.remove_noise or eq_curve is not None:
+            output_path = work_dir / "processed.f32"
+            audio = np.memmap(output_path, dtype=np.float32, mode='w+', shape=(frames, channels))
+            noise_profiles = list(executor.map(
+                lambda channel: estimate_noise_profile(source[:, channel], window),
+                range(channels)
+            )) if settings.remove_noise else [None] * channels
+            
+            def spectral_task(channel: int, start: int, stop: int) -> None:
+                processed = process_spectral_block(source[:, channel], start, stop, window, noise_profiles[channel], eq_curve)
+                audio[start:stop, channel] = processed
+                hop_levels[start // ENHANCE_HOP:start // ENHANCE_HOP + -(-len(processed) // ENHANCE_HOP), channel] = hop_mean_squares(processed)
+            
+            futures = [executor.submit(spectral_task, channel, start, stop) for channel in range(channels) for start, stop in blocks]
+        else:
+            output_path = pcm_path
+            audio = source
+            
+            def level_task(channel: int, start: int, stop: int) -> None:
+                samples = np.asarray(audio[start:stop, channel])
+                hop_levels[start // ENHANCE_HOP:start // ENHANCE_HOP + -(-len(samples) // ENHANCE_HOP), channel] = hop_mean_squares(samples)
+            
+            futures = [executor.submit(level_task, channel, start, stop) for channel in range(channels) for start, stop in blocks] if compression > 0 else []
+        for future in futures:
+            future.result()
+        
+        gain_curve = None
+        if compression > 0:
+            # Linked detector: the loudest channel drives the gain for all of them
+            threshold_db = -10 - 20 * compression
+            ratio = 1 + 5 * compression
+            levels_db = 10 * np.log10(np.maximum(hop_levels.max(axis=1), 1e-12))
+            gain_db = compressor_gain_curve(levels_db, threshold_db, ratio, ENHANCE_HOP / sample_rate)
+            if not settings.normalize:
+                # Without normalization, make up half of the reduction a full-scale signal would get
+                gain_db += -threshold_db * (1 - 1 / ratio) / 2
+            gain_curve = 10 ** (gain_db / 20)
+        
+        subblock = max(int(round(R128_SUBBLOCK_SECONDS * sample_rate)), 1)
+        weights = k_weighting_power(sample_rate, subblock)
+        frame_centers = (np.arange(len(hop_levels)) + 0.5) * ENHANCE_HOP
+        
+        def finish_task(start: int, stop: int) -> Tuple[np.ndarray, float]:
+            samples = audio[start:stop]
+            if gain_curve is not None:
+                samples *= np.interp(np.arange(start, stop), frame_centers, gain_curve).astype(np.float32)[:, None]
+            peak = float(np.abs(samples).max()) if stop > start else 0.0
+            return subblock_loudness_powers(np.asarray(samples), subblock, weights), peak
+        
+        # Blocks aligned to whole loudness sub-blocks
+        finish_size = subblock * 200
+        results = list(executor.map(
+            lambda start: finish_task(start, min(start + finish_size, frames)),
+            range(0, frames, finish_size)
+        ))
+    
+    audio.flush()
+    loudness = integrated_loudness(np.concatenate([powers for powers, _ in results])) if results else None
+    peak = max((peak for _, peak in results), default=0.0)
+    peak_db = 20 * np.log10(peak) if peak > 0 else None
+    
+    output_gain_db = 0.0
+    if settings.normalize and loudness is not None:
+        output_gain_db = ENHANCE_TARGET_LUFS - loudness
+        if peak_db is not None:
+            # Sample-peak ceiling: never push peaks above -1 dBFS
+            output_gain_db = min(output_gain_db, ENHANCE_PEAK_CEILING_DB - peak_db)
+    
+    return {
+        "output_path": output_path,
+        "loudness_lufs": round(loudness, 2) if loudness is not None else None,
+        "peak_db": round(float(peak_db), 2) if peak_db is not None else None,
+        "output_gain_db": round(output_gain_db, 2)
+    }
+
+
+# ============================================================================
+# WAVEFORM PEAKS
+# ============================================================================
+
+# Peak file: header, then per zoom level a (samples per peak, peak count) entry,
+# then each level's int8 (min, max) pairs, finest level first
+PEAKS_MAGIC = b"PKS1"
+PEAKS_HEADER = struct.Struct("<4sIdI")  # magic, sample rate, duration, level count
+PEAKS_LEVEL_HEADER = struct.Struct("<II")  # samples per peak, peak count
+
+# Single-flight analysis per media file
+analysis_tasks: Dict[str, asyncio.Task] = {}
+
+
+def compute_peak_pyramid(pcm_path: Path) -> List[Tuple[int, np.ndarray]]:
+    """Min/max peaks of mono float32 PCM at PEAKS_BASE_SAMPLES_PER_PEAK, halved per level.
+    
+    Reads the PCM memory-mapped in blocks; returns (samples per peak, int8 [count, 2]) levels.
+    """
+    samples = np.memmap(pcm_path, dtype=np.float32, mode='r') if pcm_path.stat().st_size else np.zeros(0, dtype=np.float32)
+    base = PEAKS_BASE_SAMPLES_PER_PEAK
+    count = -(-len(samples) // base)
+    mins = np.empty(count, dtype=np.float32)
+    maxs = np.empty(count, dtype=np.float32)
+    step = base * 4096
+    for start in range(0, len(samples), step):
+        block = np.asarray(samples[start:start + step])
+        if len(block) % base:
+            block = np.pad(block, (0, base - len(block) % base), mode='edge')
+        block = block.reshape(-1, base)
+        mins[start // base:start // base + len(block)] = block.min(axis=1)
+        maxs[start // base:start // base + len(block)] = block.max(axis=1)
+    
+    def quantize(values: np.ndarray) -> np.ndarray:
+        return np.clip(np.round(values * 127), -128, 127).astype(np.int8)
+    
+    levels = [(base, np.stack([quantize(mins), quantize(maxs)], axis=1))]
+    samples_per_peak = base
+    while len(mins) > PEAKS_MIN_LEVEL_PEAKS:
+        if len(mins) % 2:
+            mins = np.append(mins, mins[-1])
+            maxs = np.append(maxs, maxs[-1])
+        mins = mins.reshape(-1, 2).min(axis=1)
+        maxs = maxs.reshape(-1, 2).max(axis=1)
+        samples_per_peak *= 2
+        levels.append((samples_per_peak, np.stack([quantize(mins), quantize(maxs)], axis=1)))
+    return levels
+
+
+def write_peaks_file(path: Path, duration: float, levels: List[Tuple[int, np.ndarray]]) -> None:
+    part_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.part")
+    with open(part_path, 'wb') as peaks_file:
+        peaks_file.write(PEAKS_HEADER.pack(PEAKS_MAGIC, PEAKS_SAMPLE_RATE, duration, len(levels)))
+        for samples_per_peak, peaks in levels:
+            peaks_file.write(PEAKS_LEVEL_HEADER.pack(samples_per_peak, len(peaks)))
+        for _, peaks in levels:
+            peaks_file.write(peaks.tobytes())
+    part_path.replace(path)
+
+
+def read_peaks_header(path: Path) -> Dict[str, Any]:
+    """Sample rate, duration and the (samples per peak, count, byte offset) of each level"""
+    with open(path, 'rb') as peaks_file:
+        magic, sample_rate, duration, level_count = PEAKS_HEADER.unpack(peaks_file.read(PEAKS_HEADER.size))
+        if magic != PEAKS_MAGIC:
+            raise ValueError(f"Not a peaks file: {path.name}")
+        entries = [
+            PEAKS_LEVEL_HEADER.unpack(peaks_file.read(PEAKS_LEVEL_HEADER.size)) for _ in range(level_count)
+        ]
+    
+    levels = []
+    offset = PEAKS_HEADER.size + PEAKS_LEVEL_HEADER.size * level_count
+    for samples_per_peak, count in entries:
+        levels.append({"samples_per_peak": samples_per_peak, "count": count, "offset": offset})
+        offset += count * 2
+    return {"sample_rate": sample_rate, "duration": duration, "levels": levels}
+
+
+def read_peaks(path: Path, level: Dict[str, Any], first: int, last: int) -> np.ndarray:
+    """Interleaved int8 min/max values of peaks [first, last) of one level"""
+    return np.fromfile(path, dtype=np.int8, count=(last - first) * 2, offset=level['offset'] + first * 2)
+
+
+def peaks_path_for(file_url: str) -> Optional[Path]:
+    kind, _, filename = file_url.removeprefix('/api/').partition('/')
+    if kind not in ('audio', 'video') or not filename or filename.startswith('.'):
+        return None
+    return PEAKS_DIR / f"{kind}_{filename}.peaks"
+
+
+async def build_peaks_file(media_path: Path, peaks_path: Path) -> None:
+    container_duration = await probe_duration(media_path)
+    pcm_path = PEAKS_DIR / f".analyze_{uuid.uuid4().hex[:8]}.f32"
+    try:
+        try:
+            await run_media_command([
+                'ffmpeg', '-v', 'error', '-y',
+                '-i', str(media_path),
+                '-vn',
+                '-ac', '1',
+                '-ar', str(PEAKS_SAMPLE_RATE),
+                '-f', 'f32le',
+                str(pcm_path)
+            ], duration=container_duration, label=f"analyze {media_path.name}")
+        except RuntimeError:
+            # No audio stream (e.g. a silent video): keep the duration, draw a flat line
+            pcm_path.write_bytes(b"")
+        
+        frames = pcm_path.stat().st_size // 4
+        levels = await asyncio.to_thread(compute_peak_pyramid, pcm_path)
+        duration = frames / PEAKS_SAMPLE_RATE if frames else container_duration
+        await asyncio.to_thread(write_peaks_file, peaks_path, duration, levels)
+    finally:
+        pcm_path.unlink(missing_ok=True)
+
+
+async def analyze_media_file(file_url: str) -> Optional[Dict[str, Any]]:
+    """Duration and peak pyramid of a stored audio/video file, computed once per file version.
+    
+    Returns the peaks header, or None for files that are not audio/video or do not exist.
+    """
+    peaks_path = peaks_path_for(file_url)
+    if not peaks_path:
+        return None
+    media_path = media_path_for_url(file_url)
+    try:
+        media_mtime = media_path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    
+    key = str(peaks_path)
+    task = analysis_tasks.get(key)
+    if task is None:
+        if peaks_path.exists() and peaks_path.stat().st_mtime >= media_mtime:
+            return await asyncio.to_thread(read_peaks_header, peaks_path)
+        task = asyncio.create_task(build_peaks_file(media_path, peaks_path))
+        analysis_tasks[key] = task
+        task.add_done_callback(lambda _: analysis_tasks.pop(key, None))
+    
+    await asyncio.shield(task)
+    return await asyncio.to_thread(read_peaks_header, peaks_path)
+
+
+def schedule_media_analysis(file_url: str) -> None:
+    """Analyze a new file in the background and record its duration on the library entries using it"""
+    async def run() -> None:
+        try:
+            info = await analyze_media_file(file_url)
+            if info:
+                await db.music_library.update_many({"file_url": file_url}, {"$set": {"duration": info['duration']}})
+        except Exception as e:
+            logger.warning(f"Media analysis failed for {file_url}: {str(e)}")
+    
+    task = asyncio.create_task(run())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+# ============================================================================
+# BACKGROUND RENDER JOBS
+# ============================================================================
+
+ACTIVE_RENDER_STATUSES = ["queued", "running"]
+
+
+class RenderError(Exception):
+    """A render job failure; the message and status_code are stored on the job as error/error_code"""
+    
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+render_queue: "asyncio.Queue[str]" = asyncio.Queue()
+running_render_jobs: Dict[str, asyncio.Task] = {}
+# Jobs whose task is being cancelled through the API; any other cancellation is a shutdown
+user_cancelled_render_jobs: Set[str] = set()
+render_workers: List[asyncio.Task] = []
+
+
+async def update_render_job(job_id: str, fields: Dict[str, Any]) -> None:
+    fields['updated_at'] = datetime.now(timezone.utc)
+    await db.render_jobs.update_one({"id": job_id}, {"$set": fields})
+
+
+def new_render_job(episode: Dict[str, Any], gap_ms: Optional[int]) -> RenderJob:
+    segments = fingerprint_segments(
+        episode.get('speaker_segments') or parse_speaker_segments(episode['text_content']),
+        episode.get('voice_settings'),
+        previous=episode.get('speaker_segments')
+    )
+    return RenderJob(
+        episode_id=episode['id'],
+        gap_ms=gap_ms,
+        segments=segments,
+        total_segments=len(segments)
+    )
+
+
+async def submit_render_job(episode: Dict[str, Any], gap_ms: Optional[int]) -> Dict[str, Any]:
+    """Persist a render job for an episode and hand it to the worker pool"""
+    job = new_render_job(episode, gap_ms)
+    segments = job.segments
+    doc = job.model_dump()
+    
+    await db.render_jobs.insert_one(doc)
+    await db.episodes.update_one(
+        {"id": episode['id']},
+        {"$set": {"status": "processing"}}
+    )
+    dashboard_cache.invalidate()
+    await render_queue.put(job.id)
+    logger.info(f"Queued render job {job.id} for episode {episode['id']} ({len(segments)} segments)")
+    
+    doc.pop('_id', None)
+    return doc
+
+
+async def find_or_submit_render_job(episode: Dict[str, Any], gap_ms: Optional[int]) -> Dict[str, Any]:
+    """The episode's queued or running job, or a new one.
+    
+    Concurrent submits for one episode (a double click, a client retry) both try the
+    insert; the unique index on active jobs lets one win and the other returns its job.
+    """
+    active = {"episode_id": episode['id'], "status": {"$in": ACTIVE_RENDER_STATUSES}}
+    for _ in range(2):
+        job = await db.render_jobs.find_one(active, {"_id": 0})
+        if job:
+            return job
+        try:
+            return await submit_render_job(episode, gap_ms)
+        except DuplicateKeyError:
+            # Another request queued a job first; it is picked up on the next pass
+            pass
+    raise RuntimeError(f"Could not queue a render job for episode {episode['id']}")
+
+
+async def render_episode_audio(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Synthesize and assemble an episode, skipping segments a previous run already finished"""
+    job_id = job['id']
+    episode_id = job['episode_id']
+    episode = await db.episodes.find_one({"id": episode_id}, {"_id": 0})
+    if not episode:
+        raise RenderError("Episode not found", 404)
+    
+    settings = voice_settings_dict(episode.get('voice_settings'))
+    segments = fingerprint_segments(job['segments'], settings, previous=job['segments'])
+    audio_files = [segment_audio_filename(episode_id, segment['fingerprint']) for segment in segments]
+    
+    # Unchanged segments keep their rendered audio; resumed jobs keep what they finished
+    finished = set(job.get('completed_segments', []))
+    completed = {
+        i for i, segment in enumerate(segments)
+        if (i in finished or segment['audio_file'] == audio_files[i]) and (AUDIO_DIR / audio_files[i]).exists()
+    }
+    reused = len(completed - finished)
+    if completed:
+        logger.info(f"Render job {job_id}: {len(completed)}/{len(segments)} segments already rendered")
+    await update_render_job(job_id, {
+        "reused_segments": reused,
+        "progress": len(completed) / len(segments) if segments else 0.0
+    })
+    
+    try:
+        async def render_segment(i: int) -> bool:
+            cached = await synthesize_segment(
+                segments[i],
+                settings,
+                AUDIO_DIR / audio_files[i],
+                episode_id,
+                f"{i+1}/{len(segments)}"
+            )
+            completed.add(i)
+            await db.render_jobs.update_one(
+                {"id": job_id},
+                {
+                    "$addToSet": {"completed_segments": i},
+                    "$inc": {"cached_segments": int(cached)},
+                    "$set": {
+                        "progress": len(completed) / len(segments),
+                        "updated_at": datetime.now(timezone.utc)
+                    }
+                }
+            )
+            return cached
+        
+        # Render segments concurrently (the TTS scheduler paces them); gather keeps the original segment order
+        await update_render_job(job_id, {"phase": "synthesizing"})
+        tasks = [
+            asyncio.create_task(render_segment(i))
+            for i in range(len(segments)) if i not in completed
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        
+    except TTSError as e:
+        logger.warning(f"Render job {job_id}: TTS failed ({e.kind}): {str(e)}")
+        if e.kind == "quota":
+            message = "Zeichenkontingent des TTS-Anbieters erreicht (z. B. Free-Tier-Limit). Bitte verwenden Sie einen Paid Plan API-Key für die Audio-Generierung."
+        elif e.kind == "auth":
+            message = "TTS-API-Key ungültig oder ohne Berechtigung."
+        else:
+            message = f"Audio-Generierung fehlgeschlagen: {str(e)}"
+        raise RenderError(f"{message} Die Episode wurde gespeichert und kann später erneut vertont werden.", tts_error_status(e)) from e
+    except Exception as e:
+        logger.warning(f"Render job {job_id}: synthesis failed: {str(e)}")
+        raise RenderError(f"Audio-Generierung fehlgeschlagen: {str(e)}") from e
+    
+    for segment, filename in zip(segments, audio_files):
+        segment['audio_file'] = filename
+    
+    # Stitch all segments into one episode master
+    final_audio_url = None
+    audio_duration = None
+    if audio_files:
+        await update_render_job(job_id, {"phase": "assembling"})
+        try:
+            assembled = await assemble_episode_audio(
+                episode_id,
+                [AUDIO_DIR / filename for filename in audio_files],
+                [segment['speaker'].lower() for segment in segments],
+                EPISODE_SPEAKER_GAP_MS if job.get('gap_ms') is None else job['gap_ms']
+            )
+        except HTTPException as e:
+            # The ffmpeg worker pool reports failures the way request handlers need them
+            raise RenderError(f"Zusammenfügen der Episode fehlgeschlagen: {e.detail}", e.status_code) from e
+        final_audio_url = f"/api/audio/{assembled['filename']}"
+        audio_duration = assembled['duration']
+        for segment, duration in zip(segments, assembled['segment_durations']):
+            segment['duration'] = duration
+        
+        # The master is done at this point; peaks are an extra that /peaks can build on demand
+        await update_render_job(job_id, {"phase": "analyzing"})
+        try:
+            peaks_info = await analyze_media_file(final_audio_url)
+            if peaks_info:
+                audio_duration = peaks_info['duration']
+        except Exception as e:
+            logger.warning(f"Media analysis failed for {final_audio_url}: {str(e)}")
+    
+    # Link the rendered audio into the episode's current segments, which may have been
+    # edited while the job ran; only segments with a matching fingerprint get a link
+    episode = await db.episodes.find_one({"id": episode_id}, {"_id": 0, "speaker_segments": 1, "voice_settings": 1})
+    current_segments = fingerprint_segments(
+        episode.get('speaker_segments') or [],
+        episode.get('voice_settings'),
+        previous=segments
+    )
+    
+    # Update episode with audio URL
+    await db.episodes.update_one(
+        {"id": episode_id},
+        {"$set": {
+            "speaker_segments": current_segments,
+            "audio_url": final_audio_url,
+            "audio_duration": audio_duration,
+            "status": "completed",
+            "updated_at": datetime.now(timezone.utc)
+        }}
+    )
+    dashboard_cache.invalidate()
+    
+    # Drop renderings no segment links to anymore (the TTS cache keeps its own copy)
+    referenced = set(audio_files) | {seg['audio_file'] for seg in current_segments if seg.get('audio_file')}
+    for stale_path in AUDIO_DIR.glob(f"{episode_id}_seg_*.mp3"):
+        if stale_path.name not in referenced:
+            stale_path.unlink(missing_ok=True)
+    
+    logger.info(f"Episode audio generated: {episode_id}")
+    
+    return {
+        "audio_url": final_audio_url,
+        "audio_duration": audio_duration
+    }
+
+
+async def execute_render_job(job_id: str) -> None:
+    """Claim a queued job and run it to completion, failure or cancellation"""
+    now = datetime.now(timezone.utc)
+    job = await db.render_jobs.find_one_and_update(
+        {"id": job_id, "status": "queued", "cancel_requested": {"$ne": True}},
+        {"$set": {"status": "running", "started_at": now, "updated_at": now}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not job:
+        # Cancelled while queued or already picked up
+        return
+    
+    episode_id = job['episode_id']
+    try:
+        result = await render_episode_audio(job)
+        await update_render_job(job_id, {
+            **result,
+            "status": "completed",
+            "phase": None,
+            "progress": 1.0,
+            "finished_at": datetime.now(timezone.utc)
+        })
+        logger.info(f"Render job {job_id} completed")
+    except asyncio.CancelledError:
+        if job_id not in user_cancelled_render_jobs:
+            # Shutdown: the job stays running and start_render_workers resumes it
+            raise
+        await update_render_job(job_id, {
+            "status": "cancelled",
+            "finished_at": datetime.now(timezone.utc)
+        })
+        await db.episodes.update_one({"id": episode_id}, {"$set": {"status": "draft"}})
+        dashboard_cache.invalidate()
+        logger.info(f"Render job {job_id} cancelled")
+    except Exception as e:
+        error_code = e.status_code if isinstance(e, RenderError) else 500
+        error_detail = str(e) if isinstance(e, RenderError) else f"Unerwarteter Fehler: {str(e)}"
+        logger.error(f"Render job {job_id} failed: {error_detail}")
+        await update_render_job(job_id, {
+            "status": "failed",
+            "error": error_detail,
+            "error_code": error_code,
+            "finished_at": datetime.now(timezone.utc)
+        })
+        await db.episodes.update_one({"id": episode_id}, {"$set": {"status": "error"}})
+        dashboard_cache.invalidate()
+
+
+async def render_worker(worker_id: int) -> None:
+    """Pull job ids off the queue forever, one job at a time"""
+    while True:
+        job_id = await render_queue.get()
+        try:
+            task = asyncio.create_task(execute_render_job(job_id))
+            running_render_jobs[job_id] = task
+            await task
+        except Exception as e:
+            logger.error(f"Render worker {worker_id} crashed on job {job_id}: {str(e)}")
+        finally:
+            running_render_jobs.pop(job_id, None)
+            render_queue.task_done()
+
+
+# ============================================================================
+# DOWNLOAD ANALYTICS
+# ============================================================================
+
+# Checked in order; the first matching class wins
+USER_AGENT_CLASSES = [
+    ("bot", re.compile(r"bot|crawler|spider|feedfetcher|podcastindex|slurp", re.IGNORECASE)),
+    ("spotify", re.compile(r"spotify", re.IGNORECASE)),
+    ("apple_podcasts", re.compile(r"applecoremedia|itunes|podcasts/", re.IGNORECASE)),
+    ("direct", re.compile(r"mozilla", re.IGNORECASE)),
+]
+
+
+def classify_user_agent(user_agent: str) -> str:
+    for name, pattern in USER_AGENT_CLASSES:
+        if pattern.search(user_agent):
+            return name
+    return "other"
+
+
+def listener_id(request: Request, day: str) -> str:
+    """Daily pseudonymous client id (IAB-style IP + user agent); the raw IP is never stored"""
+    forwarded_for = request.headers.get('x-forwarded-for')
+    ip = forwarded_for.split(',')[0].strip() if forwarded_for else (request.client.host if request.client else "")
+    payload = f"{day}|{ip}|{request.headers.get('user-agent', '')}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class AnalyticsEventBuffer:
+    """Collects download events in memory and writes them to MongoDB in batches.
+    
+    Recording never touches the database. When the buffer is full, new events
+    are dropped and counted instead of growing memory during traffic spikes.
+    """
+    
+    def __init__(self, batch_size: int, max_events: int):
+        self.batch_size = batch_size
+        self.max_events = max_events
+        self.dropped = 0
+        self._events: List[Dict[str, Any]] = []
+        self._batch_ready = asyncio.Event()
+    
+    def record(self, request: Request, file_url: str, regions: List[FileRegion], size: int) -> None:
+        if len(self._events) >= self.max_events:
+            self.dropped += 1
+            return
+        now = datetime.now(timezone.utc)
+        day = now.strftime("%Y-%m-%d")
+        self._events.append({
+            "file_url": file_url,
+            "listener_id": listener_id(request, day),
+            "source": classify_user_agent(request.headers.get('user-agent', '')),
+            "start": min(offset for offset, _ in regions),
+            "end": max(offset + length for offset, length in regions),
+            "bytes": sum(length for _, length in regions),
+            "size": size,
+            "day": day,
+            "ts": now
+        })
+        if len(self._events) >= self.batch_size:
+            self._batch_ready.set()
+    
+    async def flush(self) -> int:
+        """Write buffered events for episode audio; returns how many were stored"""
+        events, self._events = self._events, []
+        self._batch_ready.clear()
+        if not events:
+            return 0
+        
+        try:
+            # One lookup per batch maps file URLs to episodes; other audio is not tracked
+            episodes = await db.episodes.find(
+                {"audio_url": {"$in": list({event['file_url'] for event in events})}},
+                {"_id": 0, "id": 1, "audio_url": 1}
+            ).to_list(None)
+            episode_ids = {episode['audio_url']: episode['id'] for episode in episodes}
+            docs = [
+                {**event, "episode_id": episode_ids[event['file_url']], "rolled_up": False}
+                for event in events if event['file_url'] in episode_ids
+            ]
+            if docs:
+                await db.analytics_events.insert_many(docs, ordered=False)
+            return len(docs)
+        except PyMongoError as e:
+            # Keep the batch for the next attempt as far as the buffer allows
+            logger.error(f"Error flushing {len(events)} analytics events: {str(e)}")
+            self._events = (events + self._events)[:self.max_events]
+            return 0
+    
+    async def run(self, interval: float) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                # Database errors are retried inside flush; anything else drops that batch, not the task
+                logger.error(f"Analytics flush failed: {str(e)}")
+
+
+analytics_buffer = AnalyticsEventBuffer(ANALYTICS_FLUSH_BATCH, ANALYTICS_BUFFER_MAX_EVENTS)
+
+
+async def rollup_analytics() -> int:
+    """Recompute the daily AnalyticsStats of every (episode, day) that received new events.
+    
+    Whole days are re-aggregated from the raw events, so listeners are counted
+    once per day no matter how many flushes their requests were spread over.
+    Pending events are claimed with a run token first: only those are marked rolled
+    up at the end, and events written meanwhile stay pending for the next run.
+    """
+    token = str(uuid.uuid4())
+    claimed = await db.analytics_events.update_many({"rolled_up": False}, {"$set": {"rollup_id": token}})
+    if not claimed.modified_count:
+        return 0
+    pending = {"rolled_up": False, "rollup_id": token}
+    
+    touched = await db.analytics_events.aggregate([
+        {"$match": pending},
+        {"$group": {"_id": {"episode_id": "$episode_id", "day": "$day"}}}
+    ]).to_list(None)
+    
+    rollups = []
+    for i in range(0, len(touched), ANALYTICS_ROLLUP_BATCH_SIZE):
+        keys = [doc['_id'] for doc in touched[i:i + ANALYTICS_ROLLUP_BATCH_SIZE]]
+        rollups += await db.analytics_events.aggregate([
+            {"$match": {"$or": keys}},
+            # One row per listener and day: how far into the file they got
+            {"$group": {
+                "_id": {"episode_id": "$episode_id", "day": "$day", "listener_id": "$listener_id"},
+                "reached": {"$max": {"$divide": ["$end", "$size"]}},
+                "source": {"$first": "$source"}
+            }},
+            {"$group": {
+                "_id": {"episode_id": "$_id.episode_id", "day": "$_id.day"},
+                "downloads": {"$sum": {"$cond": [{"$eq": ["$source", "bot"]}, 0, 1]}},
+                "listeners": {"$sum": {"$cond": [
+                    {"$and": [{"$ne": ["$source", "bot"]}, {"$gte": ["$reached", ANALYTICS_LISTEN_MIN_FRACTION]}]}, 1, 0
+                ]}},
+                "crawler_requests": {"$sum": {"$cond": [{"$eq": ["$source", "bot"]}, 1, 0]}},
+                "reached": {"$avg": {"$cond": [{"$eq": ["$source", "bot"]}, None, "$reached"]}},
+                "sources": {"$push": "$source"}
+            }}
+        ]).to_list(None)
+    
+    operations = []
+    for rollup in rollups:
+        sources = [source for source in rollup['sources'] if source != "bot"]
+        date = datetime.strptime(rollup['_id']['day'], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        operations.append(UpdateOne(
+            {"episode_id": rollup['_id']['episode_id'], "date": date},
+            {
+                "$set": {
+                    "downloads": rollup['downloads'],
+                    "listeners": rollup['listeners'],
+                    "average_listen_duration": round(min(rollup['reached'] or 0.0, 1.0) * 100, 1),
+                    "crawler_requests": rollup['crawler_requests'],
+                    "traffic_sources": {source: sources.count(source) for source in set(sources)}
+                },
+                "$setOnInsert": {"id": str(uuid.uuid4())}
+            },
+            upsert=True
+        ))
+    if operations:
+        await db.analytics_stats.bulk_write(operations, ordered=False)
+    
+    await db.analytics_events.update_many(pending, {"$set": {"rolled_up": True}, "$unset": {"rollup_id": ""}})
+    dashboard_cache.invalidate()
+    return len(operations)
+
+
+async def run_analytics_rollups(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await analytics_buffer.flush()
+            await rollup_analytics()
+        except Exception as e:
+            logger.error(f"Analytics rollup failed: {str(e)}")
+
+
+# ============================================================================
+# DATABASE INDEXES & MIGRATIONS
+# ============================================================================
+
+COLLECTION_INDEXES = {
+    "episodes": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("metadata.episode_number", DESCENDING)]),
+        IndexModel([("status", ASCENDING)]),
+        IndexModel([("audio_url", ASCENDING)])
+    ],
+    "music_library": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("category", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("file_url", ASCENDING)])
+    ],
+    "render_jobs": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("episode_id", ASCENDING), ("status", ASCENDING)]),
+        # At most one queued or running job per episode, however many submits race
+        IndexModel([("episode_id", ASCENDING)], unique=True, partialFilterExpression={"status": {"$in": ACTIVE_RENDER_STATUSES}}),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING)])
+    ],
+    "upload_sessions": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("updated_at", ASCENDING)])
+    ],
+    "media_blobs": [
+        IndexModel([("id", ASCENDING)], unique=True)
+    ],
+    "migrations": [
+        IndexModel([("id", ASCENDING)], unique=True)
+    ],
+    "counters": [
+        IndexModel([("id", ASCENDING)], unique=True)
+    ],
+    "analytics_events": [
+        IndexModel([("episode_id", ASCENDING), ("day", ASCENDING)]),
+        IndexModel([("rolled_up", ASCENDING), ("rollup_id", ASCENDING)], partialFilterExpression={"rolled_up": False}),
+        IndexModel([("ts", ASCENDING)], expireAfterSeconds=ANALYTICS_EVENT_RETENTION_DAYS * 86400)
+    ],
+    "analytics_stats": [
+        IndexModel([("episode_id", ASCENDING), ("date", ASCENDING)], unique=True),
+        IndexModel([("date", ASCENDING)])
+    ]
+}
+
+# Fields that used to be stored as ISO strings and are now BSON dates
+DATETIME_FIELDS = {
+    "episodes": ["created_at", "updated_at", "published_at", "metadata.publish_date"],
+    "music_library": ["created_at"],
+    "render_jobs": ["created_at", "updated_at", "started_at", "finished_at"],
+    "upload_sessions": ["created_at", "updated_at"],
+    "media_blobs": ["created_at"]
+}
+
+MIGRATION_BATCH_SIZE = 500
+
+
+async def ensure_indexes() -> None:
+    """Create the indexes the handlers query on; a no-op for indexes that already exist"""
+    for collection_name, indexes in COLLECTION_INDEXES.items():
+        try:
+            await db[collection_name].create_indexes(indexes)
+        except PyMongoError as e:
+            # e.g. duplicate ids blocking a unique index; the app still works, just slower
+            logger.error(f"Could not create indexes on {collection_name}: {str(e)}")
+
+
+def parse_stored_datetime(value: str) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def get_dotted(doc: Dict[str, Any], path: str) -> Any:
+    for key in path.split('.'):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(key)
+    return doc
+
+
+async def migrate_datetime_fields() -> None:
+    """One-shot online migration of ISO-string dates to BSON dates.
+    
+    Runs in the background while the app serves requests (the models accept both
+    forms). Each update is conditional on the old string, so a concurrent write of a
+    newer value is never overwritten; the migration is recorded once it completes.
+    """
+    migration_id = "datetime_fields_v1"
+    if await db.migrations.find_one({"id": migration_id}):
+        return
+    
+    converted = 0
+    for collection_name, fields in DATETIME_FIELDS.items():
+        collection = db[collection_name]
+        cursor = collection.find(
+            {"$or": [{field: {"$type": "string"}} for field in fields]},
+            {field: 1 for field in fields}
+        ).batch_size(MIGRATION_BATCH_SIZE)
+        
+        operations = []
+        async for doc in cursor:
+            old_values = {}
+            new_values = {}
+            for field in fields:
+                value = get_dotted(doc, field)
+                if isinstance(value, str):
+                    parsed = parse_stored_datetime(value)
+                    if parsed:
+                        old_values[field] = value
+                        new_values[field] = parsed
+            if new_values:
+                operations.append(UpdateOne({"_id": doc["_id"], **old_values}, {"$set": new_values}))
+            
+            if len(operations) >= MIGRATION_BATCH_SIZE:
+                converted += (await collection.bulk_write(operations, ordered=False)).modified_count
+                operations = []
+        if operations:
+            converted += (await collection.bulk_write(operations, ordered=False)).modified_count
+    
+    await db.migrations.update_one(
+        {"id": migration_id},
+        {"$setOnInsert": {"id": migration_id, "completed_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    logger.info(f"Migration {migration_id} completed: {converted} documents converted")
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """Opaque keyset cursor for the (created_at, id) position of a document"""
+    created_at = doc['created_at']
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    payload = json.dumps([created_at, doc['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), str(doc_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def find_page(
+    collection,
+    query: Dict[str, Any],
+    projection: Dict[str, Any],
+    limit: int,
+    cursor: Optional[str]
+) -> Dict[str, Any]:
+    """Newest-first keyset page over (created_at, id); constant cost however deep the page"""
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": doc_id}}
+        ]}]}
+    
+    # One extra document tells whether another page exists
+    docs = await collection.find(query, projection).sort(
+        [("created_at", DESCENDING), ("id", DESCENDING)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return {"items": docs[:limit], "next_cursor": next_cursor}
+
+
+async def allocate_episode_numbers(count: int, at_least: int = 0) -> int:
+    """Reserve count consecutive episode numbers and return the first one.
+    
+    The counter is one document bumped with $inc, so concurrent creates and imports
+    never hand out the same number. It is seeded from the highest stored number the
+    first time it is used; at_least moves it past explicitly numbered episodes.
+    """
+    counter_id = "episode_number"
+    if at_least:
+        await db.counters.update_one({"id": counter_id}, {"$max": {"value": at_least}})
+    if not count:
+        return 0
+    
+    for _ in range(2):
+        counter = await db.counters.find_one_and_update(
+            {"id": counter_id},
+            {"$inc": {"value": count}},
+            return_document=ReturnDocument.AFTER
+        )
+        if counter:
+            return counter['value'] - count + 1
+        
+        latest = await db.episodes.find_one(
+            {"metadata.episode_number": {"$type": "number"}},
+            {"_id": 0, "metadata.episode_number": 1},
+            sort=[("metadata.episode_number", -1)]
+        )
+        seed = max(latest['metadata']['episode_number'] if latest else 0, at_least)
+        try:
+            await db.counters.insert_one({"id": counter_id, "value": seed})
+        except DuplicateKeyError:
+            # Another request seeded it first
+            pass
+    raise RuntimeError("Episode number counter could not be initialized")
+
+
+async def prepare_database() -> None:
+    await ensure_indexes()
+    try:
+        await migrate_datetime_fields()
+    except Exception as e:
+        logger.error(f"Date migration failed, will retry on next start: {str(e)}")
+
+
+# ============================================================================
+# API ENDPOINTS
+# ============================================================================
+
+@api_router.get("/")
+async def root():
+    return {"message": "Podcast App API - Der Bazi mit Baraka"}
+
+
+# ============================================================================
+# EPISODES CRUD
+# ============================================================================
+
+def prepare_new_episode(episode_input: EpisodeCreate) -> Episode:
+    """Episode for a create request, with its speaker segments parsed and fingerprinted"""
+    # Parse speaker segments if present
+    if not episode_input.speaker_segments:
+        segments = parse_speaker_segments(episode_input.text_content)
+    else:
+        segments = [seg.model_dump() for seg in episode_input.speaker_segments]
+    segments = fingerprint_segments(segments, episode_input.voice_settings.model_dump() if episode_input.voice_settings else None)
+    episode_input.speaker_segments = [SpeakerSegment(**seg) for seg in segments]
+    return Episode(**episode_input.model_dump())
+
+
+@api_router.post("/episodes", response_model=Episode)
+async def create_episode(episode_input: EpisodeCreate):
+    """Create a new episode"""
+    try:
+        # Auto-increment episode number
+        if episode_input.metadata.episode_number:
+            await allocate_episode_numbers(0, at_least=episode_input.metadata.episode_number)
+        else:
+            episode_input.metadata.episode_number = await allocate_episode_numbers(1)
+        
+        episode = prepare_new_episode(episode_input)
+        
+        # Save to database
+        doc = episode.model_dump()
+        await db.episodes.insert_one(doc)
+        dashboard_cache.invalidate()
+        logger.info(f"Created episode: {episode.id}")
+        
+        return episode
+    except Exception as e:
+        logger.error(f"Error creating episode: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """Items of a JSON array decoded as the body arrives; only the unread rest of one item is buffered"""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer, expect, finished = "", "[", False
+    
+    while True:
+        buffer = buffer.lstrip(" \t\r\n")
+        if buffer:
+            if expect == "[":
+                if buffer[0] != "[":
+                    raise HTTPException(status_code=400, detail="Expected a JSON array or NDJSON of episodes")
+                buffer, expect = buffer[1:], "item or ]"
+                continue
+            if expect == "end":
+                raise HTTPException(status_code=400, detail="Unexpected data after the JSON array")
+            if expect in (", or ]", "item or ]") and buffer[0] == "]":
+                buffer, expect = buffer[1:], "end"
+                continue
+            if expect == ", or ]":
+                if buffer[0] != ",":
+                    raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+                buffer, expect = buffer[1:], "item"
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                item, end = None, None
+            # Until a delimiter follows, a number may still be cut off mid-chunk ("-1" of "-1.5")
+            if end is not None and (finished or buffer[end:end + 1] in (",", "]", " ", "\t", "\r", "\n")):
+                yield item
+                buffer, expect = buffer[end:], ", or ]"
+                continue
+        
+        if finished:
+            if expect == "end" and not buffer:
+                return
+            raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+        chunk = await anext(chunks, None)
+        try:
+            buffer += utf8.decode(chunk or b"", final=chunk is None)
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Request body is not valid UTF-8")
+        finished = chunk is None
+
+
+async def iter_bulk_import_items(request: Request) -> AsyncIterator[Union[bytes, Any]]:
+    """Items of an NDJSON body (raw lines) or of a JSON array body, read as they arrive"""
+    content_type = request.headers.get('content-type', '')
+    if 'ndjson' in content_type or 'jsonl' in content_type:
+        pending: List[bytes] = []
+        async for chunk in request.stream():
+            lines = chunk.split(b'\n')
+            for line in lines[:-1]:
+                pending.append(line)
+                item = b''.join(pending)
+                pending = []
+                if item.strip():
+                    yield item
+            pending.append(lines[-1])
+        item = b''.join(pending)
+        if item.strip():
+            yield item
+        return
+    
+    async for item in iter_json_array(request.stream()):
+        yield item
+
+
+async def import_episode_batch(
+    batch: List[Tuple[int, EpisodeCreate]],
+    render: bool,
+    gap_ms: Optional[int]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Number, insert and optionally queue a batch of new episodes with one write per collection.
+    
+    Returns (created, errors). The insert is unordered, so a document that fails (for
+    example on a duplicate id) is reported by index without holding back the rest;
+    its reserved episode number stays unused.
+    """
+    unnumbered = [episode_input for _, episode_input in batch if not episode_input.metadata.episode_number]
+    highest = max((episode_input.metadata.episode_number or 0 for _, episode_input in batch), default=0)
+    number = await allocate_episode_numbers(len(unnumbered), at_least=highest)
+    for episode_input in unnumbered:
+        episode_input.metadata.episode_number = number
+        number += 1
+    
+    docs = [prepare_new_episode(episode_input).model_dump() for _, episode_input in batch]
+    if render:
+        for doc in docs:
+            doc['status'] = "processing"
+    
+    failed: Dict[int, str] = {}
+    try:
+        await db.episodes.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        failed = {error['index']: error.get('errmsg', "Insert failed") for error in e.details.get('writeErrors', [])}
+        if not failed:
+            raise
+    
+    inserted = [(index, doc) for position, ((index, _), doc) in enumerate(zip(batch, docs)) if position not in failed]
+    jobs = [new_render_job(doc, gap_ms).model_dump() for _, doc in inserted] if render else []
+    queued = jobs
+    if jobs:
+        try:
+            await db.render_jobs.insert_many(jobs, ordered=False)
+        except BulkWriteError as e:
+            # A job rejected by the active-job index means one was queued for that episode first
+            rejected = {error['index'] for error in e.details.get('writeErrors', [])}
+            active = await db.render_jobs.find(
+                {"episode_id": {"$in": [jobs[i]['episode_id'] for i in rejected]}, "status": {"$in": ACTIVE_RENDER_STATUSES}},
+                {"_id": 0, "id": 1, "episode_id": 1}
+            ).to_list(None)
+            active_by_episode = {job['episode_id']: job for job in active}
+            if not rejected or any(jobs[i]['episode_id'] not in active_by_episode for i in rejected):
+                raise
+            queued = [job for i, job in enumerate(jobs) if i not in rejected]
+            jobs = [active_by_episode[job['episode_id']] if i in rejected else job for i, job in enumerate(jobs)]
+        for job in queued:
+            render_queue.put_nowait(job['id'])
+    dashboard_cache.invalidate()
+    
+    created = [
+        {
+            "index": index,
+            "id": doc['id'],
+            "episode_number": doc['metadata']['episode_number'],
+            **({"job_id": job['id']} if render else {})
+        }
+        for (index, doc), job in zip(inserted, jobs or [None] * len(inserted))
+    ]
+    errors = [{"index": batch[position][0], "error": message} for position, message in sorted(failed.items())]
+    return created, errors
+
+
+@api_router.post("/episodes/bulk")
+async def bulk_import_episodes(request: Request, render: bool = False, gap_ms: Optional[int] = None):
+    """Create many episodes from a JSON array or NDJSON body of episode objects.
+    
+    Both bodies are parsed as they stream in. Items are validated as they are read and
+    written in batches, each numbered by a single counter update; invalid items and
+    documents the database rejects are reported by index and skipped. With render=true
+    every new episode is also queued for audio rendering.
+    
+    Batches are committed as they fill: if a batch fails outright (the database is
+    unreachable, say) the request returns 500, and episodes from earlier batches stay.
+    """
+    try:
+        created: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+        batch: List[Tuple[int, EpisodeCreate]] = []
+        index = 0
+        async for item in iter_bulk_import_items(request):
+            try:
+                if isinstance(item, bytes):
+                    batch.append((index, EpisodeCreate.model_validate_json(item)))
+                else:
+                    batch.append((index, EpisodeCreate.model_validate(item)))
+            except ValidationError as e:
+                errors.append({"index": index, "error": str(e)})
+            index += 1
+            
+            if len(batch) >= BULK_IMPORT_BATCH_SIZE:
+                batch_created, batch_errors = await import_episode_batch(batch, render, gap_ms)
+                created.extend(batch_created)
+                errors.extend(batch_errors)
+                batch = []
+        if batch:
+            batch_created, batch_errors = await import_episode_batch(batch, render, gap_ms)
+            created.extend(batch_created)
+            errors.extend(batch_errors)
+        errors.sort(key=lambda error: error['index'])
+        
+        logger.info(f"Bulk import: {len(created)} episodes created, {len(errors)} rejected")
+        return {"created": len(created), "episodes": created, "errors": errors}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing episodes: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/episodes", response_model=EpisodePage)
+async def get_episodes(limit: int = 50, cursor: Optional[str] = None):
+    """Get episodes, newest first, as summaries; pass next_cursor back to get the following page"""
+    try:
+        limit = min(max(limit, 1), 200)
+        projection = {"_id": 0, **{field: 1 for field in EpisodeSummary.model_fields}}
+        return await find_page(db.episodes, {}, projection, limit, cursor)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching episodes: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/episodes/{episode_id}", response_model=Episode)
+async def get_episode(episode_id: str):
+    """Get a single episode"""
+    try:
+        episode = await db.episodes.find_one({"id": episode_id}, {"_id": 0})
+        if not episode:
+            raise HTTPException(status_code=404, detail="Episode not found")
+        
+        return episode
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching episode: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.put("/episodes/{episode_id}", response_model=Episode)
+async def update_episode(episode_id: str, update_data: EpisodeUpdate):
+    """Update an episode"""
+    try:
+        episode = await db.episodes.find_one({"id": episode_id}, {"_id": 0})
+        if not episode:
+            raise HTTPException(status_code=404, detail="Episode not found")
+        
+        # Prepare update
+        update_dict = {k: v for k, v in update_data.model_dump(exclude_unset=True).items() if v is not None}
+        update_dict['updated_at'] = datetime.now(timezone.utc)
+        
+        stored_segments = episode.get('speaker_segments') or []
+        text_changed = 'text_content' in update_dict and update_dict['text_content'] != episode.get('text_content')
+        
+        # The editor echoes the stored segments back on every save, so only segments that
+        # differ from the stored ones count as an explicit segment edit
+        client_segments = update_dict.pop('speaker_segments', None) or []
+        segments_edited = bool(client_segments) and \
+            [(seg['speaker'], seg['text']) for seg in client_segments] != \
+            [(seg['speaker'], seg['text']) for seg in stored_segments]
+        
+        # Re-parse speaker segments if text changed
+        if segments_edited:
+            update_dict['speaker_segments'] = client_segments
+        elif text_changed:
+            update_dict['speaker_segments'] = parse_speaker_segments(update_dict['text_content'])
+        
+        # Fingerprint the new segment list and keep audio links for segments that did not change
+        if 'speaker_segments' in update_dict or 'voice_settings' in update_dict:
+            update_dict['speaker_segments'] = fingerprint_segments(
+                update_dict.get('speaker_segments', stored_segments),
+                update_dict.get('voice_settings', episode.get('voice_settings')),
+                previous=stored_segments
+            )
+        
+        await db.episodes.update_one(
+            {"id": episode_id},
+            {"$set": update_dict}
         )
+        dashboard_cache.invalidate()
+        
+        # Fetch updated episode
+        updated_episode = await db.episodes.find_one({"id": episode_id}, {"_id": 0})
+        
+        logger.info(f"Updated episode: {episode_id}")
+        return updated_episode
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating episode: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.delete("/episodes/{episode_id}")
+async def delete_episode(episode_id: str):
+    """Delete an episode"""
+    try:
+        result = await db.episodes.delete_one({"id": episode_id})
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=404, detail="Episode not found")
+        dashboard_cache.invalidate()
+        
+        logger.info(f"Deleted episode: {episode_id}")
+        return {"message": "Episode deleted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting episode: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.post("/scripts/parse")
+async def parse_script(request: ScriptParseRequest):
+    """Speaker segments and per-speaker statistics for the editor's live preview.
+    
+    Sending the previous segments and the edit that produced the text reparses only
+    the region around the edit.
+    """
+    previous = [segment.model_dump() for segment in request.previous_segments] if request.previous_segments else None
+    edit = (request.edit.start, request.edit.deleted, request.edit.inserted) if request.edit else None
+    segments = parse_speaker_segments(request.text, previous, edit)
+    return {"segments": segments, "stats": script_statistics(segments)}
+
+
+# ============================================================================
+# TEXT-TO-SPEECH (ElevenLabs)
+# ============================================================================
+
+@api_router.post("/tts/generate")
+async def generate_tts(request: TTSRequest):
+    """Generate audio from text using ElevenLabs"""
+    try:
+        voice_id = VOICE_MAPPING.get(request.voice.lower(), VOICE_MAPPING["markus"])
+        
+        # Prepare voice settings
+        settings = voice_settings_dict(request.voice_settings.model_dump() if request.voice_settings else None)
+        
+        audio_filename = f"{uuid.uuid4()}.mp3"
+        audio_path = AUDIO_DIR / audio_filename
+        text = normalize_tts_text(request.text)
+        
+        # Reuse an identical earlier rendering before paying for a provider call
+        cache_key = tts_cache.make_key(voice_id, settings, TTS_MODEL_ID, text)
+        cached = tts_cache.fetch(cache_key, audio_path)
+        if not cached:
+            logger.info(f"Generating TTS with voice: {request.voice}")
+            await synthesize_to_file(voice_id, text, settings, audio_path)
+            tts_cache.add(cache_key, audio_path)
+        
+        audio_url = f"/api/audio/{audio_filename}"
+        schedule_media_analysis(audio_url)
+        logger.info(f"TTS generated successfully: {audio_url}")
+        
+        return {
+            "audio_url": audio_url,
+            "filename": audio_filename,
+            "voice": request.voice,
+            "cached": cached
+        }
+    except TTSError as e:
+        logger.error(f"Error generating TTS ({e.kind}): {str(e)}")
+        raise HTTPException(status_code=tts_error_status(e), detail=f"TTS generation failed: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error generating TTS: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"TTS generation failed: {str(e)}")
+
+
+async def open_tts_stream(text: str, voice: str, voice_settings: Optional[VoiceSettingsModel]) -> StreamingResponse:
+    """Chunked audio/mpeg response for a preview.
+    
+    Cache hits are streamed straight from disk; a request identical to one still being
+    synthesized joins that provider call instead of starting another.
+    """
+    voice_id = VOICE_MAPPING.get(voice.lower(), VOICE_MAPPING["markus"])
+    settings = voice_settings_dict(voice_settings.model_dump() if voice_settings else None)
+    text = normalize_tts_text(text)
+    if not text:
+        raise HTTPException(status_code=400, detail="Text is empty")
+    
+    cache_key = tts_cache.make_key(voice_id, settings, TTS_MODEL_ID, text)
+    shared = tts_streams.get(cache_key)
+    if shared is None or shared.done:
+        audio_path = AUDIO_DIR / f"{uuid.uuid4()}.mp3"
+        headers = {"X-Audio-Url": f"/api/audio/{audio_path.name}", "Cache-Control": "no-store"}
+        if tts_cache.fetch(cache_key, audio_path):
+            headers["X-TTS-Cache"] = "hit"
+            return StreamingResponse(iter_file(audio_path), media_type="audio/mpeg", headers=headers)
+        
+        logger.info(f"Streaming TTS with voice: {voice}")
+        shared = start_tts_stream(cache_key, voice_id, text, settings, audio_path)
+        headers["X-TTS-Cache"] = "miss"
+    else:
+        # Same preview already being synthesized (e.g. an <audio> retry): share its provider call
+        headers = {
+            "X-Audio-Url": f"/api/audio/{shared.output_path.name}",
+            "Cache-Control": "no-store",
+            "X-TTS-Cache": "shared"
+        }
+    audio_stream = shared.listen()
+    
+    # Wait for the first chunk so provider errors still turn into a proper HTTP error
+    try:
+        first_chunk = await anext(audio_stream)
+    except StopAsyncIteration:
+        first_chunk = b""
+    
+    async def body() -> AsyncIterator[bytes]:
+        yield first_chunk
+        async for chunk in audio_stream:
+            yield chunk
+    
+    return StreamingResponse(body(), media_type="audio/mpeg", headers=headers)
+
+
+@api_router.post("/tts/stream")
+async def stream_tts(request: TTSRequest):
+    """Stream audio for a preview while it is being synthesized"""
+    try:
+        return await open_tts_stream(request.text, request.voice, request.voice_settings)
+    except HTTPException:
+        raise
+    except TTSError as e:
+        logger.error(f"Error streaming TTS ({e.kind}): {str(e)}")
+        raise HTTPException(status_code=tts_error_status(e), detail=f"TTS streaming failed: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error streaming TTS: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"TTS streaming failed: {str(e)}")
+
+
+@api_router.get("/tts/stream")
+async def stream_tts_get(
+    text: str,
+    voice: str = "markus",
+    stability: float = 0.75,
+    similarity_boost: float = 0.85,
+    style: float = 0.0,
+    use_speaker_boost: bool = True
+):
+    """Streaming preview usable directly as an <audio> src"""
+    voice_settings = VoiceSettingsModel(
+        stability=stability,
+        similarity_boost=similarity_boost,
+        style=style,
+        use_speaker_boost=use_speaker_boost
+    )
+    try:
+        return await open_tts_stream(text, voice, voice_settings)
+    except HTTPException:
+        raise
+    except TTSError as e:
+        logger.error(f"Error streaming TTS ({e.kind}): {str(e)}")
+        raise HTTPException(status_code=tts_error_status(e), detail=f"TTS streaming failed: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error streaming TTS: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"TTS streaming failed: {str(e)}")
+
+
+@api_router.get("/tts/scheduler")
+async def get_tts_scheduler_stats():
+    """Get TTS scheduler load, rate and character quota counters"""
+    return tts_scheduler.stats()
+
+
+@api_router.get("/tts/cache")
+async def get_tts_cache_stats():
+    """Get TTS audio cache statistics"""
+    return tts_cache.stats()
+
+
+@api_router.post("/tts/generate-episode/{episode_id}", status_code=202)
+async def generate_episode_audio(episode_id: str, gap_ms: Optional[int] = None):
+    """Queue audio generation for an entire episode with multiple speakers"""
+    try:
+        episode = await db.episodes.find_one({"id": episode_id}, {"_id": 0})
+        if not episode:
+            raise HTTPException(status_code=404, detail="Episode not found")
         
-        logger.info(f"Episode audio generated: {episode_id}")
+        # Only one render per episode at a time
+        job = await find_or_submit_render_job(episode, gap_ms)
         
         return {
+            "job_id": job['id'],
             "episode_id": episode_id,
-            "audio_url": final_audio_url,
-            "segments": len(audio_files)
+            "status": job['status'],
+            "status_url": f"/api/jobs/{job['id']}"
         }
     except HTTPException:
-        # Re-raise HTTP exceptions
-        await db.episodes.update_one(
-            {"id": episode_id},
-            {"$set": {"status": "error"}}
-        )
         raise
     except Exception as e:
-        logger.error(f"Error generating episode audio: {str(e)}")
-        # Update status to error
-        await db.episodes.update_one(
-            {"id": episode_id},
-            {"$set": {"status": "error"}}
-        )
-        raise HTTPException(status_code=500, detail=f"Unerwarteter Fehler: {str(e)}")
+        logger.error(f"Error queueing episode audio: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 
-@api_router.get("/audio/{filename}")
-async def get_audio_file(filename: str):
+@api_router.api_route("/audio/{filename}", methods=["GET", "HEAD"])
+async def get_audio_file(filename: str, request: Request):
     """Serve audio files"""
-    audio_path = AUDIO_DIR / filename
-    if not audio_path.exists():
-        raise HTTPException(status_code=404, detail="Audio file not found")
-    return FileResponse(audio_path, media_type="audio/mpeg")
+    response = serve_media_file(request, AUDIO_DIR, filename, "audio/mpeg", "Audio file not found")
+    if request.method == "GET" and isinstance(response, MediaFileResponse):
+        regions = [part for part in response.parts if not isinstance(part, bytes)]
+        size = media_index.lookup(AUDIO_DIR, filename)['size']
+        if size:
+            analytics_buffer.record(request, f"/api/audio/{filename}", regions, size)
+    return response
 
 
-@api_router.get("/video/{filename}")
-async def get_video_file(filename: str):
+@api_router.api_route("/video/{filename}", methods=["GET", "HEAD"])
+async def get_video_file(filename: str, request: Request):
     """Serve video files"""
-    video_path = VIDEO_DIR / filename
-    if not video_path.exists():
-        raise HTTPException(status_code=404, detail="Video file not found")
-    return FileResponse(video_path, media_type="video/mp4")
+    return serve_media_file(request, VIDEO_DIR, filename, "video/mp4", "Video file not found")
 
 
-@api_router.get("/image/{filename}")
-async def get_image_file(filename: str):
+@api_router.api_route("/image/{filename}", methods=["GET", "HEAD"])
+async def get_image_file(filename: str, request: Request):
     """Serve image files"""
-    image_path = IMAGE_DIR / filename
-    if not image_path.exists():
-        raise HTTPException(status_code=404, detail="Image file not found")
-    
-    # Determine media type from extension
-    ext = image_path.suffix.lower()
-    media_types = {
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png',
-        '.gif': 'image/gif',
-        '.webp': 'image/webp',
-    }
-    media_type = media_types.get(ext, 'image/jpeg')
+    return serve_media_file(request, IMAGE_DIR, filename, "image/jpeg", "Image file not found")
+
+
+@api_router.get("/peaks/{kind}/{filename}")
+async def get_waveform_peaks(kind: str, filename: str, start: float = 0.0, end: Optional[float] = None, width: int = 1000):
+    """Waveform min/max peaks of an audio/video file for a time range.
     
-    return FileResponse(image_path, media_type=media_type)
+    Picks the coarsest zoom level that still yields at least `width` peaks for the range.
+    The response follows the audiowaveform JSON layout (8-bit interleaved min/max).
+    """
+    try:
+        file_url = f"/api/{kind}/{filename}"
+        info = await analyze_media_file(file_url)
+        if not info:
+            raise HTTPException(status_code=404, detail="Media file not found")
+        
+        width = min(max(width, 1), PEAKS_MAX_WIDTH)
+        sample_rate = info['sample_rate']
+        duration = info['duration']
+        start = min(max(start, 0.0), duration)
+        end = duration if end is None else min(max(end, start), duration)
+        
+        span = (end - start) * sample_rate
+        level = info['levels'][0]
+        for candidate in reversed(info['levels']):
+            if span / candidate['samples_per_peak'] >= width:
+                level = candidate
+                break
+        
+        samples_per_peak = level['samples_per_peak']
+        first = min(int(start * sample_rate // samples_per_peak), level['count'])
+        last = min(-(-int(end * sample_rate) // samples_per_peak), level['count'])
+        data = await asyncio.to_thread(read_peaks, peaks_path_for(file_url), level, first, max(last, first))
+        
+        return {
+            "version": 2,
+            "channels": 1,
+            "sample_rate": sample_rate,
+            "samples_per_pixel": samples_per_peak,
+            "bits": 8,
+            "start": first * samples_per_peak / sample_rate,
+            "length": len(data) // 2,
+            "duration": duration,
+            "data": data.tolist()
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading waveform peaks: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============================================================================
+# RENDER JOBS
+# ============================================================================
+
+@api_router.get("/jobs", response_model=List[RenderJob])
+async def get_render_jobs(episode_id: Optional[str] = None, status: Optional[str] = None, limit: int = 50):
+    """List render jobs, newest first"""
+    try:
+        query = {}
+        if episode_id:
+            query['episode_id'] = episode_id
+        if status:
+            query['status'] = status
+        
+        jobs = await db.render_jobs.find(
+            query, {"_id": 0, "segments": 0}
+        ).sort("created_at", -1).limit(limit).to_list(limit)
+        
+        return jobs
+    except Exception as e:
+        logger.error(f"Error fetching render jobs: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/jobs/{job_id}", response_model=RenderJob)
+async def get_render_job(job_id: str):
+    """Get status and progress of a render job"""
+    try:
+        job = await db.render_jobs.find_one({"id": job_id}, {"_id": 0, "segments": 0})
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching render job: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.post("/jobs/{job_id}/cancel", response_model=RenderJob)
+async def cancel_render_job(job_id: str):
+    """Cancel a queued or running render job"""
+    try:
+        job = await db.render_jobs.find_one({"id": job_id}, {"_id": 0})
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job['status'] not in ACTIVE_RENDER_STATUSES:
+            raise HTTPException(status_code=409, detail=f"Job is already {job['status']}")
+        
+        await update_render_job(job_id, {"cancel_requested": True})
+        
+        # Queued jobs are cancelled right here; running ones when their task unwinds
+        cancelled_while_queued = await db.render_jobs.update_one(
+            {"id": job_id, "status": "queued"},
+            {"$set": {"status": "cancelled", "finished_at": datetime.now(timezone.utc)}}
+        )
+        if cancelled_while_queued.modified_count:
+            await db.episodes.update_one({"id": job['episode_id']}, {"$set": {"status": "draft"}})
+            dashboard_cache.invalidate()
+        
+        task = running_render_jobs.get(job_id)
+        if task:
+            user_cancelled_render_jobs.add(job_id)
+            task.cancel()
+            await asyncio.wait([task])
+            user_cancelled_render_jobs.discard(job_id)
+        
+        logger.info(f"Cancelled render job: {job_id}")
+        return await db.render_jobs.find_one({"id": job_id}, {"_id": 0, "segments": 0})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error cancelling render job: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 # ============================================================================
@@ -584,20 +4253,13 @@ async def chatgpt_suggestion(request: ChatGPTRequest):
     try:
         system_message = "Du bist ein hilfreicher Assistent für Podcast-Produzenten. Antworte auf Deutsch und sei kreativ aber präzise."
         
-        # Use Emergent LLM integration
-        chat = LlmChat(
-            api_key=emergent_llm_key,
-            session_id=str(uuid.uuid4()),
-            system_message=system_message
-        ).with_model("openai", "gpt-4o-mini")
-        
         # Create prompt with context
         prompt_text = request.prompt
         if request.context:
-            prompt_text = f"Kontext: {request.context}\\n\\n{request.prompt}"
+            prompt_text = f"Kontext: {request.context}\n\n{request.prompt}"
         
-        user_message = UserMessage(text=prompt_text)
-        response = await chat.send_message(user_message)
+        # Use Emergent LLM integration (cached, identical concurrent requests share one call)
+        response = await complete_chat(system_message, prompt_text)
         
         logger.info("ChatGPT suggestion generated")
         
@@ -610,6 +4272,12 @@ async def chatgpt_suggestion(request: ChatGPTRequest):
         raise HTTPException(status_code=500, detail=f"ChatGPT error: {str(e)}")
 
 
+@api_router.get("/chatgpt/cache")
+async def get_llm_cache_stats():
+    """Get LLM response cache statistics"""
+    return llm_cache.stats()
+
+
 @api_router.post("/chatgpt/generate-shownotes/{episode_id}")
 async def generate_shownotes(episode_id: str):
     """Generate shownotes for an episode"""
@@ -618,30 +4286,8 @@ async def generate_shownotes(episode_id: str):
         if not episode:
             raise HTTPException(status_code=404, detail="Episode not found")
         
-        prompt = f"""
-        Erstelle professionelle Shownotes für diese Podcast-Episode:
-        
-        Titel: {episode['metadata']['title']}
-        Inhalt: {episode['text_content'][:1000]}...
-        
-        Die Shownotes sollten enthalten:
-        1. Eine kurze Zusammenfassung (2-3 Sätze)
-        2. Hauptthemen mit Zeitmarkern (geschätzt)
-        3. Wichtige Erwähnungen oder Links
-        4. Keywords für SEO
-        
-        Format: Markdown
-        """
-        
-        # Use Emergent LLM integration
-        chat = LlmChat(
-            api_key=emergent_llm_key,
-            session_id=str(uuid.uuid4()),
-            system_message="Du bist ein Experte für Podcast-Shownotes."
-        ).with_model("openai", "gpt-4o-mini")
-        
-        user_message = UserMessage(text=prompt)
-        shownotes = await chat.send_message(user_message)
+        # Map-reduce over the whole script; timestamps come from the rendered audio when it is current
+        shownotes = await generate_episode_shownotes(episode)
         
         # Update episode with shownotes
         await db.episodes.update_one(
@@ -666,65 +4312,124 @@ async def generate_shownotes(episode_id: str):
 # ANALYTICS
 # ============================================================================
 
+class DashboardStatsCache:
+    """Holds the last computed dashboard stats until they expire or an episode changes.
+    
+    Concurrent misses share one computation. invalidate() bumps a generation
+    counter so a computation that started before a write is never stored.
+    """
+    
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._value: Optional[Dict[str, Any]] = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._loading: Optional[asyncio.Task] = None
+    
+    async def get(self, compute: Callable[[], Any]) -> Dict[str, Any]:
+        if self._value is not None and time.monotonic() < self._expires_at:
+            return self._value
+        if self._loading is None or self._loading.done():
+            self._loading = asyncio.create_task(self._load(compute))
+        # A client that disconnects must not cancel the load other requests are waiting on
+        return await asyncio.shield(self._loading)
+    
+    async def _load(self, compute: Callable[[], Any]) -> Dict[str, Any]:
+        generation = self._generation
+        value = await compute()
+        if generation == self._generation:
+            self._value = value
+            self._expires_at = time.monotonic() + self.ttl_seconds
+        return value
+    
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._value = None
+        self._loading = None
+
+
+dashboard_cache = DashboardStatsCache(DASHBOARD_CACHE_TTL_SECONDS)
+
+
+async def compute_dashboard_stats() -> Dict[str, Any]:
+    """Episode counts and recent episodes in a single $facet aggregation, plus download totals from the rollups"""
+    recent_projection = {"_id": 0, **{field: 1 for field in EpisodeSummary.model_fields}}
+    pipeline = [{"$facet": {
+        "counts": [{"$group": {
+            "_id": None,
+            "total": {"$sum": 1},
+            "published": {"$sum": {"$cond": [{"$eq": ["$status", "published"]}, 1, 0]}}
+        }}],
+        "recent": [
+            {"$sort": {"created_at": -1, "id": -1}},
+            {"$limit": DASHBOARD_RECENT_EPISODES},
+            {"$project": recent_projection}
+        ]
+    }}]
+    result = (await db.episodes.aggregate(pipeline).to_list(1))[0]
+    counts = result['counts'][0] if result['counts'] else {"total": 0, "published": 0}
+    
+    downloads = await db.analytics_stats.aggregate([{"$group": {
+        "_id": "$episode_id",
+        "downloads": {"$sum": "$downloads"},
+        "listeners": {"$sum": "$listeners"}
+    }}]).to_list(None)
+    
+    return {
+        "total_episodes": counts['total'],
+        "published_episodes": counts['published'],
+        "total_downloads": sum(row['downloads'] for row in downloads),
+        "average_listeners": round(sum(row['listeners'] for row in downloads) / len(downloads)) if downloads else 0,
+        "recent_episodes": result['recent'],
+        "upcoming_episodes": []  # TODO: Add scheduled episodes
+    }
+
+
 @api_router.get("/analytics/dashboard")
 async def get_dashboard_stats():
     """Get dashboard analytics"""
     try:
-        # Total episodes
-        total_episodes = await db.episodes.count_documents({})
-        
-        # Published episodes
-        published_episodes = await db.episodes.count_documents({"status": "published"})
-        
-        # Total downloads (mock data for MVP)
-        total_downloads = published_episodes * 150  # Average
-        
-        # Recent episodes
-        recent_episodes = await db.episodes.find(
-            {}, {"_id": 0}
-        ).sort("created_at", -1).limit(3).to_list(3)
-        
-        # Convert dates
-        for ep in recent_episodes:
-            if isinstance(ep.get('created_at'), str):
-                ep['created_at'] = datetime.fromisoformat(ep['created_at'])
-            if isinstance(ep.get('updated_at'), str):
-                ep['updated_at'] = datetime.fromisoformat(ep['updated_at'])
-        
-        return {
-            "total_episodes": total_episodes,
-            "published_episodes": published_episodes,
-            "total_downloads": total_downloads,
-            "average_listeners": 120,
-            "recent_episodes": recent_episodes,
-            "upcoming_episodes": []  # TODO: Add scheduled episodes
-        }
+        return await dashboard_cache.get(compute_dashboard_stats)
     except Exception as e:
         logger.error(f"Error fetching dashboard stats: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @api_router.get("/analytics/episode/{episode_id}")
-async def get_episode_analytics(episode_id: str):
-    """Get analytics for a specific episode"""
+async def get_episode_analytics(episode_id: str, days: Optional[int] = None):
+    """Get analytics for a specific episode from its daily rollups"""
     try:
-        episode = await db.episodes.find_one({"id": episode_id}, {"_id": 0})
+        episode = await db.episodes.find_one({"id": episode_id}, {"_id": 0, "id": 1})
         if not episode:
             raise HTTPException(status_code=404, detail="Episode not found")
         
-        # Mock analytics data for MVP
+        query: Dict[str, Any] = {"episode_id": episode_id}
+        if days:
+            query["date"] = {"$gte": datetime.now(timezone.utc) - timedelta(days=days)}
+        daily = [
+            AnalyticsStats(**doc) for doc in
+            await db.analytics_stats.find(query, {"_id": 0}).sort("date", 1).to_list(None)
+        ]
+        
+        downloads = sum(stats.downloads for stats in daily)
+        sources: Dict[str, int] = {}
+        for stats in daily:
+            for source, count in stats.traffic_sources.items():
+                sources[source] = sources.get(source, 0) + count
+        
         return {
             "episode_id": episode_id,
-            "downloads": 245,
-            "listeners": 198,
-            "average_listen_duration": 78.5,  # percentage
-            "top_countries": ["Germany", "Austria", "Switzerland"],
+            "downloads": downloads,
+            "listeners": sum(stats.listeners for stats in daily),
+            # percentage, weighted by downloads per day
+            "average_listen_duration": round(
+                sum(stats.average_listen_duration * stats.downloads for stats in daily) / downloads, 1
+            ) if downloads else 0.0,
+            "top_countries": [],  # not collected
             "traffic_sources": {
-                "spotify": 45,
-                "apple_podcasts": 30,
-                "direct": 15,
-                "other": 10
-            }
+                source: round(100 * count / downloads) for source, count in sources.items()
+            } if downloads else {},
+            "daily": daily
         }
     except HTTPException:
         raise
@@ -738,71 +4443,404 @@ async def get_episode_analytics(episode_id: str):
 # ============================================================================
 
 @api_router.post("/music/upload")
-async def upload_music(file: UploadFile = File(...), category: str = "background"):
-    """Upload audio, video, or image files"""
+async def upload_music(request: Request, category: str = "background"):
+    """Upload audio, video, or image files (multipart/form-data with a "file" field)"""
     try:
-        # Determine file type and storage directory
-        content_type = file.content_type or ''
-        
-        if content_type.startswith('audio/'):
-            storage_dir = AUDIO_DIR
-            url_prefix = '/api/audio'
-        elif content_type.startswith('video/'):
-            storage_dir = VIDEO_DIR
-            url_prefix = '/api/video'
-        elif content_type.startswith('image/'):
-            storage_dir = IMAGE_DIR
-            url_prefix = '/api/image'
-        else:
-            # Default to audio
-            storage_dir = AUDIO_DIR
-            url_prefix = '/api/audio'
+        # Save file as it arrives, then store it under its content hash; the part's
+        # content type is only known once the body is being read, so it is staged in
+        # the audio directory and moved into the right media directory afterwards
+        incoming_path = AUDIO_DIR / f".incoming_{uuid.uuid4()}"
+        saved = await save_upload_stream(request, incoming_path)
+        content_type = saved['content_type']
+        filename = saved['filename']
         
-        # Save file
-        file_filename = f"{uuid.uuid4()}_{file.filename}"
-        file_path = storage_dir / file_filename
-        
-        async with aiofiles.open(file_path, 'wb') as out_file:
-            content = await file.read()
-            await out_file.write(content)
+        # Determine file type and storage directory
+        _, url_prefix = resolve_media_storage(content_type)
+        blob = await ingest_blob(
+            incoming_path,
+            saved['sha256'],
+            saved['size_bytes'],
+            url_prefix,
+            blob_extension(filename)
+        )
         
         # Create file entry
         media_file = MusicFile(
-            name=file.filename,
-            file_url=f"{url_prefix}/{file_filename}",
-            category=category
+            name=safe_filename(filename),
+            file_url=blob['file_url'],
+            category=category,
+            sha256=saved['sha256'],
+            size_bytes=saved['size_bytes'],
+            blob_id=blob['blob_id']
         )
         
         doc = media_file.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
         doc['content_type'] = content_type
         
         await db.music_library.insert_one(doc)
-        logger.info(f"Media file uploaded: {file.filename} ({content_type})")
+        schedule_media_analysis(media_file.file_url)
+        logger.info(f"Media file uploaded: {filename} ({content_type}, {saved['size_bytes']} bytes)")
         
         return media_file
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading file: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@api_router.get("/music", response_model=List[MusicFile])
-async def get_music_library(category: Optional[str] = None):
-    """Get music library"""
+@api_router.get("/music", response_model=MusicFilePage)
+async def get_music_library(category: Optional[str] = None, limit: int = 100, cursor: Optional[str] = None):
+    """Get music library, newest first; pass next_cursor back to get the following page"""
     try:
+        limit = min(max(limit, 1), 500)
         query = {"category": category} if category else {}
-        music_files = await db.music_library.find(query, {"_id": 0}).to_list(100)
+        projection = {"_id": 0, **{field: 1 for field in MusicFile.model_fields}}
+        return await find_page(db.music_library, query, projection, limit, cursor)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching music library: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.delete("/music/{file_id}")
+async def delete_music_file(file_id: str):
+    """Delete a media library entry and release its stored file"""
+    try:
+        file_doc = await db.music_library.find_one_and_delete({"id": file_id}, {"_id": 0})
+        if not file_doc:
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        blob_id = file_doc.get('blob_id') or blob_id_for_url(file_doc['file_url'])
+        if blob_id:
+            await release_blob(blob_id)
+        else:
+            # Files from before the blob store belong to exactly one entry
+            media_path_for_url(file_doc['file_url']).unlink(missing_ok=True)
+            peaks_path = peaks_path_for(file_doc['file_url'])
+            if peaks_path:
+                peaks_path.unlink(missing_ok=True)
+        
+        logger.info(f"Deleted media file: {file_id}")
+        return {"message": "File deleted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting media file: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============================================================================
+# CONTENT-ADDRESSED MEDIA BLOBS
+# ============================================================================
+
+# Blobs live flat in the media directories as "<sha256><ext>" so the existing
+# /api/audio|video|image routes serve them; media_blobs tracks reference counts.
+MEDIA_STORAGE_DIRS = {"audio": AUDIO_DIR, "video": VIDEO_DIR, "image": IMAGE_DIR}
+
+# Serializes reference count changes against file creation/removal within this process
+blob_lock = asyncio.Lock()
+
+
+def blob_extension(filename: Optional[str]) -> str:
+    suffix = Path(filename or "").suffix.lower()
+    return suffix if re.fullmatch(r"\.[a-z0-9]{1,8}", suffix) else ""
+
+
+def blob_id_for_url(file_url: str) -> Optional[str]:
+    """Blob id of a media URL, or None for files that predate the blob store"""
+    kind, _, filename = file_url.removeprefix('/api/').partition('/')
+    if kind in MEDIA_STORAGE_DIRS and CONTENT_ADDRESSED_NAME.fullmatch(filename):
+        return f"{kind}/{filename}"
+    return None
+
+
+def media_path_for_url(file_url: str) -> Path:
+    kind, _, filename = file_url.removeprefix('/api/').partition('/')
+    return MEDIA_STORAGE_DIRS.get(kind, AUDIO_DIR) / filename
+
+
+async def ingest_blob(source: Path, sha256: str, size: int, url_prefix: str, ext: str) -> Dict[str, Any]:
+    """Move a finished file into the blob store, or drop it if the same bytes are already stored.
+    
+    Takes one reference on the blob; returns its id and URL.
+    """
+    kind = url_prefix.removeprefix('/api/')
+    filename = f"{sha256}{ext}"
+    blob_id = f"{kind}/{filename}"
+    blob_path = MEDIA_STORAGE_DIRS[kind] / filename
+    
+    async with blob_lock:
+        await db.media_blobs.update_one(
+            {"id": blob_id},
+            {
+                "$inc": {"ref_count": 1},
+                "$setOnInsert": {
+                    "sha256": sha256,
+                    "size_bytes": size,
+                    "created_at": datetime.now(timezone.utc)
+                }
+            },
+            upsert=True
+        )
+        if blob_path.exists():
+            source.unlink(missing_ok=True)
+            logger.info(f"Deduplicated media blob {blob_id}")
+        else:
+            source.replace(blob_path)
+    
+    return {"blob_id": blob_id, "file_url": f"{url_prefix}/{filename}"}
+
+
+async def ingest_file(source: Path, url_prefix: str, ext: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+    """ingest_blob for a file whose hash is not known yet"""
+    if sha256 is None:
+        sha256 = await asyncio.to_thread(hash_file, source)
+    size = source.stat().st_size
+    result = await ingest_blob(source, sha256, size, url_prefix, ext)
+    return {**result, "sha256": sha256, "size_bytes": size}
+
+
+async def acquire_blob(blob_id: str) -> bool:
+    """Take another reference on an existing blob"""
+    async with blob_lock:
+        result = await db.media_blobs.update_one(
+            {"id": blob_id, "ref_count": {"$gt": 0}},
+            {"$inc": {"ref_count": 1}}
+        )
+    return result.modified_count == 1
+
+
+async def release_blob(blob_id: str) -> None:
+    """Drop one reference; the blob file is deleted with the last one"""
+    kind, _, filename = blob_id.partition('/')
+    async with blob_lock:
+        await db.media_blobs.update_one({"id": blob_id}, {"$inc": {"ref_count": -1}})
+        reclaimed = await db.media_blobs.delete_one({"id": blob_id, "ref_count": {"$lte": 0}})
+        if reclaimed.deleted_count:
+            (MEDIA_STORAGE_DIRS[kind] / filename).unlink(missing_ok=True)
+            media_index.invalidate(MEDIA_STORAGE_DIRS[kind] / filename)
+            peaks_path = peaks_path_for(f"/api/{blob_id}")
+            if peaks_path:
+                peaks_path.unlink(missing_ok=True)
+            logger.info(f"Reclaimed media blob {blob_id}")
+
+
+# ============================================================================
+# RESUMABLE UPLOADS
+# ============================================================================
+
+# Serializes chunk writes per session within this process
+# A session's lock lives only while a request holds or waits for it, so made-up ids,
+# failed requests and sessions that are aborted or expired leave nothing behind
+upload_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def upload_part_path(session: Dict[str, Any]) -> Path:
+    """In-progress upload, kept in its final directory so completing it is a rename"""
+    storage_dir, _ = resolve_media_storage(session['content_type'])
+    return storage_dir / f".upload_{session['id']}.part"
+
+
+async def get_upload_session_doc(session_id: str) -> Dict[str, Any]:
+    session = await db.upload_sessions.find_one({"id": session_id}, {"_id": 0})
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    
+    if session['status'] == "uploading":
+        # Bytes acknowledged in the DB but lost from disk (e.g. crash before flush) must be resent
+        part_path = upload_part_path(session)
+        on_disk = part_path.stat().st_size if part_path.exists() else 0
+        session['received_bytes'] = min(session['received_bytes'], on_disk)
+    return session
+
+
+@api_router.post("/uploads", response_model=UploadSession, status_code=201)
+async def create_upload_session(session_input: UploadSessionCreate):
+    """Start a resumable upload"""
+    try:
+        if session_input.total_size <= 0:
+            raise HTTPException(status_code=400, detail="total_size must be positive")
+        if session_input.total_size > MAX_UPLOAD_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Datei zu groß (maximal {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)"
+            )
         
-        for file in music_files:
-            if isinstance(file.get('created_at'), str):
-                file['created_at'] = datetime.fromisoformat(file['created_at'])
+        session = UploadSession(
+            filename=safe_filename(session_input.filename),
+            content_type=session_input.content_type or '',
+            category=session_input.category,
+            total_size=session_input.total_size
+        )
+        
+        doc = session.model_dump()
         
-        return music_files
+        upload_part_path(doc).touch()
+        await db.upload_sessions.insert_one(doc)
+        logger.info(f"Upload session created: {session.id} ({session.filename}, {session.total_size} bytes)")
+        
+        return session
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching music library: {str(e)}")
+        logger.error(f"Error creating upload session: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/uploads/{session_id}", response_model=UploadSession)
+async def get_upload_session(session_id: str):
+    """Get an upload session; received_bytes is the offset to resume from"""
+    try:
+        return await get_upload_session_doc(session_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching upload session: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.put("/uploads/{session_id}", response_model=UploadSession)
+async def upload_chunk(session_id: str, offset: int, request: Request):
+    """Write the request body in place at offset.
+    
+    A chunk may overlap bytes already received (retransmits) but must not leave a gap.
+    """
+    try:
+        lock = upload_locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            session = await get_upload_session_doc(session_id)
+            if session['status'] != "uploading":
+                raise HTTPException(status_code=409, detail=f"Upload is already {session['status']}")
+            if offset < 0 or offset > session['received_bytes']:
+                raise HTTPException(
+                    status_code=416,
+                    detail=f"Offset {offset} does not match received bytes {session['received_bytes']}"
+                )
+            
+            position = offset
+            try:
+                async with aiofiles.open(upload_part_path(session), 'r+b') as part_file:
+                    await part_file.seek(offset)
+                    async for chunk in request.stream():
+                        if position + len(chunk) > session['total_size']:
+                            raise HTTPException(status_code=413, detail="Chunk exceeds the declared total_size")
+                        await part_file.write(chunk)
+                        position += len(chunk)
+                    await part_file.flush()
+            finally:
+                # Whatever made it to disk counts, even if the client dropped mid-chunk
+                received = max(session['received_bytes'], position)
+                await db.upload_sessions.update_one(
+                    {"id": session_id},
+                    {"$set": {
+                        "received_bytes": received,
+                        "updated_at": datetime.now(timezone.utc)
+                    }}
+                )
+            
+            session['received_bytes'] = received
+            return session
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error writing upload chunk: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.post("/uploads/{session_id}/complete", response_model=MusicFile)
+async def complete_upload(session_id: str):
+    """Finalize a fully received upload into a media library entry"""
+    try:
+        lock = upload_locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            session = await get_upload_session_doc(session_id)
+            if session['status'] == "completed":
+                # Completing twice (e.g. a retried request) returns the same entry
+                file_doc = await db.music_library.find_one({"id": session['file_id']}, {"_id": 0})
+                if not file_doc:
+                    raise HTTPException(status_code=404, detail="Uploaded file no longer exists")
+                return file_doc
+            if session['received_bytes'] != session['total_size']:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Upload incomplete: {session['received_bytes']}/{session['total_size']} bytes"
+                )
+            
+            # Hash without loading the file; it stays where it was written and becomes the blob
+            _, url_prefix = resolve_media_storage(session['content_type'])
+            blob = await ingest_file(upload_part_path(session), url_prefix, blob_extension(session['filename']))
+            
+            media_file = MusicFile(
+                name=session['filename'],
+                file_url=blob['file_url'],
+                category=session['category'],
+                sha256=blob['sha256'],
+                size_bytes=session['total_size'],
+                blob_id=blob['blob_id']
+            )
+            
+            doc = media_file.model_dump()
+            doc['content_type'] = session['content_type']
+            
+            await db.music_library.insert_one(doc)
+            schedule_media_analysis(media_file.file_url)
+            await db.upload_sessions.update_one(
+                {"id": session_id},
+                {"$set": {
+                    "status": "completed",
+                    "file_id": media_file.id,
+                    "file_url": media_file.file_url,
+                    "updated_at": datetime.now(timezone.utc)
+                }}
+            )
+        upload_locks.pop(session_id, None)
+        logger.info(f"Resumable upload completed: {session['filename']} ({session['total_size']} bytes)")
+        
+        return media_file
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error completing upload: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.delete("/uploads/{session_id}")
+async def abort_upload(session_id: str):
+    """Abort an upload and discard the received bytes"""
+    try:
+        lock = upload_locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            session = await get_upload_session_doc(session_id)
+            if session['status'] == "uploading":
+                upload_part_path(session).unlink(missing_ok=True)
+            await db.upload_sessions.delete_one({"id": session_id})
+        upload_locks.pop(session_id, None)
+        
+        logger.info(f"Upload session aborted: {session_id}")
+        return {"message": "Upload aborted"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error aborting upload: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def expire_upload_sessions() -> None:
+    """Drop unfinished uploads older than UPLOAD_SESSION_TTL_HOURS together with their part files"""
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=UPLOAD_SESSION_TTL_HOURS)
+    stale_sessions = await db.upload_sessions.find(
+        {"status": "uploading", "updated_at": {"$lt": cutoff}}, {"_id": 0}
+    ).to_list(None)
+    for session in stale_sessions:
+        upload_part_path(session).unlink(missing_ok=True)
+        await db.upload_sessions.delete_one({"id": session['id']})
+        upload_locks.pop(session['id'], None)
+    if stale_sessions:
+        logger.info(f"Expired {len(stale_sessions)} unfinished upload sessions")
+
+
 # ============================================================================
 # VOICES (Available voices info)
 # ============================================================================
@@ -865,33 +4903,71 @@ async def enhance_audio(request: AudioEnhanceRequest):
         if not audio_path.exists():
             raise HTTPException(status_code=404, detail="Audio file not found on disk")
         
-        # Create enhanced filename
-        enhanced_filename = f"enhanced_{uuid.uuid4()}_{filename}"
-        enhanced_path = AUDIO_DIR / enhanced_filename
+        probe = await probe_audio(audio_path)
+        sample_rate = probe['sample_rate'] or 44100
+        channels = probe['channels'] or 1
         
-        # For MVP, we'll simulate enhancement by copying the file
-        # In production, use FFmpeg or pydub for actual audio processing
-        import shutil
-        shutil.copy(audio_path, enhanced_path)
+        # Decode to raw float32 PCM, process it memory-mapped, then encode with the loudness gain
+        work_dir = AUDIO_DIR / f".enhance_{uuid.uuid4().hex[:8]}"
+        work_dir.mkdir()
+        try:
+            pcm_path = work_dir / "input.f32"
+            await run_media_command([
+                'ffmpeg', '-v', 'error', '-y',
+                '-i', str(audio_path),
+                '-vn',
+                '-ac', str(channels),
+                '-ar', str(sample_rate),
+                '-f', 'f32le',
+                str(pcm_path)
+            ], duration=probe['duration'], label=f"decode {filename}", reject_when_busy=True)
+            
+            frames = pcm_path.stat().st_size // (4 * channels)
+            if frames == 0:
+                raise HTTPException(status_code=400, detail="File contains no audio")
+            
+            report = await asyncio.to_thread(enhance_pcm, work_dir, pcm_path, frames, channels, sample_rate, request)
+            
+            enhanced_path = work_dir / "enhanced.mp3"
+            await run_media_command([
+                'ffmpeg', '-v', 'error', '-y',
+                '-f', 'f32le',
+                '-ar', str(sample_rate),
+                '-ac', str(channels),
+                '-i', str(report.pop('output_path')),
+                '-af', f"volume={report['output_gain_db']:.2f}dB",
+                '-c:a', 'libmp3lame',
+                '-q:a', '2',
+                str(enhanced_path)
+            ], duration=frames / sample_rate, label=f"encode {filename}")
+            blob = await ingest_file(enhanced_path, '/api/audio', '.mp3')
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
         
-        logger.info(f"Audio enhanced with settings: {request.model_dump()}")
+        logger.info(f"Audio enhanced with settings: {request.model_dump()}, result: {report}")
         
         # Create new file entry
         enhanced_file = MusicFile(
-            name=f"Enhanced_{file_doc['name']}",
-            file_url=f"/api/audio/{enhanced_filename}",
-            category=file_doc.get('category', 'enhanced')
+            name=f"Enhanced_{Path(file_doc['name']).stem}.mp3",
+            file_url=blob['file_url'],
+            category=file_doc.get('category', 'enhanced'),
+            duration=frames / sample_rate,
+            sha256=blob['sha256'],
+            size_bytes=blob['size_bytes'],
+            blob_id=blob['blob_id']
         )
         
         doc = enhanced_file.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
         doc['enhancement_settings'] = request.model_dump()
+        doc['enhancement_report'] = report
         
         await db.music_library.insert_one(doc)
+        schedule_media_analysis(enhanced_file.file_url)
         
         return {
             "success": True,
             "enhanced_file": enhanced_file,
+            "enhancement_report": report,
             "message": "Audio erfolgreich optimiert mit Rauschunterdrückung, Normalisierung und EQ-Anpassungen"
         }
     except HTTPException:
@@ -901,19 +4977,34 @@ async def enhance_audio(request: AudioEnhanceRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@api_router.get("/media/tasks")
+async def get_media_tasks():
+    """Running and queued ffmpeg commands with their progress"""
+    return media_pool.snapshot()
+
+
+@api_router.post("/media/tasks/{task_id}/cancel")
+async def cancel_media_task(task_id: str):
+    """Cancel a running or queued ffmpeg command"""
+    if not media_pool.cancel(task_id):
+        raise HTTPException(status_code=404, detail="Media task not found")
+    return {"task_id": task_id, "cancel_requested": True}
+
+
 @api_router.post("/media/trim-video")
 async def trim_video(
     file_id: str,
     trim_start: float = 0,
     trim_end: float = 0,
     music_volume: float = 1.0,
-    voice_volume: float = 1.0
+    voice_volume: float = 1.0,
+    task_id: Optional[str] = None
 ):
-    """Trim video and apply audio mixing"""
+    """Trim video and apply audio mixing
+    
+    Pass a client-generated task_id to follow progress via /media/tasks or cancel the edit.
+    """
     try:
-        import ffmpeg
-        import subprocess
-        
         # Get the file from database
         file_doc = await db.music_library.find_one({"id": file_id}, {"_id": 0})
         if not file_doc:
@@ -945,58 +5036,75 @@ async def trim_video(
             # Calculate duration
             duration = max(0, trim_end - trim_start) if trim_end > trim_start else 0
             
-            # Build FFmpeg command
-            if duration > 0:
-                cmd = [
-                    'ffmpeg',
-                    '-i', str(input_path),
-                    '-ss', str(trim_start),
-                    '-t', str(duration),
-                    '-vcodec', 'libx264',  # Re-encode video for compatibility
-                    '-acodec', 'aac',  # Re-encode audio
-                    '-af', f'volume={voice_volume}',  # Apply volume to audio
-                    '-y',  # Overwrite output file
-                    str(output_path)
-                ]
-            else:
-                # No trimming, just process audio
-                cmd = [
-                    'ffmpeg',
-                    '-i', str(input_path),
-                    '-vcodec', 'copy',
-                    '-acodec', 'aac',
-                    '-af', f'volume={voice_volume}',
-                    '-y',
-                    str(output_path)
-                ]
-            
-            # Execute FFmpeg
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            
-            if result.returncode != 0:
-                logger.error(f"FFmpeg error: {result.stderr}")
-                raise Exception(f"Video processing failed: {result.stderr[:200]}")
+            try:
+                cmd = None
+                if duration > 0:
+                    # Stream-copy whole GOPs and re-encode only the cut edges where the codec allows it
+                    mode = 'smart_cut'
+                    if not await smart_cut_video(input_path, output_path, trim_start, trim_end, voice_volume, task_id):
+                        mode = 'reencode'
+                        cmd = [
+                            'ffmpeg',
+                            '-ss', str(trim_start),
+                            '-i', str(input_path),
+                            '-t', str(duration),
+                            '-vcodec', 'libx264',  # Re-encode video for compatibility
+                            '-acodec', 'aac',  # Re-encode audio
+                            '-af', f'volume={voice_volume}',  # Apply volume to audio
+                            '-y',  # Overwrite output file
+                            str(output_path)
+                        ]
+                else:
+                    # No trimming, just process audio
+                    mode = 'copy'
+                    cmd = [
+                        'ffmpeg',
+                        '-i', str(input_path),
+                        '-vcodec', 'copy',
+                        '-acodec', 'aac',
+                        '-af', f'volume={voice_volume}',
+                        '-y',
+                        str(output_path)
+                    ]
+                
+                if cmd:
+                    # Execute FFmpeg on the worker pool; the timeout scales with the output length
+                    await run_media_command(
+                        cmd,
+                        duration=duration or await probe_duration(input_path),
+                        label=f"trim {filename}",
+                        task_id=task_id,
+                        reject_when_busy=True
+                    )
+            except BaseException:
+                output_path.unlink(missing_ok=True)
+                raise
             
             logger.info(f"Video processed successfully: {output_filename}")
+            blob = await ingest_file(output_path, '/api/video', '.mp4')
             
             # Create new file entry
             processed_file = MusicFile(
                 name=f"Edited_{file_doc['name']}",
-                file_url=f"/api/video/{output_filename}",
-                category='edited'
+                file_url=blob['file_url'],
+                category='edited',
+                sha256=blob['sha256'],
+                size_bytes=blob['size_bytes'],
+                blob_id=blob['blob_id']
             )
             
             doc = processed_file.model_dump()
-            doc['created_at'] = doc['created_at'].isoformat()
             doc['original_file_id'] = file_id
             doc['edit_settings'] = {
                 'trim_start': trim_start,
                 'trim_end': trim_end,
                 'music_volume': music_volume,
-                'voice_volume': voice_volume
+                'voice_volume': voice_volume,
+                'mode': mode
             }
             
             await db.music_library.insert_one(doc)
+            schedule_media_analysis(processed_file.file_url)
             
             return {
                 "success": True,
@@ -1005,7 +5113,9 @@ async def trim_video(
                 "duration": trim_end - trim_start
             }
             
-        except subprocess.TimeoutExpired:
+        except HTTPException:
+            raise
+        except asyncio.TimeoutError:
             raise HTTPException(status_code=408, detail="Video processing timeout")
         except Exception as ffmpeg_error:
             logger.error(f"FFmpeg processing error: {str(ffmpeg_error)}")
@@ -1027,8 +5137,77 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Audio-Url", "X-TTS-Cache", "ETag", "Content-Range", "Accept-Ranges"],
 )
 
+@app.on_event("startup")
+async def start_database_setup():
+    # Index builds and the date migration run online, next to regular traffic
+    task = asyncio.create_task(prepare_database())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+@app.on_event("startup")
+async def start_render_workers():
+    # A cancel that was cut short by the restart is finished here; the worker never claims
+    # jobs with cancel_requested, so requeueing them would leave them queued forever
+    interrupted = await db.render_jobs.find(
+        {"status": {"$in": ACTIVE_RENDER_STATUSES}, "cancel_requested": True},
+        {"_id": 0, "id": 1, "episode_id": 1}
+    ).to_list(None)
+    if interrupted:
+        await db.render_jobs.update_many(
+            {"id": {"$in": [job['id'] for job in interrupted]}},
+            {"$set": {"status": "cancelled", "finished_at": datetime.now(timezone.utc)}}
+        )
+        await db.episodes.update_many(
+            {"id": {"$in": [job['episode_id'] for job in interrupted]}},
+            {"$set": {"status": "draft"}}
+        )
+        dashboard_cache.invalidate()
+        logger.info(f"Cancelled {len(interrupted)} render jobs whose cancellation was interrupted")
+    
+    # Jobs interrupted by a restart resume from their last completed segment
+    await db.render_jobs.update_many({"status": "running"}, {"$set": {"status": "queued"}})
+    pending_jobs = await db.render_jobs.find(
+        {"status": "queued"}, {"_id": 0, "id": 1}
+    ).sort("created_at", 1).to_list(None)
+    for job in pending_jobs:
+        render_queue.put_nowait(job['id'])
+    if pending_jobs:
+        logger.info(f"Resuming {len(pending_jobs)} render jobs")
+    
+    for worker_id in range(RENDER_WORKERS):
+        render_workers.append(asyncio.create_task(render_worker(worker_id)))
+
+@app.on_event("startup")
+async def cleanup_upload_sessions():
+    await expire_upload_sessions()
+
+@app.on_event("startup")
+async def start_tts_quota_refresh():
+    task = asyncio.create_task(refresh_tts_quota_forever(TTS_QUOTA_REFRESH_SECONDS))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+@app.on_event("startup")
+async def start_analytics_jobs():
+    for job in (
+        analytics_buffer.run(ANALYTICS_FLUSH_INTERVAL_SECONDS),
+        run_analytics_rollups(ANALYTICS_ROLLUP_INTERVAL_SECONDS)
+    ):
+        task = asyncio.create_task(job)
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+@app.on_event("shutdown")
+async def flush_analytics_events():
+    await analytics_buffer.flush()
+
+@app.on_event("shutdown")
+async def close_tts_provider():
+    await tts_provider.aclose()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
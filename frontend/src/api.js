@@ -11,16 +11,26 @@ const api = axios.create({
 });
 
 // Episodes
-export const getEpisodes = () => api.get('/episodes');
+export const getEpisodes = (params) => api.get('/episodes', { params });
 export const getEpisode = (id) => api.get(`/episodes/${id}`);
 export const createEpisode = (data) => api.post('/episodes', data);
 export const updateEpisode = (id, data) => api.put(`/episodes/${id}`, data);
 export const deleteEpisode = (id) => api.delete(`/episodes/${id}`);
+export const parseScript = (data) => api.post('/scripts/parse', data);
 
 // Text-to-Speech
 export const generateTTS = (data) => api.post('/tts/generate', data);
+// Streaming preview URL, playable directly in an <audio> element
+export const getTTSStreamUrl = ({ text, voice, voice_settings: settings = {} }) => {
+  const params = new URLSearchParams({ text, voice, ...settings });
+  return `${API_BASE}/tts/stream?${params.toString()}`;
+};
 export const generateEpisodeAudio = (episodeId) => api.post(`/tts/generate-episode/${episodeId}`);
 
+// Render Jobs
+export const getRenderJob = (jobId) => api.get(`/jobs/${jobId}`);
+export const cancelRenderJob = (jobId) => api.post(`/jobs/${jobId}/cancel`);
+
 // ChatGPT
 export const getChatGPTSuggestion = (data) => api.post('/chatgpt/suggest', data);
 export const generateShownotes = (episodeId) => api.post(`/chatgpt/generate-shownotes/${episodeId}`);
@@ -42,7 +52,62 @@ export const uploadMusic = (file, category) => {
     },
   });
 };
-export const getMusicLibrary = (category) => api.get('/music', { params: { category } });
+export const getMusicLibrary = (category, cursor) => api.get('/music', { params: { category, cursor } });
+export const deleteMediaFile = (fileId) => api.delete(`/music/${fileId}`);
+export const getWaveformPeaks = (kind, filename, params) => api.get(`/peaks/${kind}/${filename}`, { params });
+
+// Resumable uploads for large media: the session id is remembered per file so a
+// failed upload continues from the last byte the server acknowledged
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+const UPLOAD_MAX_RETRIES = 5;
+
+export const uploadResumable = async (file, category, onProgress) => {
+  const storageKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+  let session = null;
+
+  const savedId = localStorage.getItem(storageKey);
+  if (savedId) {
+    try {
+      session = (await api.get(`/uploads/${savedId}`)).data;
+    } catch (error) {
+      localStorage.removeItem(storageKey);
+    }
+  }
+  if (!session) {
+    session = (await api.post('/uploads', {
+      filename: file.name,
+      content_type: file.type,
+      total_size: file.size,
+      category,
+    })).data;
+    localStorage.setItem(storageKey, session.id);
+  }
+
+  let offset = session.received_bytes;
+  let failures = 0;
+  while (offset < file.size) {
+    try {
+      const chunk = file.slice(offset, offset + UPLOAD_CHUNK_SIZE);
+      const response = await api.put(`/uploads/${session.id}`, chunk, {
+        params: { offset },
+        headers: { 'Content-Type': 'application/octet-stream' },
+      });
+      offset = response.data.received_bytes;
+      failures = 0;
+      if (onProgress) onProgress(offset / file.size);
+    } catch (error) {
+      failures += 1;
+      if (failures > UPLOAD_MAX_RETRIES) throw error;
+      await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** failures));
+      // Ask the server where to continue
+      offset = (await api.get(`/uploads/${session.id}`)).data.received_bytes;
+    }
+  }
+
+  const response = await api.post(`/uploads/${session.id}/complete`);
+  localStorage.removeItem(storageKey);
+  return response;
+};
 
 // Media Enhancement
 export const enhanceAudio = (data) => api.post('/media/enhance-audio', data);
@@ -18,6 +18,25 @@ import {
   Undo as UndoIcon,
 } from '@mui/icons-material';
 import WaveSurfer from 'wavesurfer.js';
+import { getWaveformPeaks } from '../api';
+
+// Server-side peaks let the editor draw long files without downloading and decoding them
+const PEAKS_WIDTH = 2000;
+
+const loadPeaks = async (audioUrl) => {
+  const match = audioUrl.match(/\/api\/(audio|video)\/([^/?#]+)/);
+  if (!match) return null;
+  try {
+    const response = await getWaveformPeaks(match[1], match[2], { width: PEAKS_WIDTH });
+    return {
+      peaks: [response.data.data.map((value) => value / 128)],
+      duration: response.data.duration,
+    };
+  } catch (error) {
+    console.error('Error loading waveform peaks:', error);
+    return null;
+  }
+};
 
 function AudioEditor({ audioUrl, onSave }) {
   const waveformRef = useRef(null);
@@ -29,7 +48,12 @@ function AudioEditor({ audioUrl, onSave }) {
   const [regions, setRegions] = useState([]);
 
   useEffect(() => {
-    if (waveformRef.current && audioUrl) {
+    if (!waveformRef.current || !audioUrl) return undefined;
+    let cancelled = false;
+
+    const init = async () => {
+      const precomputed = await loadPeaks(audioUrl);
+      if (cancelled) return;
       try {
         // Initialize WaveSurfer
         wavesurfer.current = WaveSurfer.create({
@@ -45,7 +69,11 @@ function AudioEditor({ audioUrl, onSave }) {
           normalize: true,
         });
 
-        wavesurfer.current.load(audioUrl);
+        if (precomputed) {
+          wavesurfer.current.load(audioUrl, precomputed.peaks, precomputed.duration);
+        } else {
+          wavesurfer.current.load(audioUrl);
+        }
 
         wavesurfer.current.on('ready', () => {
           setDuration(wavesurfer.current.getDuration());
@@ -57,20 +85,24 @@ function AudioEditor({ audioUrl, onSave }) {
 
         wavesurfer.current.on('play', () => setPlaying(true));
         wavesurfer.current.on('pause', () => setPlaying(false));
-
-        return () => {
-          try {
-            if (wavesurfer.current) {
-              wavesurfer.current.destroy();
-            }
-          } catch (err) {
-            console.error('Error destroying wavesurfer:', err);
-          }
-        };
       } catch (error) {
         console.error('Error initializing WaveSurfer:', error);
       }
-    }
+    };
+
+    init();
+
+    return () => {
+      cancelled = true;
+      try {
+        if (wavesurfer.current) {
+          wavesurfer.current.destroy();
+          wavesurfer.current = null;
+        }
+      } catch (err) {
+        console.error('Error destroying wavesurfer:', err);
+      }
+    };
   }, [audioUrl]);
 
   const handlePlayPause = () => {
@@ -110,8 +110,14 @@ function Distribution() {
 
   const loadEpisodes = async () => {
     try {
-      const response = await getEpisodes();
-      setEpisodes(response.data.filter(ep => ep.audio_url));
+      const items = [];
+      let cursor = null;
+      do {
+        const response = await getEpisodes({ limit: 200, cursor });
+        items.push(...response.data.items);
+        cursor = response.data.next_cursor;
+      } while (cursor);
+      setEpisodes(items.filter(ep => ep.audio_url));
     } catch (error) {
       console.error('Error loading episodes:', error);
     }
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   Box,
   Container,
@@ -35,13 +35,62 @@ import {
   getEpisode,
   getVoices,
   generateTTS,
+  getTTSStreamUrl,
   generateEpisodeAudio,
+  getRenderJob,
+  cancelRenderJob,
   getChatGPTSuggestion,
+  parseScript,
 } from '../api';
 import AudioEditor from './AudioEditor';
 import FileUploader from './FileUploader';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const JOB_POLL_INTERVAL_MS = 2000;
+const PARSE_DEBOUNCE_MS = 250;
+
+// The changed range between two texts, as { start, deleted, inserted } in code points;
+// the server indexes Python strings, where an emoji is one character, not two UTF-16 units
+const diffRange = (beforeText, afterText) => {
+  const before = Array.from(beforeText);
+  const after = Array.from(afterText);
+  let start = 0;
+  const shorter = Math.min(before.length, after.length);
+  while (start < shorter && before[start] === after[start]) {
+    start += 1;
+  }
+  let suffix = 0;
+  while (
+    suffix < shorter - start &&
+    before[before.length - 1 - suffix] === after[after.length - 1 - suffix]
+  ) {
+    suffix += 1;
+  }
+  return { start, deleted: before.length - start - suffix, inserted: after.length - start - suffix };
+};
+
+const formatDuration = (seconds) => {
+  const total = Math.round(seconds);
+  return `${Math.floor(total / 60)}:${String(total % 60).padStart(2, '0')}`;
+};
+
+// Rendering runs as a background job; poll until it finishes
+const waitForRenderJob = async (jobId, onProgress) => {
+  for (;;) {
+    const { data: job } = await getRenderJob(jobId);
+    if (job.status === 'completed') {
+      return job;
+    }
+    if (job.status === 'failed' || job.status === 'cancelled') {
+      const error = new Error(job.error || 'Audio-Generierung abgebrochen');
+      error.response = { status: job.error_code, data: { detail: job.error } };
+      error.cancelled = job.status === 'cancelled';
+      throw error;
+    }
+    onProgress(job);
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
+};
 
 function EpisodeEditor() {
   const navigate = useNavigate();
@@ -51,11 +100,17 @@ function EpisodeEditor() {
   const [loading, setLoading] = useState(false);
   const [saving, setSaving] = useState(false);
   const [generating, setGenerating] = useState(false);
+  const [renderJobId, setRenderJobId] = useState(null);
   const [voices, setVoices] = useState([]);
   const [audioUrl, setAudioUrl] = useState(null);
+  const [previewUrl, setPreviewUrl] = useState(null);
   const [message, setMessage] = useState(null);
   const [currentTab, setCurrentTab] = useState(0);
   const [uploadedFiles, setUploadedFiles] = useState([]);
+  const [scriptStats, setScriptStats] = useState(null);
+  // Last parsed text and its segments, so the next parse only covers the edit
+  const parsedScript = useRef({ text: null, segments: null });
+  const parseRequest = useRef(0);
 
   const [formData, setFormData] = useState({
     text_content: '',
@@ -84,6 +139,34 @@ function EpisodeEditor() {
     }
   }, [id]);
 
+  useEffect(() => {
+    const text = formData.text_content;
+    if (!text) {
+      setScriptStats(null);
+      return undefined;
+    }
+    const timer = setTimeout(async () => {
+      const request = ++parseRequest.current;
+      const previous = parsedScript.current;
+      const data = { text };
+      if (previous.segments && previous.text !== null) {
+        data.previous_segments = previous.segments;
+        data.edit = diffRange(previous.text, text);
+      }
+      try {
+        const response = await parseScript(data);
+        if (request !== parseRequest.current) {
+          return;
+        }
+        parsedScript.current = { text, segments: response.data.segments };
+        setScriptStats(response.data.stats);
+      } catch (error) {
+        console.error('Error parsing script:', error);
+      }
+    }, PARSE_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [formData.text_content]);
+
   const loadVoices = async () => {
     try {
       const response = await getVoices();
@@ -139,20 +222,35 @@ function EpisodeEditor() {
     setGenerating(true);
     setMessage({ type: 'info', text: 'Audio wird generiert... Dies kann einige Minuten dauern.' });
 
+    const showProgress = (job) => {
+      setRenderJobId(job.id);
+      const done = job.completed_segments?.length || 0;
+      setMessage({
+        type: 'info',
+        text: `Audio wird generiert... ${done}/${job.total_segments} Segmente fertig.`,
+      });
+    };
+
     try {
       if (isEdit) {
         const response = await generateEpisodeAudio(id);
-        setAudioUrl(`${BACKEND_URL}${response.data.audio_url}`);
+        const job = await waitForRenderJob(response.data.job_id, showProgress);
+        setAudioUrl(`${BACKEND_URL}${job.audio_url}`);
         setMessage({ type: 'success', text: 'Audio erfolgreich generiert!' });
       } else {
         // For new episodes, save first then generate
         const saveResponse = await createEpisode(formData);
         const audioResponse = await generateEpisodeAudio(saveResponse.data.id);
-        setAudioUrl(`${BACKEND_URL}${audioResponse.data.audio_url}`);
+        const job = await waitForRenderJob(audioResponse.data.job_id, showProgress);
+        setAudioUrl(`${BACKEND_URL}${job.audio_url}`);
         setMessage({ type: 'success', text: 'Audio erfolgreich generiert!' });
         navigate(`/episodes/${saveResponse.data.id}`);
       }
     } catch (error) {
+      if (error.cancelled) {
+        setMessage({ type: 'info', text: 'Audio-Generierung abgebrochen.' });
+        return;
+      }
       console.error('Error generating audio:', error);
       
       // Show detailed error message
@@ -166,9 +264,29 @@ function EpisodeEditor() {
       setMessage({ type: 'error', text: errorMessage });
     } finally {
       setGenerating(false);
+      setRenderJobId(null);
     }
   };
 
+  const handleCancelRender = async () => {
+    try {
+      await cancelRenderJob(renderJobId);
+    } catch (error) {
+      // The job may have finished in the meantime; the poll loop reports the outcome
+      console.error('Error cancelling render job:', error);
+    }
+  };
+
+  // Audio starts playing while the voice sample is still being synthesized
+  const handlePreviewVoice = () => {
+    const sample = formData.text_content.replace(/^\s*\[[^\]]*\]/gm, '').trim().substring(0, 300);
+    setPreviewUrl(getTTSStreamUrl({
+      text: sample,
+      voice: formData.selected_voice,
+      voice_settings: formData.voice_settings,
+    }));
+  };
+
   const handleGetSuggestion = async (field) => {
     try {
       let prompt = '';
@@ -246,7 +364,20 @@ function EpisodeEditor() {
               />
               <Typography variant="caption" color="text.secondary" sx={{ mt: 1, display: 'block' }}>
                 Zeichen: {formData.text_content.length} | Wörter: {formData.text_content.split(/\s+/).filter(Boolean).length}
+                {scriptStats && ` | Abschnitte: ${scriptStats.segments} | Dauer ca. ${formatDuration(scriptStats.estimated_seconds)}`}
               </Typography>
+              {scriptStats && (
+                <Box sx={{ mt: 1, display: 'flex', flexWrap: 'wrap', gap: 1 }} data-testid="script-speaker-stats">
+                  {Object.entries(scriptStats.speakers).map(([speaker, stats]) => (
+                    <Chip
+                      key={speaker}
+                      size="small"
+                      variant="outlined"
+                      label={`${speaker.toUpperCase()}: ${stats.segments} Abschn. · ${stats.words} Wörter · ~${formatDuration(stats.estimated_seconds)}`}
+                    />
+                  ))}
+                </Box>
+              )}
             </CardContent>
           </Card>
         </Grid>
@@ -402,6 +533,26 @@ function EpisodeEditor() {
                 valueLabelFormat={(value) => `${Math.round(value * 100)}%`}
                 data-testid="style-slider"
               />
+
+              <Button
+                variant="outlined"
+                startIcon={<VolumeIcon />}
+                onClick={handlePreviewVoice}
+                disabled={!formData.text_content}
+                sx={{ mt: 2 }}
+                data-testid="voice-preview-button"
+              >
+                Stimmprobe anhören
+              </Button>
+              {previewUrl && (
+                <audio
+                  controls
+                  autoPlay
+                  src={previewUrl}
+                  style={{ width: '100%', marginTop: 16 }}
+                  data-testid="voice-preview-player"
+                />
+              )}
             </CardContent>
           </Card>
         </Grid>
@@ -507,6 +658,16 @@ function EpisodeEditor() {
             >
               {generating ? <CircularProgress size={24} /> : 'Audio Generieren'}
             </Button>
+            {generating && renderJobId && (
+              <Button
+                variant="outlined"
+                color="secondary"
+                onClick={handleCancelRender}
+                data-testid="cancel-render-button"
+              >
+                Abbrechen
+              </Button>
+            )}
           </Box>
         </Grid>
       </Grid>
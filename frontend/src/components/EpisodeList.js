@@ -24,6 +24,8 @@ function EpisodeList() {
   const navigate = useNavigate();
   const [episodes, setEpisodes] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     loadEpisodes();
@@ -32,7 +34,8 @@ function EpisodeList() {
   const loadEpisodes = async () => {
     try {
       const response = await getEpisodes();
-      setEpisodes(response.data);
+      setEpisodes(response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error loading episodes:', error);
     } finally {
@@ -40,6 +43,19 @@ function EpisodeList() {
     }
   };
 
+  const loadMoreEpisodes = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await getEpisodes({ cursor: nextCursor });
+      setEpisodes((prev) => [...prev, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error loading episodes:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleDelete = async (episodeId) => {
     if (window.confirm('Möchten Sie diese Episode wirklich löschen?')) {
       try {
@@ -169,6 +185,19 @@ function EpisodeList() {
           ))}
         </Grid>
       )}
+
+      {nextCursor && (
+        <Box display="flex" justifyContent="center" mt={3}>
+          <Button
+            variant="outlined"
+            onClick={loadMoreEpisodes}
+            disabled={loadingMore}
+            data-testid="load-more-episodes"
+          >
+            {loadingMore ? <CircularProgress size={20} /> : 'Mehr laden'}
+          </Button>
+        </Box>
+      )}
     </Container>
   );
 }
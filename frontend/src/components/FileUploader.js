@@ -20,10 +20,14 @@ import {
   VideoFile as VideoIcon,
   Image as ImageIcon,
 } from '@mui/icons-material';
-import { uploadMusic } from '../api';
+import { uploadMusic, uploadResumable } from '../api';
+
+// Larger files go through the resumable upload API
+const RESUMABLE_THRESHOLD = 50 * 1024 * 1024;
 
 function FileUploader({ onFileUploaded, acceptedTypes = ['audio', 'video', 'image'], category = 'background' }) {
   const [uploading, setUploading] = useState(false);
+  const [progress, setProgress] = useState(null);
   const [message, setMessage] = useState(null);
   const [uploadedFiles, setUploadedFiles] = useState([]);
 
@@ -51,7 +55,10 @@ function FileUploader({ onFileUploaded, acceptedTypes = ['audio', 'video', 'imag
 
     try {
       for (const file of files) {
-        const response = await uploadMusic(file, category);
+        const response = file.size > RESUMABLE_THRESHOLD
+          ? await uploadResumable(file, category, (fraction) => setProgress(fraction * 100))
+          : await uploadMusic(file, category);
+        setProgress(null);
         
         const uploadedFile = {
           id: response.data.id,
@@ -80,6 +87,7 @@ function FileUploader({ onFileUploaded, acceptedTypes = ['audio', 'video', 'imag
       });
     } finally {
       setUploading(false);
+      setProgress(null);
     }
   };
 
@@ -109,7 +117,13 @@ function FileUploader({ onFileUploaded, acceptedTypes = ['audio', 'video', 'imag
           </Alert>
         )}
 
-        {uploading && <LinearProgress sx={{ mb: 2 }} />}
+        {uploading && (
+          <LinearProgress
+            variant={progress === null ? 'indeterminate' : 'determinate'}
+            value={progress ?? 0}
+            sx={{ mb: 2 }}
+          />
+        )}
 
         <Box mb={3}>
           <input
@@ -31,7 +31,7 @@ import {
   Download as DownloadIcon,
   AutoFixHigh as EnhanceIcon,
 } from '@mui/icons-material';
-import { getMusicLibrary, enhanceAudio } from '../api';
+import { getMusicLibrary, enhanceAudio, deleteMediaFile } from '../api';
 import AudioEditor from './AudioEditor';
 import VideoEditor from './VideoEditor';
 import Recorder from './Recorder';
@@ -53,6 +53,8 @@ function MediaLibrary({ onSelectFile }) {
     trebleBoost: 0,
   });
   const [message, setMessage] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     loadFiles();
@@ -61,7 +63,8 @@ function MediaLibrary({ onSelectFile }) {
   const loadFiles = async () => {
     try {
       const response = await getMusicLibrary();
-      setFiles(response.data);
+      setFiles(response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error loading files:', error);
     } finally {
@@ -69,6 +72,19 @@ function MediaLibrary({ onSelectFile }) {
     }
   };
 
+  const loadMoreFiles = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await getMusicLibrary(undefined, nextCursor);
+      setFiles((prev) => [...prev, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error loading files:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getFileIcon = (fileName) => {
     const ext = fileName.toLowerCase().split('.').pop();
     if (['mp3', 'wav', 'ogg', 'aac'].includes(ext)) return <AudioIcon />;
@@ -83,6 +99,18 @@ function MediaLibrary({ onSelectFile }) {
     setEditDialogOpen(true);
   };
 
+  const handleDelete = async (file) => {
+    if (!window.confirm(`"${file.name}" wirklich löschen?`)) return;
+    
+    try {
+      await deleteMediaFile(file.id);
+      setFiles((current) => current.filter((f) => f.id !== file.id));
+    } catch (error) {
+      console.error('Error deleting file:', error);
+      setMessage({ type: 'error', text: 'Fehler beim Löschen der Datei' });
+    }
+  };
+
   const handleEnhance = async () => {
     if (!selectedFile) return;
     
@@ -212,7 +240,7 @@ function MediaLibrary({ onSelectFile }) {
                   />
                   
                   <Typography variant="caption" color="text.secondary" display="block">
-                    Größe: {formatFileSize(file.duration)}
+                    Größe: {formatFileSize(file.size_bytes)}
                   </Typography>
 
                   <Box display="flex" gap={1} mt={2}>
@@ -241,6 +269,15 @@ function MediaLibrary({ onSelectFile }) {
                     >
                       <DownloadIcon />
                     </IconButton>
+                    <IconButton
+                      size="small"
+                      color="error"
+                      onClick={() => handleDelete(file)}
+                      title="Löschen"
+                      data-testid={`delete-file-${file.id}`}
+                    >
+                      <DeleteIcon />
+                    </IconButton>
                     {onSelectFile && (
                       <IconButton
                         size="small"
@@ -259,6 +296,19 @@ function MediaLibrary({ onSelectFile }) {
         </Grid>
       )}
 
+      {nextCursor && (
+        <Box display="flex" justifyContent="center" mt={3}>
+          <Button
+            variant="outlined"
+            onClick={loadMoreFiles}
+            disabled={loadingMore}
+            data-testid="load-more-files"
+          >
+            {loadingMore ? 'Lädt...' : 'Mehr laden'}
+          </Button>
+        </Box>
+      )}
+
       {/* Edit Dialog */}
       <Dialog
         open={editDialogOpen}
@@ -0,0 +1,50 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server.py reads these at import time; nothing connects to MongoDB until a query runs
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "podcast_test")
+os.environ.setdefault("TTS_PROVIDER", "fake")
+os.environ.setdefault("TTS_FAKE_LATENCY_SECONDS", "0")
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """In-memory database in place of the server's MongoDB connection"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    patch_find_and_modify(monkeypatch)
+    database = mongomock_motor.AsyncMongoMockClient()["podcast_test"]
+    monkeypatch.setattr(server, "db", database)
+    return database
+
+
+def patch_find_and_modify(monkeypatch):
+    """mongomock re-reads the updated document with the original filter when the
+    projection drops _id, so find_one_and_update(..., {"status": "queued"} -> "running")
+    returns None; fetch with _id and drop it afterwards like MongoDB does"""
+    from mongomock.collection import Collection
+    find_and_modify = Collection._find_and_modify
+
+    def _find_and_modify(self, query, projection=None, *args, **kwargs):
+        if not projection or projection.get("_id", 1):
+            return find_and_modify(self, query, projection, *args, **kwargs)
+        rest = {field: value for field, value in projection.items() if field != "_id"}
+        doc = find_and_modify(self, query, rest or None, *args, **kwargs)
+        if doc:
+            doc.pop("_id", None)
+        return doc
+
+    monkeypatch.setattr(Collection, "_find_and_modify", _find_and_modify)
@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+def event(episode_id, day, listener, source="direct", end=1000):
+    return {
+        "file_url": f"/api/audio/{episode_id}.mp3",
+        "listener_id": listener,
+        "source": source,
+        "start": 0,
+        "end": end,
+        "bytes": end,
+        "size": 1000,
+        "day": day,
+        "ts": datetime.now(timezone.utc)
+    }
+
+
+async def test_flush_loop_survives_a_bad_event(db):
+    await db.episodes.insert_one({"id": "ep", "audio_url": "/api/audio/ep.mp3"})
+    buffer = server.AnalyticsEventBuffer(batch_size=1, max_events=100)
+    task = asyncio.create_task(buffer.run(0.01))
+    try:
+        buffer._events.append({"listener_id": "no file_url"})
+        await asyncio.sleep(0.05)
+        assert not task.done()
+
+        buffer._events.append(event("ep", "2026-10-01", "a"))
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if await db.analytics_events.count_documents({}):
+                break
+        assert await db.analytics_events.count_documents({"episode_id": "ep"}) == 1
+        assert not task.done()
+    finally:
+        task.cancel()
+
+
+async def test_rollup_covers_every_batch_of_episode_days(db, monkeypatch):
+    monkeypatch.setattr(server, "ANALYTICS_ROLLUP_BATCH_SIZE", 2)
+    events = [
+        {**event("ep1", "2026-10-01", "a"), "episode_id": "ep1", "rolled_up": False},
+        {**event("ep1", "2026-10-01", "a", end=500), "episode_id": "ep1", "rolled_up": False},
+        {**event("ep1", "2026-10-02", "b"), "episode_id": "ep1", "rolled_up": False},
+        {**event("ep2", "2026-10-01", "c"), "episode_id": "ep2", "rolled_up": False},
+        {**event("ep2", "2026-10-03", "d", source="bot"), "episode_id": "ep2", "rolled_up": False},
+    ]
+    await db.analytics_events.insert_many(events)
+
+    assert await server.rollup_analytics() == 4
+
+    stats = {
+        (doc["episode_id"], doc["date"].strftime("%Y-%m-%d")): doc
+        for doc in await db.analytics_stats.find({}).to_list(None)
+    }
+    assert set(stats) == {("ep1", "2026-10-01"), ("ep1", "2026-10-02"), ("ep2", "2026-10-01"), ("ep2", "2026-10-03")}
+    assert stats[("ep1", "2026-10-01")]["downloads"] == 1
+    assert stats[("ep2", "2026-10-03")]["downloads"] == 0
+    assert stats[("ep2", "2026-10-03")]["crawler_requests"] == 1
+    assert await db.analytics_events.count_documents({"rolled_up": False}) == 0
+
+
+async def test_events_written_during_a_rollup_wait_for_the_next_one(db, monkeypatch):
+    from bson import ObjectId
+
+    await db.analytics_events.insert_one({**event("ep1", "2026-10-01", "a"), "episode_id": "ep1", "rolled_up": False})
+    collection = type(db.analytics_stats)
+    bulk_write = collection.bulk_write
+    late = []
+
+    async def bulk_write_with_late_writer(self, *args, **kwargs):
+        if not late:
+            # Another process flushes an event whose ObjectId sorts before everything already stored
+            late.append(await db.analytics_events.insert_one({
+                **event("ep2", "2026-10-01", "b"), "episode_id": "ep2", "rolled_up": False,
+                "_id": ObjectId.from_datetime(datetime(2020, 1, 1, tzinfo=timezone.utc))
+            }))
+        return await bulk_write(self, *args, **kwargs)
+
+    monkeypatch.setattr(collection, "bulk_write", bulk_write_with_late_writer)
+    assert await server.rollup_analytics() == 1
+
+    assert await db.analytics_events.count_documents({"episode_id": "ep2", "rolled_up": False}) == 1
+    assert await server.rollup_analytics() == 1
+    assert await db.analytics_stats.count_documents({}) == 2
+    assert await db.analytics_events.count_documents({"rolled_up": False}) == 0
+    assert await db.analytics_events.count_documents({"rollup_id": {"$exists": True}}) == 0
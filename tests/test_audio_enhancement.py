@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+import server
+
+SAMPLE_RATE = 48000
+
+
+def noisy_speechlike(seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = 0.3 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 0.5 * t) > 0)
+    return (tone + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def write_pcm(path, samples):
+    samples.astype(np.float32).tofile(path)
+    return path
+
+
+def test_stft_analysis_synthesis_reconstructs_input():
+    signal = noisy_speechlike(1.3)
+    output = server.process_spectral_block(signal, 0, len(signal), server.stft_window(), None, None)
+
+    np.testing.assert_allclose(output, signal, atol=1e-5)
+
+
+def test_blocks_overlap_add_to_a_single_pass():
+    signal = noisy_speechlike(2.0)
+    window = server.stft_window()
+    noise_profile = server.estimate_noise_profile(signal, window)
+    eq_curve = server.shelf_eq_curve(SAMPLE_RATE, 6.0, -3.0)
+
+    single = server.process_spectral_block(signal, 0, len(signal), window, noise_profile, eq_curve)
+    # Block edges deliberately off the hop grid
+    edges = [0, 12345, 40000, 40001, 77777, len(signal)]
+    blocks = np.concatenate([
+        server.process_spectral_block(signal, start, stop, window, noise_profile, eq_curve)
+        for start, stop in zip(edges, edges[1:])
+    ])
+
+    np.testing.assert_allclose(blocks, single, atol=1e-6)
+
+
+def test_enhance_pcm_is_independent_of_block_size(tmp_path, monkeypatch):
+    stereo = np.stack([noisy_speechlike(3.0, seed=1), 0.5 * noisy_speechlike(3.0, seed=2)], axis=1)
+    settings = server.AudioEnhanceRequest(file_id="x", compression=0.7, bass_boost=3.0, treble_boost=2.0)
+
+    results = []
+    for block in (server.ENHANCE_HOP * 7, len(stereo)):
+        work_dir = tmp_path / str(block)
+        work_dir.mkdir()
+        monkeypatch.setattr(server, "ENHANCE_BLOCK", block)
+        pcm_path = write_pcm(work_dir / "input.f32", stereo)
+        result = server.enhance_pcm(work_dir, pcm_path, len(stereo), 2, SAMPLE_RATE, settings)
+        results.append((result, np.fromfile(result["output_path"], dtype=np.float32)))
+
+    (blocked, blocked_audio), (single, single_audio) = results
+    np.testing.assert_allclose(blocked_audio, single_audio, atol=1e-5)
+    assert blocked["loudness_lufs"] == pytest.approx(single["loudness_lufs"], abs=0.01)
+    assert blocked["output_gain_db"] == pytest.approx(single["output_gain_db"], abs=0.01)
+
+
+def test_reference_sine_measures_minus_23_lufs():
+    # BS.1770: a 997 Hz sine at -20 dBFS in one channel reads -23.0 LUFS
+    t = np.arange(10 * SAMPLE_RATE) / SAMPLE_RATE
+    sine = (10 ** (-20 / 20) * np.sin(2 * np.pi * 997 * t)).astype(np.float32)[:, None]
+    subblock = int(server.R128_SUBBLOCK_SECONDS * SAMPLE_RATE)
+    weights = server.k_weighting_power(SAMPLE_RATE, subblock)
+
+    loudness = server.integrated_loudness(server.subblock_loudness_powers(sine, subblock, weights))
+
+    assert loudness == pytest.approx(-23.0, abs=0.1)
+
+
+def test_silence_has_no_loudness(tmp_path):
+    settings = server.AudioEnhanceRequest(file_id="x", remove_noise=False, compression=0.0)
+    pcm_path = write_pcm(tmp_path / "input.f32", np.zeros(SAMPLE_RATE, dtype=np.float32))
+
+    result = server.enhance_pcm(tmp_path, pcm_path, SAMPLE_RATE, 1, SAMPLE_RATE, settings)
+
+    assert result["loudness_lufs"] is None
+    assert result["output_gain_db"] == 0.0
@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import server
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(server.app)
+
+
+def episode(title, number=None):
+    return {"text_content": f"[KLAUS] {title}", "metadata": {"title": title, "description": "", "episode_number": number}}
+
+
+async def chunked(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def chunked_sync(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def decode_array(data, size):
+    return [item async for item in server.iter_json_array(chunked(data, size))]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("size", [1, 2, 7, 4096])
+async def test_json_array_is_decoded_across_any_chunk_boundary(size):
+    items = [episode("Grüß Gott"), 12345, -1.5e3, "a,]b", [1, [2]], None, True, {"nested": {"x": "}"}}]
+    data = json.dumps(items, ensure_ascii=False, indent=1).encode()
+
+    assert await decode_array(data, size) == items
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("body", [b"", b"{}", b"[1,]", b"[1 2]", b"[1] x", b"[1", b'["\xff"]'])
+async def test_invalid_json_array_is_rejected(body):
+    with pytest.raises(HTTPException) as error:
+        await decode_array(body, 3)
+    assert error.value.status_code == 400
+
+
+def test_streamed_json_array_import(client):
+    body = json.dumps([episode("Eins"), {"metadata": {}}, episode("Zwei")]).encode()
+    response = client.post("/api/episodes/bulk", content=chunked_sync(body, 5), headers={"content-type": "application/json"})
+
+    assert response.status_code == 200
+    result = response.json()
+    assert [(e["index"], e["episode_number"]) for e in result["episodes"]] == [(0, 1), (2, 2)]
+    assert [error["index"] for error in result["errors"]] == [1]
+
+
+def test_ndjson_import(client):
+    body = "\n".join(json.dumps(episode(title)) for title in ("Eins", "Zwei")).encode()
+    response = client.post("/api/episodes/bulk", content=chunked_sync(body, 5), headers={"content-type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 2
+
+
+@pytest.mark.anyio
+async def test_concurrent_allocations_get_disjoint_ranges(db):
+    await db.counters.create_index("id", unique=True)
+    await db.episodes.insert_one({"id": "old", "metadata": {"episode_number": 7}})
+
+    counts = [1, 3, 2, 5, 1, 4] * 4
+    starts = await asyncio.gather(*[server.allocate_episode_numbers(count) for count in counts])
+
+    numbers = [number for start, count in zip(starts, counts) for number in range(start, start + count)]
+    assert sorted(numbers) == list(range(8, 8 + sum(counts)))
+
+
+@pytest.mark.anyio
+async def test_explicit_numbers_move_the_counter_forward(db):
+    await db.counters.create_index("id", unique=True)
+    assert await server.allocate_episode_numbers(1) == 1
+    await server.allocate_episode_numbers(0, at_least=10)
+
+    assert await server.allocate_episode_numbers(2) == 11
+
+
+def test_rejected_documents_are_reported_and_the_rest_inserted(client, db, monkeypatch):
+    monkeypatch.setattr(server, "BULK_IMPORT_BATCH_SIZE", 2)
+    asyncio.run(db.episodes.create_index("id", unique=True))
+    asyncio.run(db.episodes.insert_one({"id": "taken", "metadata": {"title": "Alt"}}))
+    prepare = server.prepare_new_episode
+
+    def prepare_with_duplicate(episode_input):
+        new = prepare(episode_input)
+        if episode_input.metadata.title == "Duplikat":
+            new.id = "taken"
+        return new
+
+    monkeypatch.setattr(server, "prepare_new_episode", prepare_with_duplicate)
+    items = [episode("Eins"), episode("Duplikat"), episode("Zwei"), {"metadata": {}}, episode("Drei")]
+    response = client.post("/api/episodes/bulk", json=items)
+
+    assert response.status_code == 200
+    result = response.json()
+    assert [e["index"] for e in result["episodes"]] == [0, 2, 4]
+    assert [error["index"] for error in result["errors"]] == [1, 3]
+    titles = asyncio.run(db.episodes.distinct("metadata.title"))
+    assert sorted(titles) == ["Alt", "Drei", "Eins", "Zwei"]
+
+
+def test_failed_batch_keeps_earlier_batches(client, db, monkeypatch):
+    monkeypatch.setattr(server, "BULK_IMPORT_BATCH_SIZE", 2)
+    import_batch = server.import_episode_batch
+    batches = []
+
+    async def failing_second_batch(batch, render, gap_ms):
+        batches.append(batch)
+        if len(batches) == 2:
+            raise RuntimeError("database unavailable")
+        return await import_batch(batch, render, gap_ms)
+
+    monkeypatch.setattr(server, "import_episode_batch", failing_second_batch)
+    response = client.post("/api/episodes/bulk", json=[episode(str(i)) for i in range(5)])
+
+    assert response.status_code == 500
+    assert len(batches) == 2
+    titles = asyncio.run(db.episodes.distinct("metadata.title"))
+    assert sorted(titles) == ["0", "1"]
@@ -0,0 +1,157 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+CONTENT = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    (image_dir / "cover.jpg").write_bytes(CONTENT)
+    (tmp_path / "secret.txt").write_text("not for you")
+    monkeypatch.setattr(server, "IMAGE_DIR", image_dir)
+    monkeypatch.setattr(server, "media_index", server.MediaFileIndex(100, 60))
+    return TestClient(server.app)
+
+
+def test_full_response_has_validators(client):
+    response = client.get("/api/image/cover.jpg")
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["content-length"] == str(len(CONTENT))
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["last-modified"].endswith("GMT")
+
+
+def test_if_none_match_gives_304(client):
+    etag = client.get("/api/image/cover.jpg").headers["etag"]
+
+    response = client.get("/api/image/cover.jpg", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    assert client.get("/api/image/cover.jpg", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_if_modified_since_gives_304(client):
+    last_modified = client.get("/api/image/cover.jpg").headers["last-modified"]
+
+    assert client.get("/api/image/cover.jpg", headers={"If-Modified-Since": last_modified}).status_code == 304
+    old = "Mon, 01 Jan 2001 00:00:00 GMT"
+    assert client.get("/api/image/cover.jpg", headers={"If-Modified-Since": old}).status_code == 200
+
+
+def test_single_range(client):
+    response = client.get("/api/image/cover.jpg", headers={"Range": "bytes=100-199"})
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{len(CONTENT)}"
+    assert response.content == CONTENT[100:200]
+
+
+def test_open_ended_and_suffix_ranges(client):
+    response = client.get("/api/image/cover.jpg", headers={"Range": "bytes=10000-"})
+    assert response.content == CONTENT[10000:]
+
+    response = client.get("/api/image/cover.jpg", headers={"Range": "bytes=-100"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {len(CONTENT) - 100}-{len(CONTENT) - 1}/{len(CONTENT)}"
+    assert response.content == CONTENT[-100:]
+
+    # A suffix longer than the file is the whole file
+    response = client.get("/api/image/cover.jpg", headers={"Range": "bytes=-999999"})
+    assert response.status_code == 206
+    assert response.content == CONTENT
+
+
+def test_multiple_ranges_are_sent_as_multipart(client):
+    response = client.get("/api/image/cover.jpg", headers={"Range": "bytes=0-9, 5000-5009"})
+
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1]
+    assert response.headers["content-length"] == str(len(response.content))
+
+    parts = response.content.split(f"--{boundary}".encode())
+    assert parts[0] == b"" and parts[-1] == b"--\r\n"
+    bodies = []
+    for part in parts[1:-1]:
+        head, _, body = part.partition(b"\r\n\r\n")
+        assert b"Content-Type: image/jpeg" in head
+        bodies.append((head, body.removesuffix(b"\r\n")))
+    assert b"Content-Range: bytes 0-9/10240" in bodies[0][0]
+    assert bodies[0][1] == CONTENT[0:10]
+    assert b"Content-Range: bytes 5000-5009/10240" in bodies[1][0]
+    assert bodies[1][1] == CONTENT[5000:5010]
+
+
+def test_overlapping_and_adjacent_ranges_are_coalesced(client):
+    response = client.get("/api/image/cover.jpg", headers={"Range": "bytes=50-99,0-49,90-120"})
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 0-120/10240"
+    assert response.content == CONTENT[:121]
+
+
+def test_parse_range_header():
+    assert server.parse_range_header("bytes=0-0,-1", 10) == [(0, 0), (9, 9)]
+    assert server.parse_range_header("bytes=5-", 10) == [(5, 9)]
+    assert server.parse_range_header("bytes=3-1", 10) is None
+    assert server.parse_range_header("items=0-1", 10) is None
+    assert server.parse_range_header("bytes=abc", 10) is None
+    assert server.parse_range_header("bytes=20-30", 10) == []
+
+
+def test_unsatisfiable_range_gives_416(client):
+    response = client.get("/api/image/cover.jpg", headers={"Range": "bytes=20000-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_stale_if_range_sends_whole_file(client):
+    response = client.get("/api/image/cover.jpg", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+    etag = response.headers["etag"]
+    response = client.get("/api/image/cover.jpg", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 206
+
+
+def test_head_has_headers_but_no_body(client):
+    response = client.head("/api/image/cover.jpg")
+
+    assert response.status_code == 200
+    assert response.headers["content-length"] == str(len(CONTENT))
+    assert response.content == b""
+
+
+@pytest.mark.parametrize("path", [
+    "/api/image/..%2Fsecret.txt",
+    "/api/image/%2e%2e%2fsecret.txt",
+    "/api/image/%2e%2e",
+    "/api/image/.cover.jpg.part",
+])
+def test_paths_outside_the_media_directory_are_not_served(client, path):
+    response = client.get(path)
+
+    assert response.status_code == 404
+    assert b"not for you" not in response.content
+
+
+def test_index_refuses_names_that_leave_the_directory(tmp_path):
+    index = server.MediaFileIndex(100, 60)
+    (tmp_path / "media").mkdir()
+    (tmp_path / "secret.txt").write_text("not for you")
+
+    assert index.lookup(tmp_path / "media", "../secret.txt") is None
+    assert index.lookup(tmp_path / "media", "..") is None
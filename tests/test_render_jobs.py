@@ -0,0 +1,192 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+def drain_render_queue():
+    queued = []
+    while not server.render_queue.empty():
+        queued.append(server.render_queue.get_nowait())
+        server.render_queue.task_done()
+    return queued
+
+
+async def test_restart_finishes_interrupted_cancellations(db, monkeypatch):
+    monkeypatch.setattr(server, "RENDER_WORKERS", 0)
+    await db.episodes.insert_many([
+        {"id": "ep-cancel", "status": "processing"},
+        {"id": "ep-resume", "status": "processing"},
+    ])
+    await db.render_jobs.insert_many([
+        {"id": "job-cancel", "episode_id": "ep-cancel", "status": "running", "cancel_requested": True},
+        {"id": "job-resume", "episode_id": "ep-resume", "status": "running", "cancel_requested": False},
+    ])
+
+    await server.start_render_workers()
+
+    assert drain_render_queue() == ["job-resume"]
+    cancelled = await db.render_jobs.find_one({"id": "job-cancel"})
+    assert cancelled["status"] == "cancelled"
+    assert cancelled["finished_at"] is not None
+    assert (await db.episodes.find_one({"id": "ep-cancel"}))["status"] == "draft"
+    assert (await db.render_jobs.find_one({"id": "job-resume"}))["status"] == "queued"
+    assert (await db.episodes.find_one({"id": "ep-resume"}))["status"] == "processing"
+
+
+async def test_failed_peaks_analysis_does_not_fail_a_finished_render(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "AUDIO_DIR", tmp_path)
+
+    async def synthesize_segment(segment, settings, output_path, episode_id, label):
+        output_path.write_bytes(server.SILENT_MP3_FRAME)
+        return False
+
+    async def assemble_episode_audio(episode_id, segment_paths, speakers, gap_ms):
+        (tmp_path / f"{episode_id}.mp3").write_bytes(server.SILENT_MP3_FRAME)
+        return {"filename": f"{episode_id}.mp3", "duration": 4.2, "segment_durations": [2.1, 2.1]}
+
+    async def analyze_media_file(file_url):
+        raise RuntimeError("ffprobe could not read the file")
+
+    monkeypatch.setattr(server, "synthesize_segment", synthesize_segment)
+    monkeypatch.setattr(server, "assemble_episode_audio", assemble_episode_audio)
+    monkeypatch.setattr(server, "analyze_media_file", analyze_media_file)
+
+    text = "[MARKUS] Servus\n[KLAUS] Griaß di"
+    await db.episodes.insert_one({"id": "ep", "text_content": text, "status": "processing"})
+    job = server.new_render_job({"id": "ep", "text_content": text}, None).model_dump()
+    await db.render_jobs.insert_one(job)
+
+    result = await server.render_episode_audio(job)
+
+    assert result == {"audio_url": "/api/audio/ep.mp3", "audio_duration": 4.2}
+    episode = await db.episodes.find_one({"id": "ep"})
+    assert episode["status"] == "completed"
+    assert episode["audio_url"] == "/api/audio/ep.mp3"
+    assert episode["audio_duration"] == 4.2
+
+
+async def start_blocked_render(db, monkeypatch):
+    """A claimed job whose render hangs until its task is cancelled"""
+    started = server.asyncio.Event()
+
+    async def render_episode_audio(job):
+        started.set()
+        await server.asyncio.Event().wait()
+
+    monkeypatch.setattr(server, "render_episode_audio", render_episode_audio)
+    await db.episodes.insert_one({"id": "ep", "status": "processing"})
+    await db.render_jobs.insert_one({"id": "job", "episode_id": "ep", "status": "queued"})
+    task = server.asyncio.create_task(server.execute_render_job("job"))
+    monkeypatch.setitem(server.running_render_jobs, "job", task)
+    await started.wait()
+    return task
+
+
+async def test_shutdown_leaves_a_running_job_to_be_resumed(db, monkeypatch):
+    monkeypatch.setattr(server, "RENDER_WORKERS", 0)
+    task = await start_blocked_render(db, monkeypatch)
+
+    task.cancel()
+    with pytest.raises(server.asyncio.CancelledError):
+        await task
+
+    assert (await db.render_jobs.find_one({"id": "job"}))["status"] == "running"
+    assert (await db.episodes.find_one({"id": "ep"}))["status"] == "processing"
+
+    await server.start_render_workers()
+
+    assert drain_render_queue() == ["job"]
+    assert (await db.render_jobs.find_one({"id": "job"}))["status"] == "queued"
+
+
+async def test_cancel_request_finishes_a_running_job(db, monkeypatch):
+    task = await start_blocked_render(db, monkeypatch)
+
+    job = await server.cancel_render_job("job")
+
+    assert task.done() and not task.cancelled()
+    assert job["status"] == "cancelled"
+    assert (await db.episodes.find_one({"id": "ep"}))["status"] == "draft"
+    assert not server.user_cancelled_render_jobs
+
+
+async def active_job_index(db):
+    # mongomock ignores partialFilterExpression; with only active jobs around a plain unique index behaves the same
+    await db.render_jobs.create_index("episode_id", unique=True)
+
+
+async def test_concurrent_submits_queue_one_render(db, monkeypatch):
+    await active_job_index(db)
+    await db.episodes.insert_one({"id": "ep", "text_content": "[KLAUS] Servus", "status": "draft"})
+    collection = type(db.render_jobs)
+    find_one = collection.find_one
+
+    async def slow_find_one(self, *args, **kwargs):
+        # Both requests look for an active job before either inserts one
+        await server.asyncio.sleep(0.01)
+        return await find_one(self, *args, **kwargs)
+
+    monkeypatch.setattr(collection, "find_one", slow_find_one)
+    first, second = await server.asyncio.gather(
+        server.generate_episode_audio("ep"),
+        server.generate_episode_audio("ep"),
+    )
+
+    assert first["job_id"] == second["job_id"]
+    assert await db.render_jobs.count_documents({}) == 1
+    assert drain_render_queue() == [first["job_id"]]
+
+
+async def test_bulk_render_reuses_an_already_active_job(db, monkeypatch):
+    await active_job_index(db)
+    await db.render_jobs.insert_one({"id": "job-busy", "episode_id": "ep-busy", "status": "running"})
+    prepare = server.prepare_new_episode
+
+    def prepare_with_known_id(episode_input):
+        new = prepare(episode_input)
+        if episode_input.metadata.title == "Busy":
+            new.id = "ep-busy"
+        return new
+
+    monkeypatch.setattr(server, "prepare_new_episode", prepare_with_known_id)
+    batch = [
+        (i, server.EpisodeCreate(text_content="[KLAUS] Servus", metadata={"title": title, "description": ""}))
+        for i, title in enumerate(["Neu", "Busy"])
+    ]
+
+    created, errors = await server.import_episode_batch(batch, render=True, gap_ms=None)
+
+    assert errors == []
+    assert created[1]["job_id"] == "job-busy"
+    assert drain_render_queue() == [created[0]["job_id"]]
+    assert await db.render_jobs.count_documents({"episode_id": "ep-busy"}) == 1
+
+
+async def test_provider_failure_is_stored_on_the_job(db, monkeypatch):
+    async def synthesize_segment(segment, settings, output_path, episode_id, label):
+        raise server.TTSError("quota", "quota_exceeded", 402)
+
+    monkeypatch.setattr(server, "synthesize_segment", synthesize_segment)
+    text = "[MARKUS] Servus"
+    await db.episodes.insert_one({"id": "ep", "text_content": text, "status": "processing"})
+    await db.render_jobs.insert_one(server.new_render_job({"id": "ep", "text_content": text}, None).model_dump())
+    job_id = (await db.render_jobs.find_one({}))["id"]
+
+    await server.execute_render_job(job_id)
+
+    job = await db.render_jobs.find_one({"id": job_id})
+    assert job["status"] == "failed"
+    assert job["error_code"] == 402
+    assert "Zeichenkontingent" in job["error"]
+    assert (await db.episodes.find_one({"id": "ep"}))["status"] == "error"
+
+
+async def test_missing_episode_fails_the_job_with_404(db):
+    await db.render_jobs.insert_one({"id": "job", "episode_id": "gone", "status": "queued", "segments": []})
+
+    await server.execute_render_job("job")
+
+    job = await db.render_jobs.find_one({"id": "job"})
+    assert (job["status"], job["error_code"], job["error"]) == ("failed", 404, "Episode not found")
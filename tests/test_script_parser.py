@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+import server
+
+LINES = [
+    "[MARKUS] Willkommen zur Sendung.",
+    "[Klaus] Danke, schön hier zu sein.",
+    "  [FRANZ] Eingerückt.",
+    "[JOSEF]",
+    "[Unbekannt] Wer spricht?",
+    "Eine Zeile ohne Tag.",
+    "Noch eine [Klammer] mitten drin.",
+    "",
+    "   ",
+    "[] Leerer Name",
+    "[KLAUS] Prost 🍺🥨",
+]
+# Fragments that can create, split or break tag lines
+INSERTS = ["", "\n", "[", "]", "[KLAUS] ", "\n[franz]", "  ", "text", "\n\n", "[markus", "x]", "😀"]
+
+
+def assert_exact_offsets(text, segments):
+    for segment in segments:
+        source = text[segment['start_position']:segment['end_position']]
+        first, _, rest = source.partition("\n")
+        expected_first, _, expected_rest = segment['text'].partition("\n")
+        # Only the tag line's trailing blanks are dropped from a segment's text
+        assert first.rstrip() == expected_first.rstrip()
+        assert rest == expected_rest
+
+
+def random_script(rng):
+    return "\n".join(rng.choice(LINES) for _ in range(rng.randint(0, 12)))
+
+
+def random_edit(rng, text):
+    start = rng.randint(0, len(text))
+    deleted = rng.randint(0, min(12, len(text) - start))
+    inserted = rng.choice(INSERTS + LINES)
+    return text[:start] + inserted + text[start + deleted:], (start, deleted, len(inserted))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_parse_matches_full_parse(seed):
+    rng = random.Random(seed)
+    text = random_script(rng)
+    segments = server.parse_speaker_segments(text)
+    for _ in range(50):
+        text, edit = random_edit(rng, text)
+        segments = server.parse_speaker_segments(text, segments, edit)
+        assert segments == server.parse_speaker_segments(text), (text, edit)
+        assert_exact_offsets(text, segments)
+
+
+def test_offsets_point_at_segment_content():
+    text = "Intro ohne Tag\n[KLAUS]   Hallo   \nzweite Zeile\n[MARKUS]\nNur Text"
+    segments = server.parse_speaker_segments(text)
+
+    assert [(s['speaker'], s['text']) for s in segments] == [
+        ("markus", "Intro ohne Tag"),
+        ("klaus", "Hallo\nzweite Zeile"),
+        ("markus", "Nur Text"),
+    ]
+    assert text[segments[1]['start_position']:].startswith("Hallo")
+    assert text[segments[2]['start_position']:segments[2]['end_position']] == "Nur Text"
+    assert_exact_offsets(text, segments)
+
+
+def test_indented_speaker_tag_switches_speaker():
+    # Indented tags were always tag lines, but the old parser read the name from column 1
+    # ("  [KLAUS]" gave " [klaus") and kept the previous speaker
+    segments = server.parse_speaker_segments("[MARKUS] Hallo\n  [KLAUS] Servus\n\t[franz]\nGrüß Gott")
+
+    assert [(s['speaker'], s['text']) for s in segments] == [
+        ("markus", "Hallo"),
+        ("klaus", "Servus"),
+        ("franz", "Grüß Gott"),
+    ]
+
+
+def test_unknown_tag_keeps_the_previous_speaker():
+    segments = server.parse_speaker_segments("[KLAUS] Eins\n[Gast] Zwei")
+
+    assert [(s['speaker'], s['text']) for s in segments] == [("klaus", "Eins"), ("klaus", "Zwei")]
+
+
+def diff_range(before, after):
+    """What the editor sends as edit: the changed range in code points"""
+    start = 0
+    while start < min(len(before), len(after)) and before[start] == after[start]:
+        start += 1
+    suffix = 0
+    while suffix < min(len(before), len(after)) - start and before[-1 - suffix] == after[-1 - suffix]:
+        suffix += 1
+    return start, len(before) - start - suffix, len(after) - start - suffix
+
+
+def test_edit_after_an_emoji_uses_code_point_offsets():
+    before = "[MARKUS] Servus 😀🎙️\n[KLAUS] Griaß di\n[FRANZ] Pfiat di"
+    after = before.replace("Griaß di", "Griaß di, Franz\n[JOSEF] Moin")
+    segments = server.parse_speaker_segments(before)
+
+    incremental = server.parse_speaker_segments(after, segments, diff_range(before, after))
+
+    assert incremental == server.parse_speaker_segments(after)
+    assert [s["speaker"] for s in incremental] == ["markus", "klaus", "josef", "franz"]
+    assert_exact_offsets(after, incremental)
@@ -0,0 +1,120 @@
+import httpx
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("status_code, body, kind", [
+    (401, b'{"detail": {"status": "invalid_api_key", "message": "Invalid API key"}}', "auth"),
+    (403, b"forbidden", "auth"),
+    (402, b'{"detail": {"status": "payment_required", "message": "Upgrade your plan"}}', "quota"),
+    (401, b'{"detail": {"status": "quota_exceeded", "message": "Quota exceeded"}}', "quota"),
+    (400, b'{"detail": "Free tier usage disabled"}', "quota"),
+    (422, b'{"detail": [{"loc": ["body", "text"], "msg": "field required"}]}', "invalid"),
+    (429, b'{"detail": {"status": "too_many_concurrent_requests"}}', "rate_limited"),
+    (500, b"internal error", "unavailable"),
+    (503, b"", "unavailable"),
+    (408, b"", "unavailable"),
+])
+def test_classify_tts_response(status_code, body, kind):
+    error = server.classify_tts_response(status_code, body, httpx.Headers())
+
+    assert error.kind == kind
+    assert error.status_code == status_code
+    assert error.permanent == (kind in ("auth", "quota", "invalid"))
+
+
+def test_retry_after_is_parsed_for_transient_errors():
+    error = server.classify_tts_response(429, b"", httpx.Headers({"Retry-After": "7"}))
+    assert error.retry_after == 7.0
+
+    error = server.classify_tts_response(503, b"", httpx.Headers({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}))
+    assert error.retry_after == 0.0
+
+
+def test_retry_delay_backs_off_and_respects_retry_after(monkeypatch):
+    monkeypatch.setattr(server, "TTS_RETRY_BASE_DELAY", 1.0)
+    monkeypatch.setattr(server, "TTS_RETRY_MAX_DELAY", 30.0)
+    transient = server.TTSError("unavailable", "busy", 503)
+
+    for attempt in range(1, 8):
+        assert 0 <= server.tts_retry_delay(attempt, transient) <= min(30.0, 2 ** (attempt - 1))
+    limited = server.TTSError("rate_limited", "slow down", 429, retry_after=12.0)
+    assert all(server.tts_retry_delay(1, limited) >= 12.0 for _ in range(20))
+    # Never longer than the cap, whatever the provider asks for
+    huge = server.TTSError("rate_limited", "slow down", 429, retry_after=3600.0)
+    assert server.tts_retry_delay(1, huge) == 30.0
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = server.FakeTTSProvider(latency=0)
+    monkeypatch.setattr(server, "tts_provider", provider)
+    monkeypatch.setattr(server, "TTS_RETRY_BASE_DELAY", 0.001)
+    monkeypatch.setattr(server, "TTS_MAX_RETRIES", 5)
+    return provider
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    recorded = []
+    retry_delay = server.tts_retry_delay
+
+    def spy(attempt, error):
+        delay = retry_delay(attempt, error)
+        recorded.append((attempt, error.kind, delay))
+        return delay
+
+    monkeypatch.setattr(server, "tts_retry_delay", spy)
+    return recorded
+
+
+async def test_transient_errors_are_retried_with_backoff(provider, delays, tmp_path):
+    provider.failures.extend([
+        server.TTSError("unavailable", "busy", 503),
+        server.TTSError("rate_limited", "slow down", 429, retry_after=0.02),
+        server.TTSError("network", "connection reset"),
+    ])
+
+    await server.synthesize_to_file("voice", "Servus", {}, tmp_path / "out.mp3", "test")
+
+    assert provider.calls == 4
+    assert [(attempt, kind) for attempt, kind, _ in delays] == [(1, "unavailable"), (2, "rate_limited"), (3, "network")]
+    assert delays[1][2] >= 0.02
+    assert (tmp_path / "out.mp3").read_bytes().startswith(server.SILENT_MP3_FRAME)
+    assert [path.name for path in tmp_path.iterdir()] == ["out.mp3"]
+
+
+async def test_retries_give_up_after_max_attempts(provider, delays, tmp_path):
+    provider.failures.extend(server.TTSError("unavailable", "busy", 503) for _ in range(10))
+
+    with pytest.raises(server.TTSError) as error:
+        await server.synthesize_to_file("voice", "Servus", {}, tmp_path / "out.mp3", "test")
+
+    assert error.value.kind == "unavailable"
+    assert provider.calls == server.TTS_MAX_RETRIES
+    assert len(delays) == server.TTS_MAX_RETRIES - 1
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("kind, status_code", [("auth", 401), ("quota", 402), ("invalid", 422)])
+async def test_permanent_errors_fail_without_retrying(provider, delays, tmp_path, kind, status_code):
+    provider.failures.append(server.TTSError(kind, "no", status_code))
+
+    with pytest.raises(server.TTSError) as error:
+        await server.synthesize_to_file("voice", "Servus", {}, tmp_path / "out.mp3", "test")
+
+    assert error.value.kind == kind
+    assert provider.calls == 1
+    assert delays == []
+
+
+async def test_streams_retry_only_before_the_first_chunk(provider, delays):
+    provider.failures.append(server.TTSError("unavailable", "busy", 503))
+
+    chunks = [chunk async for chunk in server.stream_tts_with_retries("voice", "Servus", {}, "test")]
+
+    assert chunks and provider.calls == 2
+    assert [kind for _, kind, _ in delays] == ["unavailable"]
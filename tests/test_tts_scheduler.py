@@ -0,0 +1,181 @@
+import asyncio
+import time
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+def make_scheduler(concurrency=1, interactive_reserved=0, requests_per_minute=0, characters_per_minute=0, batch_quota_reserve=0):
+    return server.TTSScheduler(concurrency, interactive_reserved, requests_per_minute, characters_per_minute, batch_quota_reserve)
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = server.FakeTTSProvider(latency=0)
+    monkeypatch.setattr(server, "tts_provider", provider)
+    return provider
+
+
+async def synthesize(scheduler, provider, log, name, priority="batch", group="", characters=10):
+    async with scheduler.slot(characters, priority, group):
+        log.append(name)
+        async for _ in provider.stream("voice", "x" * characters, {}):
+            pass
+
+
+async def hold_slot(scheduler, released, priority="interactive"):
+    async with scheduler.slot(1, priority):
+        await released.wait()
+
+
+async def queue_behind_blocker(scheduler, calls):
+    """Occupy the only slot, queue calls in order, then let them run; returns the tasks"""
+    released = asyncio.Event()
+    blocker = asyncio.create_task(hold_slot(scheduler, released))
+    await asyncio.sleep(0)
+    tasks = []
+    for call in calls:
+        tasks.append(asyncio.create_task(call))
+        await asyncio.sleep(0)
+    released.set()
+    await blocker
+    return tasks
+
+
+async def test_interactive_requests_go_ahead_of_batch(provider):
+    scheduler = make_scheduler()
+    log = []
+
+    tasks = await queue_behind_blocker(scheduler, [
+        synthesize(scheduler, provider, log, "batch-1", group="ep1"),
+        synthesize(scheduler, provider, log, "batch-2", group="ep1"),
+        synthesize(scheduler, provider, log, "preview", priority="interactive"),
+    ])
+    await asyncio.gather(*tasks)
+
+    assert log == ["preview", "batch-1", "batch-2"]
+
+
+async def test_reserved_slot_is_kept_free_for_interactive(provider):
+    scheduler = make_scheduler(concurrency=2, interactive_reserved=1)
+    released = asyncio.Event()
+    batch = [asyncio.create_task(hold_slot(scheduler, released, "batch")) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    assert scheduler.active == {"interactive": 0, "batch": 1}
+    log = []
+    await asyncio.wait_for(synthesize(scheduler, provider, log, "preview", priority="interactive"), 1)
+    assert log == ["preview"]
+
+    released.set()
+    await asyncio.gather(*batch)
+
+
+async def test_batch_work_is_round_robin_across_episodes(provider):
+    scheduler = make_scheduler()
+    log = []
+
+    tasks = await queue_behind_blocker(scheduler, [
+        synthesize(scheduler, provider, log, f"{episode}-{i}", group=episode)
+        for episode, count in (("ep1", 3), ("ep2", 2), ("ep3", 1))
+        for i in range(count)
+    ])
+    await asyncio.gather(*tasks)
+
+    assert log == ["ep1-0", "ep2-0", "ep3-0", "ep1-1", "ep2-1", "ep1-2"]
+
+
+async def test_cancelled_waiter_gives_its_slot_back(provider):
+    scheduler = make_scheduler()
+    log = []
+
+    released = asyncio.Event()
+    blocker = asyncio.create_task(hold_slot(scheduler, released))
+    await asyncio.sleep(0)
+    cancelled = asyncio.create_task(synthesize(scheduler, provider, log, "cancelled"))
+    waiting = asyncio.create_task(synthesize(scheduler, provider, log, "next"))
+    await asyncio.sleep(0)
+
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    released.set()
+    await blocker
+    await asyncio.wait_for(waiting, 1)
+
+    assert log == ["next"]
+    assert scheduler.active == {"interactive": 0, "batch": 0}
+
+
+async def test_waiter_cancelled_right_after_its_grant_releases_the_slot(provider):
+    scheduler = make_scheduler()
+    log = []
+
+    slot = scheduler.slot(1, "interactive")
+    await slot.__aenter__()
+    granted = asyncio.create_task(synthesize(scheduler, provider, log, "granted"))
+    waiting = asyncio.create_task(synthesize(scheduler, provider, log, "next"))
+    await asyncio.sleep(0)
+
+    # Releasing grants the slot synchronously; cancel before the waiter resumes
+    await slot.__aexit__(None, None, None)
+    assert scheduler.active["batch"] == 1
+    granted.cancel()
+    await asyncio.wait_for(waiting, 1)
+
+    assert log == ["next"]
+    assert granted.cancelled()
+    assert scheduler.active == {"interactive": 0, "batch": 0}
+
+
+async def test_batch_is_rejected_when_only_the_reserve_is_left(provider):
+    scheduler = make_scheduler(concurrency=2, batch_quota_reserve=500)
+    scheduler.character_limit = 1000
+    scheduler.character_count = 400
+
+    with pytest.raises(server.TTSError) as error:
+        await synthesize(scheduler, provider, [], "episode", characters=200)
+    assert error.value.kind == "quota"
+    assert scheduler.quota_rejections == 1
+
+    # Previews may still use the reserve
+    log = []
+    await synthesize(scheduler, provider, log, "preview", priority="interactive", characters=200)
+    assert log == ["preview"]
+    assert scheduler.character_count == 600
+
+
+async def test_failed_call_refunds_its_characters(provider):
+    scheduler = make_scheduler()
+    scheduler.character_limit = 1000
+    scheduler.character_count = 0
+    provider.failures.append(server.TTSError("unavailable", "busy", 503))
+
+    with pytest.raises(server.TTSError):
+        await synthesize(scheduler, provider, [], "episode", characters=300)
+
+    assert scheduler.character_count == 0
+
+
+async def test_requests_per_minute_limit_holds_under_a_burst(provider):
+    requests_per_minute = 3000  # 50 per second
+    scheduler = make_scheduler(concurrency=50, requests_per_minute=requests_per_minute)
+    # The burst arrives after this minute's allowance is used up
+    scheduler.request_bucket.tokens = 0
+    starts = []
+
+    async def timed():
+        async with scheduler.slot(10, "batch", "ep"):
+            starts.append(time.monotonic())
+
+    began = time.monotonic()
+    await asyncio.gather(*[timed() for _ in range(25)])
+
+    rate = requests_per_minute / 60
+    assert starts[-1] - began >= 25 / rate * 0.9
+    # No window lets more through than the refill rate allows
+    for i, first in enumerate(starts):
+        for j in range(i + 1, len(starts)):
+            assert j - i <= (starts[j] - first) * rate + 1.5
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def provider(tmp_path, monkeypatch):
+    provider = server.FakeTTSProvider(latency=0.05)
+    monkeypatch.setattr(server, "tts_provider", provider)
+    monkeypatch.setattr(server, "AUDIO_DIR", tmp_path)
+    monkeypatch.setattr(server, "tts_cache", server.TTSAudioCache(tmp_path / "tts_cache", 10 ** 8))
+    return provider
+
+
+async def read_response(response):
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+async def test_identical_previews_share_one_provider_call(provider):
+    text = "Servus beinand, heute geht es um die Wiesn."
+    responses = await asyncio.gather(*[server.open_tts_stream(text, "markus", None) for _ in range(3)])
+    bodies = await asyncio.gather(*[read_response(response) for response in responses])
+
+    assert provider.calls == 1
+    assert sorted(response.headers["X-TTS-Cache"] for response in responses) == ["miss", "shared", "shared"]
+    assert bodies[0] and bodies[0] == bodies[1] == bodies[2]
+    assert len({response.headers["X-Audio-Url"] for response in responses}) == 1
+    assert server.tts_streams == {}
+
+
+async def test_completed_preview_is_served_from_cache(provider):
+    text = "Grüß Gott miteinander."
+    first = await read_response(await server.open_tts_stream(text, "markus", None))
+    response = await server.open_tts_stream(text, "markus", None)
+
+    assert response.headers["X-TTS-Cache"] == "hit"
+    assert await read_response(response) == first
+    assert provider.calls == 1
+
+
+async def test_failed_stream_is_not_shared_afterwards(provider, monkeypatch):
+    monkeypatch.setattr(provider, "failure_rate", 1.0)
+    monkeypatch.setattr(server, "TTS_MAX_RETRIES", 1)
+    with pytest.raises(server.TTSError):
+        await server.open_tts_stream("Kaputt.", "markus", None)
+    await asyncio.sleep(0)
+
+    monkeypatch.setattr(provider, "failure_rate", 0.0)
+    response = await server.open_tts_stream("Kaputt.", "markus", None)
+    assert response.headers["X-TTS-Cache"] == "miss"
+    assert await read_response(response)
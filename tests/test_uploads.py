@@ -0,0 +1,139 @@
+import gc
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+@pytest.fixture
+def media_dirs(tmp_path, monkeypatch, db):
+    dirs = {kind: tmp_path / kind for kind in ("audio", "video", "image")}
+    for path in dirs.values():
+        path.mkdir()
+    monkeypatch.setattr(server, "AUDIO_DIR", dirs["audio"])
+    monkeypatch.setattr(server, "MEDIA_STORAGE_DIRS", dirs)
+    monkeypatch.setattr(server, "schedule_media_analysis", lambda file_url: None)
+    return dirs
+
+
+@pytest.fixture
+def client():
+    return TestClient(server.app)
+
+
+def leftover_files(dirs):
+    return [path.name for path in dirs.values() for path in path.iterdir()]
+
+
+def test_upload_is_stored_under_its_hash(client, media_dirs):
+    payload = b"ID3" + bytes(range(256)) * 1000
+    response = client.post(
+        "/api/music/upload?category=jingle",
+        files={"file": ("intro.mp3", payload, "audio/mpeg")}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    digest = hashlib.sha256(payload).hexdigest()
+    assert body["sha256"] == digest
+    assert body["size_bytes"] == len(payload)
+    assert body["name"] == "intro.mp3"
+    assert body["file_url"] == f"/api/audio/{digest}.mp3"
+    assert leftover_files(media_dirs) == [f"{digest}.mp3"]
+
+
+def test_upload_over_limit_by_content_length_is_rejected_before_reading(client, media_dirs, monkeypatch):
+    monkeypatch.setattr(server, "MULTIPART_OVERHEAD_BYTES", 0)
+    body_read = []
+
+    async def fail_if_read(self):
+        body_read.append(True)
+        yield b""
+
+    monkeypatch.setattr(server.Request, "stream", fail_if_read)
+    response = client.post(
+        "/api/music/upload",
+        content=b"",
+        headers={
+            "content-type": "multipart/form-data; boundary=b",
+            "content-length": str(server.MAX_UPLOAD_BYTES + 1)
+        }
+    )
+
+    assert response.status_code == 413
+    assert body_read == []
+
+
+@pytest.mark.anyio
+async def test_streamed_upload_over_limit_stops_with_413(media_dirs):
+    limit = 64 * 1024
+    boundary = b"boundary42"
+    head = (
+        b"--" + boundary + b"\r\n"
+        b'Content-Disposition: form-data; name="file"; filename="big.mp3"\r\n'
+        b"Content-Type: audio/mpeg\r\n\r\n"
+    )
+    received = []
+
+    async def receive():
+        # No Content-Length: the limit has to hold while the body streams in
+        if not received:
+            received.append(head)
+            return {"type": "http.request", "body": head, "more_body": True}
+        received.append(b"x" * 16384)
+        return {"type": "http.request", "body": received[-1], "more_body": len(received) < 100}
+
+    request = server.Request({
+        "type": "http",
+        "method": "POST",
+        "headers": [(b"content-type", b"multipart/form-data; boundary=" + boundary)],
+    }, receive)
+    with pytest.raises(server.HTTPException) as error:
+        await server.save_upload_stream(request, media_dirs["audio"] / "incoming", max_bytes=limit)
+
+    assert error.value.status_code == 413
+    # Reading stopped shortly after the limit instead of draining the whole body
+    assert len(received) < 10
+    assert leftover_files(media_dirs) == []
+
+
+def test_upload_without_file_part_is_rejected(client, media_dirs):
+    response = client.post("/api/music/upload", data={"category": "x"}, files={"other": ("a.txt", b"a", "text/plain")})
+    assert response.status_code == 400
+    assert leftover_files(media_dirs) == []
+
+
+def live_upload_locks():
+    # Failed requests can leave reference cycles through their tracebacks
+    gc.collect()
+    return dict(server.upload_locks)
+
+
+def test_requests_for_unknown_sessions_leave_no_lock(client, media_dirs):
+    assert client.put("/api/uploads/made-up?offset=0", content=b"abc").status_code == 404
+    assert client.post("/api/uploads/made-up/complete").status_code == 404
+
+    assert live_upload_locks() == {}
+
+
+def test_resumable_upload_leaves_no_lock(client, media_dirs):
+    payload = b"ID3" + bytes(range(256)) * 10
+    session = client.post("/api/uploads", json={"filename": "a.mp3", "content_type": "audio/mpeg", "total_size": len(payload)}).json()
+
+    assert client.put(f"/api/uploads/{session['id']}?offset=0", content=payload[:100]).status_code == 200
+    assert client.post(f"/api/uploads/{session['id']}/complete").status_code == 409
+    assert client.put(f"/api/uploads/{session['id']}?offset=100", content=payload[100:]).status_code == 200
+    assert client.post(f"/api/uploads/{session['id']}/complete").status_code == 200
+
+    assert live_upload_locks() == {}
+
+
+def test_aborted_upload_leaves_no_lock(client, media_dirs):
+    session = client.post("/api/uploads", json={"filename": "a.mp3", "content_type": "audio/mpeg", "total_size": 10}).json()
+    client.put(f"/api/uploads/{session['id']}?offset=0", content=b"ID3")
+
+    assert client.delete(f"/api/uploads/{session['id']}").status_code == 200
+    assert live_upload_locks() == {}
+    assert leftover_files(media_dirs) == []